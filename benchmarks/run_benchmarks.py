@@ -0,0 +1,281 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of the stages of the likelihood computation.
+
+Times, over repeated runs, the reading of the experimental input lists,
+the parsing of the user input, the computation of the reduced couplings
+at LO and BEST-QCD, of the signal strengths, of the likelihood for each
+type and dimension of experimental result, and a full 100x100 (CV, CF)
+scan. The peak memory allocated by a single run of each stage is measured
+with tracemalloc. The results are written in JSON, together with the
+versions of Lilith, of the database and of the libraries.
+
+Usage: python benchmarks/run_benchmarks.py [options]"""
+
+import sys, os, time, json, getopt, platform, subprocess, tracemalloc
+import warnings
+import numpy as np
+import scipy
+
+lilith_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, lilith_dir)
+import lilith
+from lilith.internal.readuserinput import ReadUserInput
+from lilith.internal.computelikelihood import compute_likelihood, \
+    compute_likelihood_batch, results_table
+
+exp_lists = ["latest.list", "finalRun1.list", "latestRun2.list"]
+user_inputs = ["example_couplings.xml", "example_couplings_multiH.xml",
+               "example_mu.xml", "example_mu_multiH.xml"]
+
+def print_usage():
+    print("\nUsage of the Lilith benchmarks:")
+    print("-------------------------------")
+    print("python benchmarks/run_benchmarks.py [options]")
+    print("[options]")
+    print(" -h or --help : dump this help")
+    print(" -o file or --output=file : write the results in file [stdout]")
+    print(" -r n or --repeat=n : number of timed runs per benchmark [5]")
+    print(" -k text or --select=text : only run the benchmarks whose name " +
+          "contains text")
+    print(" -q or --quick : single timed run, without the 100x100 scan\n")
+
+def measure(name, fn, setup=None, repeat=5, number=1, **params):
+    """Times number calls of fn, repeat times, and measures the peak memory
+    of a single call. setup, if given, is called before every run and its
+    result passed to fn."""
+
+    state = setup() if setup is not None else None
+    t0 = time.perf_counter()
+    fn(state)
+    first = time.perf_counter() - t0
+
+    times = []
+    for i in range(repeat):
+        state = setup() if setup is not None else None
+        t0 = time.perf_counter()
+        for j in range(number):
+            fn(state)
+        times.append((time.perf_counter() - t0)/number)
+
+    state = setup() if setup is not None else None
+    tracemalloc.start()
+    fn(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"name": name, "params": params, "repeat": repeat,
+            "number": number, "first": first, "min": min(times),
+            "median": float(np.median(times)), "mean": float(np.mean(times)),
+            "max": max(times), "peak_memory": peak}
+
+def metadata():
+    """Versions and platform of the run."""
+
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readdbversion()
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=lilith_dir,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"lilith": lilith.__version__, "dbversion": lilithcalc.dbversion,
+            "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "scipy": scipy.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def subset(exp_mu, eff, bestfit):
+    """The experimental results exp_mu, with their rows of the compiled
+    efficiency matrix eff and best-fit vector bestfit, as a standalone
+    input of compute_likelihood: (exp_mu, eff, bestfit, table)."""
+
+    rows = []
+    sub_mu = []
+    for mu in exp_mu:
+        start = len(rows)
+        rows.extend(range(mu["axes"].start, mu["axes"].stop))
+        sub_mu.append(dict(mu, axes=slice(start, len(rows))))
+    return (sub_mu, np.ascontiguousarray(eff[rows]), bestfit[rows],
+            results_table(sub_mu))
+
+def read_file(filepath):
+    with open(filepath) as f:
+        return f.read()
+
+# Each suite yields the benchmarks (name, fn, options) to be run by
+# measure(name, fn, **options); a benchmark is run before the next one is
+# generated, and only if it is selected.
+
+def readexpinput_benchmarks(repeat):
+    for exp_list in exp_lists:
+        filepath = os.path.join(lilith_dir, "data", exp_list)
+        yield ("readexpinput:" + exp_list,
+               lambda state: lilith.Lilith().readexpinput(filepath),
+               dict(repeat=repeat, list=exp_list))
+
+def readuserinput_benchmarks(repeat):
+    for user_input in user_inputs:
+        inputstring = read_file(os.path.join(lilith_dir, "userinput",
+                                             user_input))
+        yield ("readuserinput:" + user_input,
+               lambda state: ReadUserInput(inputstring),
+               dict(repeat=repeat, number=10, input=user_input))
+
+def couplings_benchmarks(repeat):
+    inputstring = read_file(os.path.join(lilith_dir, "userinput",
+                                         "example_couplings.xml"))
+    lilithcalc = lilith.Lilith()
+
+    for precision in ["LO", "BEST-QCD"]:
+        def setup():
+            # the computed couplings are added to the user input, which is
+            # thus read again before every run
+            lilithcalc.readuserinput(inputstring)
+            for redCp in lilithcalc.couplings:
+                redCp["extra"]["precision"] = precision
+        yield ("computecouplings:" + precision,
+               lambda state: lilithcalc.computecouplings(),
+               dict(setup=setup, repeat=repeat, precision=precision))
+
+        def setup_mu():
+            setup()
+            lilithcalc.computecouplings()
+        yield ("computemufromreducedcouplings:" + precision,
+               lambda state: lilithcalc.computemufromreducedcouplings(),
+               dict(setup=setup_mu, repeat=repeat, number=10,
+                    precision=precision))
+
+def likelihood_benchmarks(repeat):
+    user_mu = lilith.Lilith()
+    user_mu.readuserinput(read_file(os.path.join(lilith_dir, "userinput",
+                                                 "example_couplings.xml")))
+    user_mu.computecouplings()
+    user_mu.computemufromreducedcouplings()
+    npoints = 1000
+    batch_mu = np.tile(user_mu.user_mu_tot, (npoints, 1))
+
+    for exp_list in exp_lists:
+        lilithcalc = lilith.Lilith()
+        lilithcalc.readexpinput(os.path.join(lilith_dir, "data", exp_list))
+        eff = lilithcalc.exp_eff
+        bestfit = lilithcalc.exp_bestfit
+
+        yield ("compute_likelihood:" + exp_list,
+               lambda state: compute_likelihood(
+                   lilithcalc.exp_mu, user_mu.user_mu_tot, eff, bestfit,
+                   table=lilithcalc.exp_table),
+               dict(repeat=repeat, number=20, list=exp_list,
+                    nexp=len(lilithcalc.exp_mu)))
+
+        # each type and dimension is timed on its own rows of the
+        # efficiency matrix and best-fit vector, built once
+        groups = {}
+        for mu in lilithcalc.exp_mu:
+            groups.setdefault((mu["type"], mu["dim"]), []).append(mu)
+        for (mutype, dim), exp_mu in sorted(groups.items()):
+            group = subset(exp_mu, eff, bestfit)
+            yield ("compute_likelihood:" + exp_list + ":" + mutype +
+                   ":dim" + str(dim),
+                   lambda state: compute_likelihood(
+                       group[0], user_mu.user_mu_tot, group[1], group[2],
+                       table=group[3]),
+                   dict(repeat=repeat, number=20, list=exp_list,
+                        type=mutype, dim=dim, nexp=len(exp_mu)))
+
+        yield ("computelikelihood_batch:" + exp_list,
+               lambda state: compute_likelihood_batch(
+                   lilithcalc.exp_mu, batch_mu, eff, bestfit),
+               dict(repeat=repeat, list=exp_list, npoints=npoints))
+
+def scan_benchmarks(repeat):
+    CV = np.linspace(0.8, 1.2, 100)
+    CF = np.linspace(0.6, 1.4, 100)
+    model = lambda CV, CF: {"couplings": {"VV": CV, "ff": CF}}
+    filepath = os.path.join(lilith_dir, "data", "latest.list")
+    yield ("scan:CVCF:100x100",
+           lambda state: lilith.scan.grid(model, [CV, CF],
+                                          exp_filepath=filepath),
+           dict(repeat=repeat, list="latest.list", npoints=CV.size*CF.size))
+
+def main(argv):
+    try:
+        opts, args = getopt.gnu_getopt(argv, "ho:r:k:q",
+                                       ["help", "output=", "repeat=",
+                                        "select=", "quick"])
+    except getopt.GetoptError as err:
+        print(err)
+        print_usage()
+        sys.exit(1)
+
+    output = None
+    repeat = 5
+    select = ""
+    quick = False
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            print_usage()
+            sys.exit()
+        elif o in ("-o", "--output"):
+            output = a
+        elif o in ("-r", "--repeat"):
+            repeat = max(1, int(a))
+        elif o in ("-k", "--select"):
+            select = a
+        elif o in ("-q", "--quick"):
+            quick = True
+            repeat = 1
+
+    suites = [readexpinput_benchmarks, readuserinput_benchmarks,
+              couplings_benchmarks, likelihood_benchmarks]
+    if not quick:
+        suites.append(scan_benchmarks)
+
+    results = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for suite in suites:
+            for name, fn, options in suite(repeat):
+                if select not in name:
+                    continue
+                result = measure(name, fn, **options)
+                results.append(result)
+                sys.stderr.write("%-50s %12.3e s\n" %
+                                 (result["name"], result["median"]))
+
+    report = {"metadata": metadata(), "benchmarks": results}
+    if output is None:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -60,6 +60,7 @@ print("Experimental input:", myexpinput)
 ######################################################################
 # * usrXMLinput: generate XML user input
 # * getL:        -2LogL for a given (CV, CF) point
+# * getLgrad:    gradient of -2LogL with respect to (CV, CF)
 ######################################################################
 
 def usrXMLinput(mh=125., CV=1., CF=1., precision="BEST-QCD"):
@@ -103,6 +104,14 @@ def getL(CV, CF):
     lilithcalc.computelikelihood(userinput=myXML_user_input)
     return lilithcalc.l
 
+def getLgrad(CV, CF):
+    couplings = {"tt": CF, "bb": CF, "tautau": CF, "cc": CF, "WW": CV, "ZZ": CV}
+    l, grad = lilithcalc.computegradient(couplings, mass=myhmass,
+                                         precision=myprecision)
+    grad = dict(zip(couplings, grad))
+    return [sum(grad[c] for c in ("WW", "ZZ")),
+            sum(grad[c] for c in ("tt", "bb", "tautau", "cc"))]
+
 
 ######################################################################
 # Calculations
@@ -117,9 +126,9 @@ print("\n***** performing model fit: migrad, hesse, minos *****")
 
 # Initialize the fit; parameter starting values and limits
 if iminuit_version_f < 2.0:
-  m = Minuit(getL, CV=1, limit_CV=(0,3), CF=1, limit_CF=(0,3), print_level=0, errordef=1, error_CV=0.2, error_CF=0.2)
+  m = Minuit(getL, grad=getLgrad, CV=1, limit_CV=(0,3), CF=1, limit_CF=(0,3), print_level=0, errordef=1, error_CV=0.2, error_CF=0.2)
 else:
-  m = Minuit(getL, CV=1, CF=1)
+  m = Minuit(getL, grad=getLgrad, CV=1, CF=1)
   m.limits = [(0, 3), (0, 3)]
   m.errordef = 1 # 1 for -2LogL (or least square), 0.5 for -LogL 
   m.errors = [0.2, 0.2]
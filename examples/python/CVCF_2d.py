@@ -50,145 +50,126 @@ CF_max = 1.4
 # Number of grid steps in each of the two dimensions (squared grid)
 grid_subdivisions = 100
 
+# Number of worker processes for the scan
+workers = 4
+
 ######################################################################
-# * usrXMLinput: generate XML user input
+# * model: reduced couplings as a function of CV, CF
 ######################################################################
 
-def usrXMLinput(mass=125.09, CV=1, CF=1, precision="BEST-QCD"):
-    """generate XML input from reduced couplings CV, CF"""
-    
-    myInputTemplate = """<?xml version="1.0"?>
-
-<lilithinput>
-
-<reducedcouplings>
-  <mass>%(mass)s</mass>
-
-  <C to="tt">%(CF)s</C>
-  <C to="bb">%(CF)s</C>
-  <C to="cc">%(CF)s</C>
-  <C to="tautau">%(CF)s</C>
-  <C to="ZZ">%(CV)s</C>
-  <C to="WW">%(CV)s</C>
-
-  <extraBR>
-    <BR to="invisible">0.</BR>
-    <BR to="undetected">0.</BR>
-  </extraBR>
-
-  <precision>%(precision)s</precision>
-</reducedcouplings>
+def model(CV, CF):
+    """reduced couplings from CV, CF (arrays of values)"""
 
-</lilithinput>
-"""
-    myInput = {'mass':mass, 'CV':CV, 'CF':CF, 'precision':precision}
-        
-    return myInputTemplate%myInput
+    couplings = {"tt": CF, "bb": CF, "cc": CF, "tautau": CF,
+                 "ZZ": CV, "WW": CV}
+    return {"couplings": couplings, "mass": hmass, "precision": my_precision}
 
-######################################################################
-# Scan initialization
-######################################################################
+# the scan runs under the __main__ guard since, with the spawn start method
+# (default on macOS and Windows), the worker processes import this script
+if __name__ == "__main__":
 
-print("***** scan initialization *****")
+    ######################################################################
+    # Scan initialization
+    ######################################################################
 
-# Prepare output
-fresults = open(output, 'w')
+    print("***** scan initialization *****")
 
-# Initialize a Lilith object
-lilithcalc = lilith.Lilith(verbose=False,timer=False)
-# Read experimental data
-lilithcalc.readexpinput(exp_input)
+    CV_values = np.linspace(CV_min, CV_max, grid_subdivisions)
+    CF_values = np.linspace(CF_min, CF_max, grid_subdivisions)
 
+    # Lilith object, only needed here for the database version
+    lilithcalc = lilith.Lilith(verbose=False,timer=False)
+    lilithcalc.readdbversion()
 
-######################################################################
-# Scan routine
-######################################################################
 
-m2logLmin=10000
-max=-1
+    ######################################################################
+    # Scan routine
+    ######################################################################
 
-print("***** running scan *****")
+    print("***** running scan *****")
 
-for CV in np.linspace(CV_min, CV_max, grid_subdivisions):
-    fresults.write('\n')
-    for CF in np.linspace(CF_min, CF_max, grid_subdivisions):
-        myXML_user_input = usrXMLinput(hmass, CV=CV, CF=CF, precision=my_precision)
-        lilithcalc.computelikelihood(userinput=myXML_user_input)
-        m2logL = lilithcalc.l
-        if m2logL < m2logLmin:
-            m2logLmin = m2logL
-            CVmin = CV
-            CFmin = CF
-        fresults.write('%.5f    '%CV +'%.5f    '%CF + '%.5f     '%m2logL + '\n')
+    # the experimental data are read once per worker process
+    m2logL = lilith.scan.grid(model, [CV_values, CF_values], workers=workers,
+                              exp_filepath=exp_input, progress=True)
 
-fresults.close()
+    imin, jmin = np.unravel_index(np.argmin(m2logL), m2logL.shape)
+    CVmin = CV_values[imin]
+    CFmin = CF_values[jmin]
+    m2logLmin = m2logL[imin, jmin]
 
-print("***** scan finalized *****")
-print("minimum at CV, CF, -2logL_min = ", CVmin, CFmin, m2logLmin)
+    # Write output
+    fresults = open(output, 'w')
+    for i, CV in enumerate(CV_values):
+        fresults.write('\n')
+        for j, CF in enumerate(CF_values):
+            fresults.write('%.5f    '%CV +'%.5f    '%CF + '%.5f     '%m2logL[i, j] + '\n')
+    fresults.close()
 
-######################################################################
-# Plot routine
-######################################################################
+    print("***** scan finalized *****")
+    print("minimum at CV, CF, -2logL_min = ", CVmin, CFmin, m2logLmin)
 
+    ######################################################################
+    # Plot routine
+    ######################################################################
 
-print("***** plotting *****")
 
-# Preparing plot
-matplotlib.rcParams['xtick.major.pad'] = 15
-matplotlib.rcParams['ytick.major.pad'] = 15
+    print("***** plotting *****")
 
-fig = plt.figure()
-ax = fig.add_subplot(111)
+    # Preparing plot
+    matplotlib.rcParams['xtick.major.pad'] = 15
+    matplotlib.rcParams['ytick.major.pad'] = 15
 
-plt.minorticks_on()
-plt.tick_params(labelsize=20, length=14, width=2)
-plt.tick_params(which='minor', length=7, width=1.2)
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
 
+    plt.minorticks_on()
+    plt.tick_params(labelsize=20, length=14, width=2)
+    plt.tick_params(which='minor', length=7, width=1.2)
 
-# Getting the data
-data = np.genfromtxt(output)
 
-x = data[:,0]
-y = data[:,1]
-z = data[:,2]
+    # Getting the data
+    data = np.genfromtxt(output)
 
-# Substracting the -2LogL minimum to form Delta(-2LogL)
-z2=[]
-for z_el in z:
-  z2.append(z_el-z.min())
+    x = data[:,0]
+    y = data[:,1]
+    z = data[:,2]
 
-# Interpolating the grid
-xi = np.linspace(x.min(), x.max(), grid_subdivisions)
-yi = np.linspace(y.min(), y.max(), grid_subdivisions)
+    # Substracting the -2LogL minimum to form Delta(-2LogL)
+    z2=[]
+    for z_el in z:
+      z2.append(z_el-z.min())
 
-X, Y = np.meshgrid(xi, yi)
-Z = griddata((x, y), z2, (X, Y), method="linear")
+    # Interpolating the grid
+    xi = np.linspace(x.min(), x.max(), grid_subdivisions)
+    yi = np.linspace(y.min(), y.max(), grid_subdivisions)
 
-# Plotting the 68%, 95% and 99.7% CL regions
-ax.contourf(xi,yi,Z,[10**(-10),2.3,5.99,11.83],colors=['#ff3300','#ffa500','#ffff00'], \
-              vmin=0, vmax=20, origin='lower', extent=[x.min(), x.max(), y.min(), y.max()])
+    X, Y = np.meshgrid(xi, yi)
+    Z = griddata((x, y), z2, (X, Y), method="linear")
 
-ax.set_aspect((CV_max-CV_min)/(CF_max-CF_min))
+    # Plotting the 68%, 95% and 99.7% CL regions
+    ax.contourf(xi,yi,Z,[10**(-10),2.3,5.99,11.83],colors=['#ff3300','#ffa500','#ffff00'], \
+                  vmin=0, vmax=20, origin='lower', extent=[x.min(), x.max(), y.min(), y.max()])
 
-# best fit point
-plt.plot([CVmin],[CFmin], '*', c='w', ms=10)
+    ax.set_aspect((CV_max-CV_min)/(CF_max-CF_min))
 
-# Standard Model 
-plt.plot([1],[1], '+', c='k', ms=10)
+    # best fit point
+    plt.plot([CVmin],[CFmin], '*', c='w', ms=10)
 
-# Title, labels, color bar...
-plt.title("  Lilith-"+str(lilith.__version__)+", DB "+str(lilithcalc.dbversion), fontsize=14.5, ha="left")
-plt.xlabel(r'$C_V$',fontsize=25)
-plt.ylabel(r'$C_F$',fontsize=25)
-plt.text(0.83, 0.75, r'Exp. input:'+exp_input, fontsize=12)
+    # Standard Model 
+    plt.plot([1],[1], '+', c='k', ms=10)
 
-fig.set_tight_layout(True)
+    # Title, labels, color bar...
+    plt.title("  Lilith-"+str(lilith.__version__)+", DB "+str(lilithcalc.dbversion), fontsize=14.5, ha="left")
+    plt.xlabel(r'$C_V$',fontsize=25)
+    plt.ylabel(r'$C_F$',fontsize=25)
+    plt.text(0.83, 0.75, r'Exp. input:'+exp_input, fontsize=12)
 
-#plt.show()
+    fig.set_tight_layout(True)
 
-# Saving figure (.pdf)
-fig.savefig(outputplot)
+    #plt.show()
 
-print("results are stored in", lilith_dir + "/results")
-print("***** done *****")
+    # Saving figure (.pdf)
+    fig.savefig(outputplot)
 
+    print("results are stored in", lilith_dir + "/results")
+    print("***** done *****")
@@ -11,12 +11,13 @@
 # 1-dimensional likelihood profiles are obtained from a
 # profile-likelihood analysis
 #
-# Uses iminuit (fitting) and matplotlib (plotting)
+# Uses iminuit (fitting), lilith.fit (profiles) and matplotlib (plotting)
 #
 ###############################################################
 
 import sys, os
 import matplotlib.pyplot as plt
+import numpy as np
 import iminuit
 from iminuit import Minuit
 import matplotlib
@@ -53,48 +54,16 @@ verbose=False
 timer=False
 
 ######################################################################
-# * usrXMLinput: generate XML user input
-# * getL:        -2LogL for a given (CGa, Cg, BRinv) point
+# * model: reduced couplings for a given (CGa, Cg, BRinv) point
+# * getL:  -2LogL for a given (CGa, Cg, BRinv) point
 ######################################################################
 
-def usrXMLinput(mh=125., CGa=1., Cg=1., BRinv=0., precision="BEST-QCD"):
-    """generate XML input from reduced couplings
-       the gamma-gamma and/or gluon-gluon couplings are 
-       evaluated as functions of the fermionic and bosonic
-       reduced couplings """
-    
-    myInputTemplate = """<?xml version="1.0"?>
-
-<lilithinput>
-
-<reducedcouplings>
-  <mass>%(mh)s</mass>
-  
-  <C to="ff">1.</C>
-  <C to="VV">1.</C>
-  <C to="gammagamma">%(CGa)s</C>
-  <C to="gg">%(Cg)s</C>
-  
-  <extraBR>
-    <BR to="invisible">%(BRinv)s</BR>
-    <BR to="undetected">0.</BR>
-  </extraBR>
-  
-  <precision>%(precision)s</precision>
-</reducedcouplings>
-
-</lilithinput>
-"""
-    myInput = {'mh':mh, 'CGa':CGa, 'Cg':Cg, 'BRinv':BRinv, 'precision':precision}
-        
-    return myInputTemplate%myInput
-
-
+def model(CGa, Cg, BRinv):
+    return {"couplings": {"gammagamma": CGa, "gg": Cg}, "mass": myhmass,
+            "precision": myprecision, "BRinvisible": BRinv}
 
 def getL(CGa, Cg, BRinv):
-    myXML_user_input = usrXMLinput(mh=myhmass, CGa=CGa, Cg=Cg, BRinv=BRinv, precision=myprecision)
-    lilithcalc.computelikelihood(userinput=myXML_user_input)
-    return lilithcalc.l
+    return fit.evaluate([CGa, Cg, BRinv])[0]
 
 
 ######################################################################
@@ -103,12 +72,11 @@ def getL(CGa, Cg, BRinv):
 
 print("***** initializating *****")
 
-# Initialize a Lilith object
-lilithcalc = lilith.Lilith(verbose, timer)
-# Read experimental data
-lilithcalc.readexpinput(myexpinput)
-
 # Initialize the fit; parameter starting values and limits
+fit = lilith.fit.Fit(model, {"CGa": 1, "Cg": 1, "BRinv": 0.2},
+                     bounds={"CGa": (0, 3), "Cg": (0, 3), "BRinv": (0, 0.9)},
+                     exp_filepath=myexpinput)
+
 if iminuit_version_f < 2.0:
   m = Minuit(getL, CGa=1, limit_CGa=(0,3), Cg=1, limit_Cg=(0,3), BRinv=0.2, limit_BRinv=(0,0.9), errordef=1, error_CGa=0.1, error_Cg=0.1, error_BRinv=0.1)
 else:
@@ -138,28 +106,18 @@ else:
   print("\nCorrelation matrix:\n", m.covariance.correlation())
   print("\nCovariance matrix:\n", m.covariance)
 
-# Display parameter values at the best-fit point
-#print "Best-fit point: -2LogL =", m.fval
-#print "Cgamma =", m.values["CGa"], ", Cgluon =", m.values["Cg"], ", BRinv =", m.values["BRinv"],"\n"
-
 print("\n***** getting the 1d likelihood profiles *****")
 # Profiling for CGa
-if iminuit_version_f < 2.0:
-  xGa,yGa,rGa = m.mnprofile('CGa', bins=300, bound=(0, 2), subtract_min=True)
-else:
-  xGa,yGa,rGa = m.mnprofile('CGa', size=300, bound=(0, 2), subtract_min=True)
+xGa = np.linspace(0, 2, 300)
+yGa, rGa = fit.profile('CGa', xGa, subtract_min=True)
 
-# Profiling for Ca
-if iminuit_version_f < 2.0:
-  xg,yg,rg = m.mnprofile('Cg', bins=300, bound=(0, 2), subtract_min=True)
-else:
-  xg,yg,rg = m.mnprofile('Cg', size=300, bound=(0, 2), subtract_min=True)
+# Profiling for Cg
+xg = np.linspace(0, 2, 300)
+yg, rg = fit.profile('Cg', xg, subtract_min=True)
 
 # Profiling for BRinv
-if iminuit_version_f < 2.0:
-  xBR,yBR,rBR = m.mnprofile('BRinv', bins=300, bound=(0., 0.5), subtract_min=True)
-else:
-  xBR,yBR,rBR = m.mnprofile('BRinv', size=300, bound=(0., 0.5), subtract_min=True)
+xBR = np.linspace(0., 0.5, 300)
+yBR, rBR = fit.profile('BRinv', xBR, subtract_min=True)
 
 
 ######################################################################
@@ -189,7 +147,7 @@ plt.axhline(y=4.,color='k',ls='dashed')
 plt.axhline(y=9.,color='k',ls='dashed')
 plt.legend(loc='upper right', fontsize=24)
 
-plt.title("   Lilith "+str(lilith.__version__)+", DB "+str(lilithcalc.dbversion), fontsize=20, ha="left")
+plt.title("   Lilith "+str(lilith.__version__)+", DB "+str(fit.lilithcalc.dbversion), fontsize=20, ha="left")
 
 ax = fig.add_subplot(122)
 
@@ -206,7 +164,7 @@ plt.axhline(y=1.,color='k',ls='dashed')
 plt.axhline(y=4.,color='k',ls='dashed')
 plt.axhline(y=9.,color='k',ls='dashed')
 
-plt.title("   Lilith "+str(lilith.__version__)+", DB "+str(lilithcalc.dbversion), fontsize=20, ha="left")
+plt.title("   Lilith "+str(lilith.__version__)+", DB "+str(fit.lilithcalc.dbversion), fontsize=20, ha="left")
 
 fig.set_tight_layout(True)
 fig.savefig(outputplot)
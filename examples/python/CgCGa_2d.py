@@ -50,39 +50,6 @@ CGa_max = 1.3
 # Number of grid steps in each of the two dimensions (squared grid)
 grid_subdivisions = 100
 
-######################################################################
-# * usrXMLinput: generate XML user input
-######################################################################
-
-def usrXMLinput(mass=125.09, CGa=1, Cg=1, precision="BEST-QCD"):
-    """generate XML input from reduced couplings CV, CF"""
-    
-    myInputTemplate = """<?xml version="1.0"?>
-
-<lilithinput>
-
-<reducedcouplings>
-  <mass>%(mass)s</mass>
-
-  <C to="ff">1.</C>
-  <C to="VV">1.</C>
-  <C to="gammagamma">%(CGa)s</C>
-  <C to="gg">%(Cg)s</C>
-
-  <extraBR>
-    <BR to="invisible">0.</BR>
-    <BR to="undetected">0.</BR>
-  </extraBR>
-
-  <precision>%(precision)s</precision>
-</reducedcouplings>
-
-</lilithinput>
-"""
-    myInput = {'mass': mass, 'CGa': CGa, 'Cg': Cg, 'precision': precision}
-        
-    return myInputTemplate%myInput
-
 ######################################################################
 # Scan initialization
 ######################################################################
@@ -110,8 +77,10 @@ print("***** running scan *****")
 for Cg in np.linspace(Cg_min, Cg_max, grid_subdivisions):
     fresults.write('\n')
     for CGa in np.linspace(CGa_min, CGa_max, grid_subdivisions):
-        myXML_user_input = usrXMLinput(hmass, CGa=CGa, Cg=Cg, precision=my_precision)
-        lilithcalc.computelikelihood(userinput=myXML_user_input)
+        # set the reduced couplings directly, without generating XML input
+        lilithcalc.set_reducedcouplings(mass=hmass, precision=my_precision,
+                                        ff=1., VV=1., gammagamma=CGa, gg=Cg)
+        lilithcalc.computelikelihood()
         m2logL = lilithcalc.l
         if m2logL < m2logLmin:
             m2logLmin = m2logL
@@ -18,14 +18,13 @@ import matplotlib.pyplot as plt
 import matplotlib
 import numpy as np
 
-from math import floor, log, sqrt, sin, cos, atan
-from cmath import sqrt as csqrt
-from cmath import asin as casin
+from math import floor, log, sin, cos, atan
 
 lilith_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(lilith_dir)
 sys.path.append('../..')
 import lilith
+from lilith.internal.reducedcouplingslo import A0, A12, A1
 
 
 ######################################################################
@@ -73,26 +72,11 @@ mc = 1.4
 mtau = 1.777
 sW2 = 0.23116
 
-def fhiggs(t):
-    if t<=1.:
-        return casin(sqrt(t))**2.
-    else:
-        return -(log((sqrt(t)+sqrt(t-1.))/(sqrt(t)-sqrt(t-1.)))-pi*1j)**2./4.
-
-def A0(tau):
-    return -1./tau *(1.-1./tau * fhiggs(tau))
-
-def A12(tau):
-    return 2./tau *(1.+(1.-1./tau) * fhiggs(tau))
-
-def A1(tau):
-    return -(3.*tau+2.*tau**2. +3.*(2.*tau-1.) * fhiggs(tau))/tau**2
-
-
 def get_CGa(m1, m2, theta):
   """ 
       Returns CGa computed from the SM particles contribution plus 
       staus contribution assuming decoupling of other states.
+      The stau masses may be arrays.
   """
 
   A12t = A12((hmass/(2.*mt))**2.)
@@ -114,7 +98,7 @@ def get_CGa(m1, m2, theta):
   stau_amplitude = g1/m1**2.*A0((hmass/(2.*m1))**2.) \
                  + g2/m2**2.*A0((hmass/(2.*m2))**2.)
   
-  return sqrt( abs(SM_amplitude + stau_amplitude)**2./abs(SM_amplitude)**2. )
+  return np.sqrt( abs(SM_amplitude + stau_amplitude)**2./abs(SM_amplitude)**2. )
 
 
 
@@ -184,8 +168,8 @@ print("***** running scan *****")
 
 for theta in np.linspace(theta_min, theta_max, grid_subdivisions):
     fresults.write('\n')
-    for m2 in np.linspace(m2_min, m2_max, grid_subdivisions):
-        CGa = get_CGa(m1_fixed, m2, theta)
+    m2_values = np.linspace(m2_min, m2_max, grid_subdivisions)
+    for m2, CGa in zip(m2_values, get_CGa(m1_fixed, m2_values, theta)):
         myXML_user_input = usrXMLinput(hmass, CGa=CGa, precision=my_precision)
         lilithcalc.computelikelihood(userinput=myXML_user_input)
         m2logL = lilithcalc.l
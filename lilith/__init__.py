@@ -32,6 +32,7 @@ from .errors import \
     UserInputIOError
 
 from .main import Lilith
+from . import scan, fit
 from .version import __version__
 
 __all__ = ['Lilith', 'LilithError', 'UserInputError', 'HiggsMassError',
@@ -36,6 +36,11 @@ class ExpInputError(LilithError):
         super(ExpInputError, self).__init__(
             "in file " + filepath + ", " + error)
         self.filepath = filepath
+        self.error = error
+
+    def __reduce__(self):
+        # raised in the worker processes reading the experimental input
+        return (ExpInputError, (self.filepath, self.error))
 
 class ExpInputIOError(LilithError):
     """Exception class in case of error when reading the experimental input
@@ -0,0 +1,304 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Best fits, profile likelihoods and likelihood contours over named model
+parameters."""
+
+import multiprocessing
+import numpy as np
+from scipy import optimize
+from .main import Lilith
+from .errors import LilithError
+from .internal import brsm as BR_SM
+from .internal import formfactortable as FFTable
+from .internal.memo import MemoCache
+
+# Fit object of a worker process
+_worker = {}
+
+def _init_worker(model_fn, start, bounds, exp_filepath, cachedir, vectorized,
+                 step, decimals, cachesize):
+    """Build the Fit object, and thus read the experimental input, once per
+    worker process."""
+
+    _worker["fit"] = Fit(model_fn, start, bounds, exp_filepath, cachedir,
+                         vectorized, step, decimals, cachesize)
+
+def _run_path(args):
+    """Minimize along a path of fixed parameter values."""
+
+    return _worker["fit"].minimize_path(*args)
+
+class Fit:
+    """Minimization of -2log(likelihood) over named model parameters.
+
+    model_fn is called with the model parameters as keyword arguments and
+    returns the keyword arguments of Lilith.computelikelihood_batch, for
+    instance
+        lambda CV, CF: {"couplings": {"VV": CV, "ff": CF}}
+    If vectorized is True, the parameters are arrays of values and several
+    points are computed in a single call to the Lilith object, otherwise
+    model_fn is called point by point. With workers > 1 in profile and
+    contour, model_fn must be picklable (a module-level function, not a
+    lambda), as for lilith.scan.grid. start maps the parameter names to
+    their starting values, bounds maps some of them to (lower, upper)
+    limits, None standing for no limit; the lower limit must be below the
+    upper one.
+
+    The experimental input (exp_filepath or the default list) is read
+    once. The last cachesize evaluated points are cached, with parameter
+    values rounded to decimals, and the gradient is obtained by finite differences with
+    relative step, computed in one call."""
+
+    def __init__(self, model_fn, start, bounds=None, exp_filepath=None,
+                 cachedir=None, vectorized=True, step=1e-6, decimals=12,
+                 cachesize=100000):
+        self.model_fn = model_fn
+        self.names = list(start)
+        self.start = np.array([float(start[name]) for name in self.names])
+        self.lower = np.full(len(self.names), -np.inf)
+        self.upper = np.full(len(self.names), np.inf)
+        for name, (lower, upper) in list((bounds or {}).items()):
+            if name not in self.names:
+                raise LilithError('parameter "' + name + '" has no ' +
+                                  'starting value')
+            if lower is not None:
+                self.lower[self.names.index(name)] = lower
+            if upper is not None:
+                self.upper[self.names.index(name)] = upper
+            if self.lower[self.names.index(name)] >= \
+               self.upper[self.names.index(name)]:
+                raise LilithError('the lower limit of parameter "' + name +
+                                  '" should be below its upper limit')
+        self.initargs = (model_fn, dict(start), bounds, exp_filepath,
+                         cachedir, vectorized, step, decimals, cachesize)
+        self.vectorized = vectorized
+        self.step = step
+        self.decimals = decimals
+
+        self.lilithcalc = Lilith(cachedir=cachedir)
+        if exp_filepath is None:
+            self.lilithcalc.readexpinput()
+        else:
+            self.lilithcalc.readexpinput(exp_filepath)
+
+        self.cache = MemoCache(cachesize)
+        self.ncalls = 0
+        self.bestfit = None
+
+    def index(self, name):
+        """Position of the parameter name."""
+
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise LilithError('unknown parameter "' + name + '"')
+
+    def evaluate(self, points):
+        """-2log(likelihood) for an array of points of shape (npoints,
+        nparams), the parameters being ordered as in self.names."""
+
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        keys = [tuple(point) for point in np.round(points, self.decimals)]
+        l = np.array([self.cache.get(key) for key in keys], dtype=float)
+        missing = np.flatnonzero(np.isnan(l)).tolist()
+        if self.lilithcalc.stats is not None:
+            self.lilithcalc.stats.record_cache(
+                "fit", hits=len(keys) - len(missing), misses=len(missing))
+        if missing:
+            self.ncalls += len(missing)
+            if self.vectorized:
+                params = dict((name, points[missing, i])
+                              for i, name in enumerate(self.names))
+                l[missing] = np.broadcast_to(
+                    self.lilithcalc.computelikelihood_batch(
+                        **self.model_fn(**params)), (len(missing),))
+            else:
+                l[missing] = [self.lilithcalc.computelikelihood_batch(
+                    **self.model_fn(**dict(zip(self.names, points[i]))))
+                              for i in missing]
+            for i in missing:
+                self.cache.set(keys[i], float(l[i]))
+        return l
+
+    def _value_and_gradient(self, x, free, point):
+        """-2log(likelihood) and its gradient with respect to the free
+        parameters, the other ones being taken from point."""
+
+        nfree = len(free)
+        h = self.step*np.maximum(1., np.abs(x))
+        # the differences are one-sided at the limits
+        xup = np.minimum(x + h, self.upper[free])
+        xdown = np.maximum(x - h, self.lower[free])
+        points = np.tile(point, (2*nfree + 1, 1))
+        points[:, free] = x
+        points[1 + np.arange(nfree), free] = xup
+        points[1 + nfree + np.arange(nfree), free] = xdown
+
+        l = self.evaluate(points)
+        return l[0], (l[1:nfree+1] - l[nfree+1:])/(xup - xdown)
+
+    def minimize(self, fixed=None, start=None, tol=None):
+        """Minimizes -2log(likelihood) with the parameters in fixed (a dict
+        of values) held fixed, starting from start (the starting values by
+        default). Returns the dict of parameter values at the minimum and
+        the minimal value."""
+
+        point = self.start.copy() if start is None else \
+            np.array([float(start[name]) for name in self.names])
+        fixed = fixed or {}
+        for name in fixed:
+            point[self.index(name)] = fixed[name]
+        free = [i for i, name in enumerate(self.names) if name not in fixed]
+
+        point, lmin = self._minimize(point, free, tol)
+        if not fixed:
+            self.bestfit = (point, lmin)
+        return dict(zip(self.names, point.tolist())), float(lmin)
+
+    def _minimize(self, point, free, tol=None):
+        """Minimizes over the free parameters from point."""
+
+        point = np.array(point, dtype=float)
+        if not free:
+            return point, self.evaluate(point)[0]
+        x0 = np.clip(point[free], self.lower[free], self.upper[free])
+        bounds = [(None if np.isinf(lower) else lower,
+                   None if np.isinf(upper) else upper)
+                  for lower, upper in zip(self.lower[free], self.upper[free])]
+        result = optimize.minimize(self._value_and_gradient, x0,
+                                   args=(free, point), jac=True,
+                                   method="L-BFGS-B", bounds=bounds, tol=tol)
+        point[free] = result.x
+        return point, result.fun
+
+    def minimize_path(self, fixed, values, start):
+        """Minimizes successively at the points of values (array of shape
+        (npoints, len(fixed))) of the fixed parameters, starting each
+        minimization from the minimum of the previous point. Returns the
+        minimal values and the parameters at the minimum."""
+
+        fixedindex = [self.index(name) for name in fixed]
+        free = [i for i in range(len(self.names)) if i not in fixedindex]
+        l = np.empty(len(values))
+        points = np.empty((len(values), len(self.names)))
+        point = np.array(start, dtype=float)
+        for k, value in enumerate(values):
+            point[fixedindex] = value
+            point, l[k] = self._minimize(point, free)
+            points[k] = point
+        return l, points
+
+    def _run_paths(self, fixed, paths, workers):
+        """Minimizes along the paths, each a list of values of the fixed
+        parameters, each path starting from the best-fit point."""
+
+        if self.bestfit is None:
+            self.minimize()
+        start = self.bestfit[0]
+        tasks = [(fixed, values, start) for values in paths]
+        if workers == 1 or len(tasks) == 1:
+            return [self.minimize_path(*task) for task in tasks]
+
+        # with the fork start method, the interpolating functions loaded
+        # here are inherited by the workers
+        BR_SM.preload()
+        FFTable.get_table()
+        pool = multiprocessing.Pool(workers, _init_worker, self.initargs)
+        try:
+            return pool.map(_run_path, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def profile(self, name, values, workers=1, subtract_min=False):
+        """Profile of -2log(likelihood) along the parameter name, minimizing
+        over the other parameters at each of values. The minimizations
+        start from the best-fit point and proceed outwards, each being
+        started from the minimum of its neighbour. With workers > 1, the
+        values are split into segments which are computed in parallel.
+        Returns the profile and the dict of parameters along the profile."""
+
+        values = np.asarray(values, dtype=float)
+        workers = max(1, int(workers))
+        if self.bestfit is None:
+            self.minimize()
+        i0 = int(np.argmin(np.abs(values - self.bestfit[0][self.index(name)])))
+
+        # walks from the best fit to the upper and lower ends
+        walks = [np.arange(i0, len(values)), np.arange(i0 - 1, -1, -1)]
+        size = -(-len(values) // workers)
+        paths = [walk[k:k+size] for walk in walks
+                 for k in range(0, len(walk), size)]
+        results = self._run_paths([name], [values[path][:,np.newaxis]
+                                           for path in paths], workers)
+
+        l = np.empty(len(values))
+        points = np.empty((len(values), len(self.names)))
+        for path, (l_path, points_path) in zip(paths, results):
+            l[path] = l_path
+            points[path] = points_path
+        if subtract_min:
+            l -= min(l.min(), self.bestfit[1])
+        return l, dict(zip(self.names, points.T))
+
+    def contour(self, xname, xvalues, yname, yvalues, workers=1,
+                subtract_min=False):
+        """Profile of -2log(likelihood) on the grid of xvalues and yvalues of
+        the parameters xname and yname, as an array of shape
+        (len(xvalues), len(yvalues)). The grid is walked row by row, back
+        and forth, warm-starting each minimization from the neighbouring
+        point; with workers > 1 blocks of rows are computed in parallel.
+        Returns the profile and the dict of parameters on the grid."""
+
+        xvalues = np.asarray(xvalues, dtype=float)
+        yvalues = np.asarray(yvalues, dtype=float)
+        workers = max(1, int(workers))
+        ny = len(yvalues)
+
+        paths = []
+        for rows in np.array_split(np.arange(len(xvalues)), workers):
+            if len(rows):
+                paths.append(np.concatenate(
+                    [i*ny + (np.arange(ny) if k % 2 == 0 else
+                             np.arange(ny - 1, -1, -1))
+                     for k, i in enumerate(rows)]))
+        grid = np.stack(np.meshgrid(xvalues, yvalues, indexing="ij"),
+                        axis=-1).reshape(-1, 2)
+        results = self._run_paths([xname, yname],
+                                  [grid[path] for path in paths], workers)
+
+        l = np.empty(len(grid))
+        points = np.empty((len(grid), len(self.names)))
+        for path, (l_path, points_path) in zip(paths, results):
+            l[path] = l_path
+            points[path] = points_path
+        if subtract_min:
+            l -= min(l.min(), self.bestfit[1])
+        shape = (len(xvalues), ny)
+        return l.reshape(shape), dict((name, points[:,i].reshape(shape))
+                                      for i, name in enumerate(self.names))
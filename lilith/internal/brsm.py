@@ -26,6 +26,7 @@
 ##########################################################################
 
 import os
+import threading
 import numpy as np
 from scipy.interpolate import UnivariateSpline
 from scipy.interpolate import interp1d
@@ -135,3 +136,41 @@ def getefftopfunctions(sqrts, spline_deg=3):
 
     return efftop
 # end of addition
+
+
+#### process-wide registry of the interpolating functions ####
+# the functions above read and interpolate the grids on every call; the
+# shared* functions below return the same objects to every caller of the
+# process (they should not be modified). Populating the registry before
+# forking worker processes lets them inherit it.
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _shared(getfunctions, *args):
+    key = (getfunctions.__name__,) + args
+    functions = _registry.get(key)
+    if functions is None:
+        with _registry_lock:
+            functions = _registry.get(key)
+            if functions is None:
+                functions = getfunctions(*args)
+                _registry[key] = functions
+    return functions
+
+def sharedBRfunctions():
+    return _shared(getBRfunctions)
+
+def sharedeffVVHfunctions(sqrts):
+    return _shared(geteffVVHfunctions, sqrts)
+
+def sharedefftopfunctions(sqrts):
+    return _shared(getefftopfunctions, sqrts)
+
+def preload():
+    """Populate the registry with all the interpolating functions."""
+
+    sharedBRfunctions()
+    for sqrts in [8, 13]:
+        sharedeffVVHfunctions(sqrts)
+        sharedefftopfunctions(sqrts)
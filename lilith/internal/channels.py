@@ -0,0 +1,101 @@
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+#
+##########################################################################
+
+"""Canonical layout of the (prod, decay) channels used for array-valued
+signal strengths: channel (prod, decay) is stored at index
+prod_index[prod]*n_decay + decay_index[decay]."""
+
+import numpy as np
+
+# production modes at 7/8 TeV (and Tevatron), followed by the production
+# modes for which dedicated 13 TeV reduced couplings are computed
+prod_modes = ["ggH", "VBF", "WH", "qqZH", "ggZH", "ttH", "tHq", "tHW", "bbH",
+              "ggH13", "VBF13", "tHq13", "tHW13", "ggZH13"]
+decay_modes = ["gammagamma", "ZZ", "WW", "bb", "cc", "tautau", "Zgamma",
+               "mumu", "gg", "invisible"]
+
+# production modes that are remapped to their 13 TeV counterpart for
+# experimental results that are neither from Tevatron nor from LHC Run 1
+prod_13TeV = {"ggH": "ggH13", "VBF": "VBF13", "tHq": "tHq13", "tHW": "tHW13",
+              "ggZH": "ggZH13"}
+sqrts_8TeV = ["1.96", "7", "8", "7.", "8.", "7.0", "8.0", "7+8"]
+
+n_prod = len(prod_modes)
+n_decay = len(decay_modes)
+n_channels = n_prod*n_decay
+
+prod_index = dict((prod, i) for i, prod in enumerate(prod_modes))
+decay_index = dict((decay, i) for i, decay in enumerate(decay_modes))
+
+def index(prod, decay):
+    """Position of the (prod, decay) channel in the canonical layout."""
+
+    return prod_index[prod]*n_decay + decay_index[decay]
+
+def remap(prod, sqrts):
+    """Production mode to be used for an experimental result at sqrts."""
+
+    if sqrts not in sqrts_8TeV and prod in prod_13TeV:
+        return prod_13TeV[prod]
+    return prod
+
+# (prod, decay) keys in the canonical order, and the keys taken instead
+# when the 13 TeV production modes are absent (signal strengths mode)
+keys = [(prod, decay) for prod in prod_modes for decay in decay_modes]
+base_prod = dict((prod13, prod) for prod, prod13 in list(prod_13TeV.items()))
+fallback_keys = [(base_prod.get(prod, prod), decay) for (prod, decay) in keys]
+
+def tovector(mu, npoints=None):
+    """Converts a dictionary of signal strengths indexed by (prod, decay)
+    into an array in the canonical layout, of shape (n_channels,) or
+    (npoints, n_channels) if the signal strengths are arrays of npoints
+    values. Production modes without 13 TeV entries (signal strengths
+    mode) take the same values at 13 TeV."""
+
+    if npoints is None:
+        return np.array([mu[key] if key in mu else mu[fallback_key]
+                         for key, fallback_key in zip(keys, fallback_keys)],
+                        dtype=float)
+
+    out = np.empty((npoints, n_channels))
+    for i, (key, fallback_key) in enumerate(zip(keys, fallback_keys)):
+        out[:, i] = mu[key] if key in mu else mu[fallback_key]
+    return out
+
+def todict(mu, extra=None):
+    """Dictionary view, indexed by (prod, decay), of signal strengths in the
+    canonical layout, of shape (n_channels,) or (npoints, n_channels), with
+    the entry "extra" if given."""
+
+    mu = np.asarray(mu)
+    if mu.ndim == 1:
+        out = dict(zip(keys, mu.tolist()))
+    else:
+        out = dict(zip(keys, np.moveaxis(mu, -1, 0)))
+    if extra is not None:
+        out["extra"] = extra
+    return out
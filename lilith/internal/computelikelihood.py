@@ -26,62 +26,124 @@
 ##########################################################################
 
 from ..errors import LikelihoodComputationError
+from . import channels
+from time import perf_counter
+import collections.abc
 import numpy as np
 
-def compute_likelihood(exp_mu, user_mu, user_mode):
-    """Computes the likelihood from experimental mu and user mu."""
-    likelihood_results = []
+def results_table(exp_mu):
+    """Metadata of the experimental results given in the results of
+    compute_likelihood, built once for exp_mu."""
+
+    return [{"experiment": mu["experiment"], "source": mu["source"],
+             "sqrts": mu["sqrts"], "dim": mu["dim"], "type": mu["type"],
+             "eff": mu["eff"]} for mu in exp_mu]
+
+
+class LikelihoodResults(collections.abc.Sequence):
+    """Results of compute_likelihood: the array l of the contributions of
+    the experimental results to -2log(likelihood), seen as a read-only
+    sequence of dictionaries holding the metadata of each experimental
+    result and its contribution "l". The dictionaries are only built when
+    accessed.
+
+    This replaces the list of dictionaries of former versions: results
+    compare equal to the equivalent list and can be concatenated with
+    lists, but cannot be modified in place. tolist() gives the former
+    list, e.g. for pickling it or for writing it as JSON."""
+
+    def __init__(self, table, l):
+        self.table = table
+        self.l = l
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        result = dict(self.table[i])
+        result["l"] = float(self.l[i])
+        return result
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (LikelihoodResults, list)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if isinstance(other, (LikelihoodResults, list)):
+            return self.tolist() + list(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return other + self.tolist()
+        return NotImplemented
+
+    def tolist(self):
+        """The results as a list of dictionaries."""
+
+        return list(self)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+
+def compute_likelihood(exp_mu, user_mu, eff, bestfit, stats=None,
+                       table=None, l_exp=None, total_only=False):
+    """Computes the likelihood from experimental mu and user mu.
+
+    user_mu is an array of shape (channels.n_channels,) in the canonical
+    channel layout or, for compatibility, a dictionary indexed by
+    (prod, decay). eff and bestfit are the efficiency matrix and the best-fit vector
+    compiled by ReadExpInput.compile. If stats (a Stats object) is given,
+    the cost of each experimental result is recorded.
+
+    Returns the LikelihoodResults, built on table (as given by
+    results_table(exp_mu), computed if not given), and -2log(likelihood).
+    The contributions of the experimental results are written in l_exp if
+    given, an array of len(exp_mu) values; with total_only, no results
+    are returned in place of the LikelihoodResults."""
+    if l_exp is None:
+        l_exp = np.empty(len(exp_mu))
     l = 0. # actually -2log(likelihood)
-    for mu in exp_mu:
-        # compute user mu value scaled to efficiencies
-        user_mu_effscaled = {}
-        try:
-            if mu["dim"] == 1:
-                user_mu_effscaled["x"] = 0.
-                for (prod,decay),eff_prod in list(mu["eff"]["x"].items()):
-                    if mu["sqrts"] not in ["1.96","7","8","7.","8.","7.0","8.0","7+8"]\
-                      and (prod == "ggH" or prod == "VBF" or prod == "tHq" or prod == "tHW" or prod == "ggZH"):
-                        if user_mode == "reducedcouplings":
-                            prod = prod + "13"
-                    user_mu_effscaled["x"] += eff_prod*user_mu[prod,decay]
-            elif mu["dim"] == 2:
-                user_mu_effscaled["x"] = 0.
-                for (prod,decay),eff_prod in list(mu["eff"]["x"].items()):
-                    if mu["sqrts"] not in ["1.96","7","8","7.","8.","7.0","8.0","7+8"]\
-                      and (prod == "ggH" or prod == "VBF" or prod == "tHq" or prod == "tHW" or prod == "ggZH"):
-                        if user_mode == "reducedcouplings":
-                            prod = prod + "13"
-                    user_mu_effscaled["x"] += eff_prod*user_mu[prod,decay]
-
-                user_mu_effscaled["y"] = 0.
-                for (prod,decay),eff_prod in list(mu["eff"]["y"].items()):
-                    if mu["sqrts"] not in ["1.96","7","8","7.","7.0","8.0","8.","7+8"]\
-                      and (prod == "ggH" or prod == "VBF" or prod == "tHq" or prod == "tHW" or prod == "ggZH"):
-                        if user_mode == "reducedcouplings":
-                            prod = prod + "13"
-                    user_mu_effscaled["y"] += eff_prod*user_mu[prod,decay]
-            elif mu["dim"] >= 3:
-                for i in range(1,mu["dim"]+1):
-                    d = "d" + str(i)
-                    user_mu_effscaled[d] = 0.
-                    for (prod,decay),eff_prod in list(mu["eff"][d].items()):
-                        if mu["sqrts"] not in ["1.96","7","8","7.","8.","7.0","8.0","7+8"]\
-                          and (prod == "ggH" or prod == "VBF" or prod == "tHq" or prod == "tHW" or prod == "ggZH"):
-                            if user_mode == "reducedcouplings":
-                                prod = prod + "13"
-                        user_mu_effscaled[d] += eff_prod*user_mu[prod,decay]
+    timed = stats is not None and stats.per_measurement
 
-        except KeyError as s:
-            if "s" in ["eff", "x", "y"]:
-                # the experimental mu dictionnary is not filled correctly
-                raise LikelihoodComputationError(
-                    'there are missing elements in exp_mu: key "' + str(s) +
-                    '" is not found')
-            else:
-                # the total user mu dictionnary is not filled correctly
-                raise LikelihoodComputationError(
-                    'there are missing elements in user_mu_tot: key "' +
-                    str(s) + '" is not found')
+    # compute user mu values scaled to efficiencies for all experimental
+    # results at once
+    if user_mu is None:
+        raise LikelihoodComputationError(
+            "the signal strengths have not been computed")
+    try:
+        if isinstance(user_mu, dict):
+            user_mu = channels.tovector(user_mu)
+        user_mu_vec = eff.dot(user_mu)
+    except KeyError as s:
+        # the total user mu dictionnary is not filled correctly
+        raise LikelihoodComputationError(
+            'there are missing elements in user_mu_tot: key "' +
+            str(s) + '" is not found')
+    user_mu_list = user_mu_vec.tolist()
+
+    for i, mu in enumerate(exp_mu):
+        if timed:
+            t0 = perf_counter()
+        axes = mu["axes"]
+        if mu["dim"] == 1:
+            user_mu_effscaled = {"x": user_mu_list[axes.start]}
+        elif mu["dim"] == 2:
+            user_mu_effscaled = {"x": user_mu_list[axes.start],
+                                 "y": user_mu_list[axes.start+1]}
+        else:
+            # difference to the best fit, as used for dim >= 3
+            mu_vec = user_mu_vec[axes] - bestfit[axes]
 
         try:
             # likelihood computation in case of a type="normal" (odinary Gaussian approximation)
@@ -104,13 +166,6 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
                              * (mu["bestfit"]["y"] - user_mu_effscaled["y"]))
 
                 elif mu["dim"] >= 3:
-                    mu_vec = np.array([user_mu_effscaled["d1"] - mu["bestfit"]["d1"],
-                                       user_mu_effscaled["d2"] - mu["bestfit"]["d2"],
-                                       user_mu_effscaled["d3"] - mu["bestfit"]["d3"]])
-                    for i in range(4,mu["dim"]+1):
-                        d = "d"+str(i)
-                        mu_vec = np.append(mu_vec,[user_mu_effscaled[d] - mu["bestfit"][d]])
-
                     cur_l = mu["param"]["inv_cov_m"].dot(mu_vec).dot(mu_vec.T)
 
             # likelihood computation in case of a type="variable normal"
@@ -149,15 +204,13 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
                     V2f = np.abs(V2 + V2e*(z2-z20))
                     cur_l = 1.0/(1-p**2)*((z1-z10)**2/V1f-2*p*(z1-z10)*(z2-z20)/np.sqrt(V1f*V2f)+(z2-z20)**2/V2f)
                 elif mu["dim"] >= 3:
-                    mu_vec = np.array([user_mu_effscaled["d1"] - mu["bestfit"]["d1"],
-                                       user_mu_effscaled["d2"] - mu["bestfit"]["d2"],
-                                       user_mu_effscaled["d3"] - mu["bestfit"]["d3"]])
-                    for i in range(4,mu["dim"]+1):
-                        d = "d"+str(i)
-                        mu_vec = np.append(mu_vec,[user_mu_effscaled[d] - mu["bestfit"][d]])
-
                     unc_sym = np.sqrt(np.abs(mu["param"]["VGau"] + mu["param"]["VGau_prime"]*mu_vec))
-                    cov_m = unc_sym*mu["param"]["corr_m"]*unc_sym.T
+                    # cov_m = unc_sym*corr_m*unc_sym.T, whose inverse is
+                    # obtained by rescaling the inverse of corr_m
+                    mu_vec_scaled = mu_vec/unc_sym[0]
+                    cur_l = mu["param"]["inv_corr_m"].dot(mu_vec_scaled).dot(mu_vec_scaled)
+## adding uncorrelated errors as below requires the inversion of
+## cov_m = unc_sym*mu["param"]["corr_m"]*unc_sym.T
 ##                    print("cor_m =",mu["param"]["corr_m"])
 ##                    print("cov_m =",cov_m)
 ## include theoretical errors with no correlations:
@@ -169,13 +222,12 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
 #                    corr_m_th = np.array([[1,0,0,0],[0,1,0,0],[0,0,1,0],[0,0,0,1]])
 #                    cov_m_th = unc_sym_th*corr_m_th*unc_sym_th.T
 
-                    cov_m_tot = cov_m # default option
 #                    cov_m_tot = cov_m + cov_m_th # include theoretical errors with no correlations
 ##                    print("cor_m_th =",corr_m_th)
 ##                    print("cov_m_th =",cov_m_th)
 ##                    print("cov_m_tot =",cov_m_tot)
-                    inv_cov_m = np.linalg.inv(cov_m_tot)
-                    cur_l = inv_cov_m.dot(mu_vec).dot(mu_vec.T)
+#                    inv_cov_m = np.linalg.inv(cov_m_tot)
+#                    cur_l = inv_cov_m.dot(mu_vec).dot(mu_vec.T)
 
             # likelihood computation in case of a type="variable normal 1"
             # following "Variable Gaussian 1", Barlow arXiv:physics/0406120v1, Eq. 15
@@ -215,15 +267,13 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
                     V2f = (V2 + V2e*(z2-z20))**2
                     cur_l = 1.0/(1-p**2)*((z1-z10)**2/V1f-2*p*(z1-z10)*(z2-z20)/np.sqrt(V1f*V2f)+(z2-z20)**2/V2f)
                 elif mu["dim"] >= 3:
-                    mu_vec = np.array([user_mu_effscaled["d1"] - mu["bestfit"]["d1"],
-                                       user_mu_effscaled["d2"] - mu["bestfit"]["d2"],
-                                       user_mu_effscaled["d3"] - mu["bestfit"]["d3"]])
-                    for i in range(4,mu["dim"]+1):
-                        d = "d"+str(i)
-                        mu_vec = np.append(mu_vec,[user_mu_effscaled[d] - mu["bestfit"][d]])
-
                     unc_sym = mu["param"]["SGau"] + mu["param"]["SGau_prime"]*mu_vec
-                    cov_m = unc_sym*mu["param"]["corr_m"]*unc_sym.T
+                    # cov_m = unc_sym*corr_m*unc_sym.T, whose inverse is
+                    # obtained by rescaling the inverse of corr_m
+                    mu_vec_scaled = mu_vec/unc_sym[0]
+                    cur_l = mu["param"]["inv_corr_m"].dot(mu_vec_scaled).dot(mu_vec_scaled)
+## adding uncorrelated or pdf errors as below requires the inversion of
+## cov_m = unc_sym*mu["param"]["corr_m"]*unc_sym.T
 ##                    print("cor_m =",mu["param"]["corr_m"])
 ##                    print("cov_m =",cov_m)
 ## full theoretical errors (incl pdf):
@@ -250,13 +300,12 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
 #                    corr_m_pdf = np.array([[1,0,0,0],[0,1,1,0],[0,1,1,0],[0,0,0,1]])
 #                    cov_m_pdf = unc_sym_pdf*corr_m_pdf*unc_sym_pdf.T
 
-                    cov_m_tot = cov_m # default option
 #                    cov_m_tot = cov_m + cov_m_th + cov_m_pdf # include theoretical, pdf errors
 ##                    print("cor_m_pdf =",corr_m_pdf)
 ##                    print("cov_m_pdf =",cov_m_pdf)
 ##                    print("cov_m_tot =",cov_m_tot)
-                    inv_cov_m = np.linalg.inv(cov_m_tot)
-                    cur_l = inv_cov_m.dot(mu_vec).dot(mu_vec.T)
+#                    inv_cov_m = np.linalg.inv(cov_m_tot)
+#                    cur_l = inv_cov_m.dot(mu_vec).dot(mu_vec.T)
 
             # likelihood computation in case of a type="Poisson"
             # following "Generalised Poisson" of Barlow, arXiv:physics/0406120v1, Eq. 10a
@@ -304,10 +353,10 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
             if mu["type"] == "f":
                 if mu["dim"] == 1:
 #                    cur_l = mu["Lxy"](user_mu_effscaled["x"]) - mu["LChi2min"]
-                    cur_l = mu["Lxy"](user_mu_effscaled["x"])
+                    cur_l = mu["Lgrid"].value(user_mu_effscaled["x"])
                 elif mu["dim"] == 2:
 #                    cur_l = mu["Lxy"](user_mu_effscaled["x"],user_mu_effscaled["y"])[0][0] - mu["LChi2min"]
-                    cur_l = mu["Lxy"](user_mu_effscaled["x"],user_mu_effscaled["y"])[0][0]
+                    cur_l = mu["Lgrid"].value(user_mu_effscaled["x"],user_mu_effscaled["y"])
                 if cur_l < 0:
                     cur_l = 0.
         except KeyError as s:
@@ -328,9 +377,337 @@ def compute_likelihood(exp_mu, user_mu, user_mode):
 
 
         l += cur_l
-        likelihood_results.append(
-            {"experiment": mu["experiment"], "source": mu["source"],
-            "sqrts": mu["sqrts"], "dim": mu["dim"],
-            "type": mu["type"], "eff": mu["eff"], "l": cur_l})
+        l_exp[i] = cur_l
+        if timed:
+            stats.record_measurement(mu["filepath"], perf_counter() - t0)
+
+    if total_only:
+        return None, l
+    if table is None:
+        table = results_table(exp_mu)
+    return LikelihoodResults(table, l_exp), l
+
+
+def compute_likelihood_batch(exp_mu, user_mu, eff, bestfit, stats=None):
+    """Computes the likelihood from experimental mu and N user mu at once.
+
+    user_mu is an array of shape (N, channels.n_channels) holding the
+    signal strengths in the canonical channel layout, eff and bestfit are
+    compiled by ReadExpInput.compile. Returns the array of
+    -2log(likelihood) of shape (N,) and the contributions of the individual
+    experimental results as an array of shape (N, len(exp_mu)). If stats
+    is given, the cost of each experimental result is recorded."""
+
+    user_mu = np.atleast_2d(user_mu)
+    x = user_mu.dot(eff.T)
+    dx = x - bestfit
+    l_exp = np.empty((user_mu.shape[0], len(exp_mu)))
+    timed = stats is not None and stats.per_measurement
+    for i, mu in enumerate(exp_mu):
+        if timed:
+            t0 = perf_counter()
+        axes = mu["axes"]
+        try:
+            l_exp[:, i] = likelihood_functions[mu["type"]](mu, x[:, axes],
+                                                           dx[:, axes])
+        except KeyError as s:
+            raise LikelihoodComputationError(
+                'there are missing elements in exp_mu: key "' + str(s) +
+                '" is not found')
+        if timed:
+            stats.record_measurement(mu["filepath"], perf_counter() - t0,
+                                     user_mu.shape[0])
+
+    return l_exp.sum(axis=1), l_exp
+
+# vectorized likelihoods for the different types of experimental results:
+# x is an array of shape (N, dim) of user mu scaled to efficiencies and dx
+# its difference to the best fit
+
+def likelihood_n(mu, x, dx):
+    """Ordinary Gaussian approximation."""
+
+    if mu["dim"] == 1:
+        unc = np.where(dx[:,0] < 0, mu["param"]["uncertainty"]["left"],
+                       mu["param"]["uncertainty"]["right"])
+        return dx[:,0]**2/unc**2
+    elif mu["dim"] == 2:
+        return (mu["param"]["a"]*dx[:,0]**2 + mu["param"]["c"]*dx[:,1]**2 +
+                2*mu["param"]["b"]*dx[:,0]*dx[:,1])
+    return np.einsum("ni,ij,nj->n", dx, mu["param"]["inv_cov_m"], dx)
+
+def likelihood_vn(mu, x, dx):
+    """Variable Gaussian 2, Barlow arXiv:physics/0406120v1, Eq. 18."""
+
+    if mu["dim"] == 1:
+        unc_left = abs(mu["param"]["uncertainty"]["left"])
+        unc_right = mu["param"]["uncertainty"]["right"]
+        num = dx[:,0]
+        if unc_left == 0:
+            return np.abs(num)/unc_right
+        elif unc_right == 0:
+            return np.abs(num)/unc_left
+        den = unc_left*unc_right + (unc_right - unc_left)*num
+        if np.any(den == 0):
+            raise LikelihoodComputationError(
+              'divided by zero in 1D Variable Gaussian case')
+        return num**2/np.abs(den)
+    elif mu["dim"] == 2:
+        p = mu["param"]["correlation"]
+        sig1p = mu["param"]["uncertainty"]["x"]["right"]
+        sig1m = abs(mu["param"]["uncertainty"]["x"]["left"])
+        sig2p = mu["param"]["uncertainty"]["y"]["right"]
+        sig2m = abs(mu["param"]["uncertainty"]["y"]["left"])
+        dz1 = dx[:,0]
+        dz2 = dx[:,1]
+        V1f = np.abs(sig1p*sig1m + (sig1p - sig1m)*dz1)
+        V2f = np.abs(sig2p*sig2m + (sig2p - sig2m)*dz2)
+        return 1.0/(1-p**2)*(dz1**2/V1f - 2*p*dz1*dz2/np.sqrt(V1f*V2f) +
+                             dz2**2/V2f)
+    unc_sym = np.sqrt(np.abs(mu["param"]["VGau"] +
+                             mu["param"]["VGau_prime"]*dx))
+    return chi2_cov(dx, unc_sym, mu["param"]["inv_corr_m"])
+
+def likelihood_vn1(mu, x, dx):
+    """Variable Gaussian 1, Barlow arXiv:physics/0406120v1, Eq. 15."""
+
+    if mu["dim"] == 1:
+        unc_left = abs(mu["param"]["uncertainty"]["left"])
+        unc_right = mu["param"]["uncertainty"]["right"]
+        if unc_left == 0 or unc_right == 0:
+            return np.ones(x.shape[0])
+        num = dx[:,0]
+        den = ((2*unc_left*unc_right + (unc_right - unc_left)*num)/
+               (unc_right + unc_left))
+        if np.any(den == 0):
+            raise LikelihoodComputationError(
+              'divided by zero in 1D Variable Gaussian 1 case')
+        return (num/den)**2
+    elif mu["dim"] == 2:
+        p = mu["param"]["correlation"]
+        sig1p = mu["param"]["uncertainty"]["x"]["right"]
+        sig1m = abs(mu["param"]["uncertainty"]["x"]["left"])
+        sig2p = mu["param"]["uncertainty"]["y"]["right"]
+        sig2m = abs(mu["param"]["uncertainty"]["y"]["left"])
+        dz1 = dx[:,0]
+        dz2 = dx[:,1]
+        V1s = sig1p + sig1m
+        V2s = sig2p + sig2m
+        V1f = (2*sig1p*sig1m/V1s + (sig1p - sig1m)/V1s*dz1)**2
+        V2f = (2*sig2p*sig2m/V2s + (sig2p - sig2m)/V2s*dz2)**2
+        return 1.0/(1-p**2)*(dz1**2/V1f - 2*p*dz1*dz2/np.sqrt(V1f*V2f) +
+                             dz2**2/V2f)
+    unc_sym = mu["param"]["SGau"] + mu["param"]["SGau_prime"]*dx
+    return chi2_cov(dx, unc_sym, mu["param"]["inv_corr_m"])
+
+def chi2_cov(dx, unc_sym, inv_corr_m):
+    """dx^T cov^-1 dx for every point, with cov_ij = unc_i corr_ij unc_j,
+    that is cov^-1 = diag(1/unc) corr^-1 diag(1/unc)."""
+
+    z = dx/unc_sym
+    return np.einsum("ni,ni->n", z.dot(inv_corr_m), z)
+
+def likelihood_p(mu, x, dx):
+    """Generalised Poisson, Barlow arXiv:physics/0406120v1, Eq. 10a."""
+
+    if mu["dim"] == 1:
+        gamma = mu["param"]["gamma"]
+        nu = mu["param"]["nu"]
+        alpha = nu*gamma
+        return -2.*(-alpha*dx[:,0] + nu*np.log(1+alpha*dx[:,0]/nu))
+
+    dz1 = dx[:,0]
+    dz2 = dx[:,1]
+    gamma1 = mu["param"]["gamma"]["x"]
+    gamma2 = mu["param"]["gamma"]["y"]
+    nu1 = mu["param"]["nu"]["x"]
+    alpha1 = nu1*gamma1
+    nu2 = mu["param"]["nu"]["y"]
+    alpha2 = nu2*gamma2
+    A = mu["param"]["A_corr"]
+    alpha = mu["param"]["alpha_corr"]
+    L2t1 = -alpha1*dz1 + nu1*np.log(1+alpha1*dz1/nu1)
+    L2t2a = -alpha2*(dz2 + 1/gamma2)*np.exp(alpha*nu1 - A*alpha1*(dz1 + 1/gamma1))
+    L2t2b = -alpha2*(1/gamma2)*np.exp(alpha*nu1 - A*alpha1/gamma1)
+    L2t2c = nu2*np.log(L2t2a/L2t2b)
+    return -2.0*(L2t1 + L2t2a - L2t2b + L2t2c)
+
+def likelihood_f(mu, x, dx):
+    """Exact likelihood provided in terms of a grid."""
+
+    if mu["dim"] == 1:
+        l = mu["Lgrid"](x[:,0])
+    else:
+        l = mu["Lgrid"](x[:,0], x[:,1])
+    return np.maximum(l, 0.)
+
+likelihood_functions = {"n": likelihood_n, "vn": likelihood_vn,
+                        "vn1": likelihood_vn1, "p": likelihood_p,
+                        "f": likelihood_f}
+
+
+def compute_likelihood_gradient_batch(exp_mu, user_mu, eff, bestfit):
+    """Computes the likelihood and its gradient with respect to the user mu
+    for N user mu at once.
+
+    user_mu is an array of shape (N, channels.n_channels), eff and bestfit
+    are compiled by ReadExpInput.compile. Returns the array of
+    -2log(likelihood) of shape (N,) and its derivatives with respect to the
+    signal strengths, of shape (N, channels.n_channels)."""
+
+    user_mu = np.atleast_2d(user_mu)
+    x = user_mu.dot(eff.T)
+    dx = x - bestfit
+    l = np.zeros(user_mu.shape[0])
+    dl_dx = np.empty_like(x)
+    for mu in exp_mu:
+        axes = mu["axes"]
+        try:
+            l += likelihood_functions[mu["type"]](mu, x[:, axes], dx[:, axes])
+            dl_dx[:, axes] = gradient_functions[mu["type"]](mu, x[:, axes],
+                                                            dx[:, axes])
+        except KeyError as s:
+            raise LikelihoodComputationError(
+                'there are missing elements in exp_mu: key "' + str(s) +
+                '" is not found')
+
+    return l, dl_dx.dot(eff)
+
+# derivatives of the likelihoods above with respect to x, as arrays of
+# shape (N, dim)
+
+def gradient_n(mu, x, dx):
+    """Ordinary Gaussian approximation."""
+
+    if mu["dim"] == 1:
+        unc = np.where(dx[:,0] < 0, mu["param"]["uncertainty"]["left"],
+                       mu["param"]["uncertainty"]["right"])
+        return (2*dx[:,0]/unc**2)[:,np.newaxis]
+    elif mu["dim"] == 2:
+        a = mu["param"]["a"]
+        b = mu["param"]["b"]
+        c = mu["param"]["c"]
+        return np.stack([2*a*dx[:,0] + 2*b*dx[:,1],
+                         2*c*dx[:,1] + 2*b*dx[:,0]], axis=1)
+    inv_cov_m = mu["param"]["inv_cov_m"]
+    return dx.dot(inv_cov_m + inv_cov_m.T)
+
+def gradient_vgauss_2d(p, dz1, dz2, V1f, V2f, dV1f, dV2f):
+    """Derivatives of the 2D variable Gaussians, with the variances V1f, V2f
+    and their derivatives dV1f, dV2f."""
+
+    s = np.sqrt(V1f*V2f)
+    dl1 = (2*dz1/V1f - dz1**2*dV1f/V1f**2 -
+           2*p*(dz2/s - dz1*dz2*dV1f/(2*V1f*s)))
+    dl2 = (2*dz2/V2f - dz2**2*dV2f/V2f**2 -
+           2*p*(dz1/s - dz1*dz2*dV2f/(2*V2f*s)))
+    return np.stack([dl1, dl2], axis=1)/(1-p**2)
+
+def gradient_chi2_cov(dx, unc_sym, dunc_sym, inv_corr_m):
+    """Derivatives of dx^T cov^-1 dx with cov_ij = unc_i corr_ij unc_j, where
+    unc depends on dx through its derivative dunc."""
+
+    z = dx/unc_sym
+    y = z.dot(inv_corr_m)/unc_sym   # cov^-1 dx
+    return 2*y - 2*y*dunc_sym*z
+
+def gradient_vn(mu, x, dx):
+    """Variable Gaussian 2, Barlow arXiv:physics/0406120v1, Eq. 18."""
+
+    if mu["dim"] == 1:
+        unc_left = abs(mu["param"]["uncertainty"]["left"])
+        unc_right = mu["param"]["uncertainty"]["right"]
+        num = dx[:,0]
+        if unc_left == 0:
+            return (np.sign(num)/unc_right)[:,np.newaxis]
+        elif unc_right == 0:
+            return (np.sign(num)/unc_left)[:,np.newaxis]
+        den = unc_left*unc_right + (unc_right - unc_left)*num
+        return (2*num/np.abs(den) - num**2*np.sign(den)*(unc_right - unc_left)/
+                den**2)[:,np.newaxis]
+    elif mu["dim"] == 2:
+        sig1p = mu["param"]["uncertainty"]["x"]["right"]
+        sig1m = abs(mu["param"]["uncertainty"]["x"]["left"])
+        sig2p = mu["param"]["uncertainty"]["y"]["right"]
+        sig2m = abs(mu["param"]["uncertainty"]["y"]["left"])
+        V1 = sig1p*sig1m + (sig1p - sig1m)*dx[:,0]
+        V2 = sig2p*sig2m + (sig2p - sig2m)*dx[:,1]
+        return gradient_vgauss_2d(mu["param"]["correlation"], dx[:,0], dx[:,1],
+                                  np.abs(V1), np.abs(V2),
+                                  np.sign(V1)*(sig1p - sig1m),
+                                  np.sign(V2)*(sig2p - sig2m))
+    VGau = np.ravel(mu["param"]["VGau"]) + np.ravel(mu["param"]["VGau_prime"])*dx
+    unc_sym = np.sqrt(np.abs(VGau))
+    dunc_sym = np.sign(VGau)*np.ravel(mu["param"]["VGau_prime"])/(2*unc_sym)
+    return gradient_chi2_cov(dx, unc_sym, dunc_sym, mu["param"]["inv_corr_m"])
+
+def gradient_vn1(mu, x, dx):
+    """Variable Gaussian 1, Barlow arXiv:physics/0406120v1, Eq. 15."""
+
+    if mu["dim"] == 1:
+        unc_left = abs(mu["param"]["uncertainty"]["left"])
+        unc_right = mu["param"]["uncertainty"]["right"]
+        if unc_left == 0 or unc_right == 0:
+            return np.zeros((x.shape[0], 1))
+        num = dx[:,0]
+        den = ((2*unc_left*unc_right + (unc_right - unc_left)*num)/
+               (unc_right + unc_left))
+        dden = (unc_right - unc_left)/(unc_right + unc_left)
+        return (2*num/den**2*(1 - num*dden/den))[:,np.newaxis]
+    elif mu["dim"] == 2:
+        sig1p = mu["param"]["uncertainty"]["x"]["right"]
+        sig1m = abs(mu["param"]["uncertainty"]["x"]["left"])
+        sig2p = mu["param"]["uncertainty"]["y"]["right"]
+        sig2m = abs(mu["param"]["uncertainty"]["y"]["left"])
+        V1s = sig1p + sig1m
+        V2s = sig2p + sig2m
+        S1 = 2*sig1p*sig1m/V1s + (sig1p - sig1m)/V1s*dx[:,0]
+        S2 = 2*sig2p*sig2m/V2s + (sig2p - sig2m)/V2s*dx[:,1]
+        return gradient_vgauss_2d(mu["param"]["correlation"], dx[:,0], dx[:,1],
+                                  S1**2, S2**2, 2*S1*(sig1p - sig1m)/V1s,
+                                  2*S2*(sig2p - sig2m)/V2s)
+    unc_sym = np.ravel(mu["param"]["SGau"]) + np.ravel(mu["param"]["SGau_prime"])*dx
+    dunc_sym = np.ravel(mu["param"]["SGau_prime"])*np.ones_like(dx)
+    return gradient_chi2_cov(dx, unc_sym, dunc_sym, mu["param"]["inv_corr_m"])
+
+def gradient_p(mu, x, dx):
+    """Generalised Poisson, Barlow arXiv:physics/0406120v1, Eq. 10a."""
+
+    if mu["dim"] == 1:
+        gamma = mu["param"]["gamma"]
+        nu = mu["param"]["nu"]
+        alpha = nu*gamma
+        return (-2.*(-alpha + alpha/(1+alpha*dx[:,0]/nu)))[:,np.newaxis]
+
+    dz1 = dx[:,0]
+    dz2 = dx[:,1]
+    gamma1 = mu["param"]["gamma"]["x"]
+    gamma2 = mu["param"]["gamma"]["y"]
+    nu1 = mu["param"]["nu"]["x"]
+    alpha1 = nu1*gamma1
+    nu2 = mu["param"]["nu"]["y"]
+    alpha2 = nu2*gamma2
+    A = mu["param"]["A_corr"]
+    alpha = mu["param"]["alpha_corr"]
+    exp_z1 = np.exp(alpha*nu1 - A*alpha1*(dz1 + 1/gamma1))
+    L2t2a = -alpha2*(dz2 + 1/gamma2)*exp_z1
+    dl1 = (-alpha1 + alpha1/(1+alpha1*dz1/nu1) - A*alpha1*L2t2a -
+           nu2*A*alpha1)
+    dl2 = -alpha2*exp_z1 + nu2/(dz2 + 1/gamma2)
+    return -2.0*np.stack([dl1, dl2], axis=1)
+
+def gradient_f(mu, x, dx):
+    """Exact likelihood provided in terms of a grid, differentiated as
+    evaluated by likelihood_f."""
+
+    if mu["dim"] == 1:
+        l = mu["Lgrid"](x[:,0])
+        dl = mu["Lgrid"].gradient(x[:,0])
+    else:
+        l = mu["Lgrid"](x[:,0], x[:,1])
+        dl = mu["Lgrid"].gradient(x[:,0], x[:,1])
+    # the likelihood is set to zero where the interpolation is negative
+    return np.where((l < 0)[:,np.newaxis], 0., dl)
 
-    return likelihood_results, l
+gradient_functions = {"n": gradient_n, "vn": gradient_vn, "vn1": gradient_vn1,
+                      "p": gradient_p, "f": gradient_f}
@@ -27,7 +27,9 @@
 
 import sys
 import math
+import numpy as np
 from . import brsm as BR_SM
+from . import channels
 from ..errors import ComputeMuFromReducedCouplingsError
 
 class ComputeMuFromReducedCouplings:
@@ -39,12 +41,13 @@ class ComputeMuFromReducedCouplings:
         self.mass = mass
 
         # read the SM BR grids
-        self.func_BR = BR_SM.getBRfunctions()
+        self.func_BR = BR_SM.sharedBRfunctions()
 
         # read the BR for an SM-like Higgs at the mass specified in
         # the user input
         for key, val in list(self.func_BR.items()):
             self.BR[key] = val(mass)
+        self.setBRvector()
 
     def reset(self, mass):
         # evaluate the SM BR grids at the given mass, if not already done
@@ -52,80 +55,174 @@ class ComputeMuFromReducedCouplings:
             for key, val in list(self.func_BR.items()):
                 self.BR[key] = val(mass)
             self.mass = mass
+            self.setBRvector()
+
+    def setBRvector(self):
+        """SM BR of the visible decay modes as an array, and their sum."""
+
+        self.BR_vector = np.array([float(self.BR[decay])
+                                   for decay in visible_decays])
+        self.BR_sum = 0.
+        for decay in self.BR:
+            if decay in channels.decay_index:
+                self.BR_sum += self.BR[decay]
 
     def getmu(self, redCp):
-        """Computes the likelihood from reduced couplings."""
+        """Computes the signal strengths from reduced couplings, as a
+        dictionary indexed by (prod, decay) with the entry "extra"."""
+
+        return channels.todict(self.getmuvector(redCp), self.getextra(redCp))
+
+    def getextra(self, redCp):
+        """Mass and name of the Higgs particle of the reduced couplings."""
+
+        if "name" in redCp["extra"]:
+            return {"mass": self.mass, "name": redCp["extra"]["name"]}
+        return {"mass": self.mass}
+
+    def getmuvector(self, redCp):
+        """Computes the signal strengths from reduced couplings, as an array
+        in the canonical channel layout of channels.py, of shape
+        (n_channels,) or, if the couplings are arrays of shape S, of shape
+        S + (n_channels,). As before, the couplings of redCp are replaced by
+        the real values used in the computation."""
 
         try:
             for key, val in list(redCp.items()):
                 if key == "extra":
                     continue
-                if redCp["extra"]["precision"] == "LO":
-                    if key == "tt":
-                        # factor of 1/3 from 1104.5613
-                        redCp[key] = math.sqrt(val.real**2 + 1./3.*val.imag**2)
-                    else:
-                        redCp[key] = abs(val)
-                else:
-                    redCp[key] = val.real
+                redCp[key] = effective_coupling(key, val,
+                                                redCp["extra"]["precision"])
+            mu = self.getmu_batch(redCp, redCp["extra"]["precision"],
+                                  redCp["extra"]["BRinvisible"],
+                                  redCp["extra"]["BRundetected"])
         except KeyError as s:
             raise ComputeMuFromReducedCouplingsError(
                 'there are missing elements in couplings: key "' + str(s) +
                 '" is not found')
+        return mu.reshape(mu.shape[:-2] + (channels.n_channels,))
 
-        considered_decay_modes = [
-        "gammagamma", "ZZ", "WW", "bb", "cc", "tautau", "Zgamma", "mumu", "gg",
-        "invisible"
-        ]
+    def getmu_batch(self, couplings, precision="BEST-QCD", BRinvisible=0.,
+                    BRundetected=0.):
+        """Computes the signal strengths for many sets of reduced couplings
+        at once. couplings maps the names of the reduced couplings to
+        arrays, which are broadcast against each other and against
+        BRinvisible and BRundetected to a shape S (typically (N,)). Returns
+        the array of shape S + (n_prod, n_decay) of the signal strengths,
+        in the order of channels.prod_modes and channels.decay_modes.
+        couplings is not modified."""
+
+        try:
+            values = ([effective_coupling(key, couplings[key], precision)
+                       for key in visible_couplings] +
+                      [effective_coupling(key, couplings[key], precision)
+                       for key in prod_coupling_list])
+        except KeyError as s:
+            raise ComputeMuFromReducedCouplingsError(
+                'there are missing elements in couplings: key "' + str(s) +
+                '" is not found')
+        values = np.broadcast_arrays(*(values + [np.asarray(BRinvisible),
+                                                 np.asarray(BRundetected)]))
+        # the points are kept along the last axes during the computation, so
+        # that the operations run over contiguous arrays of points
+        n_visible = len(visible_decays)
+        C_decay = np.array(values[:n_visible])
+        C_prod = np.array(values[n_visible:-2])
+        BRinvisible, BRundetected = values[-2:]
+        BR_vector = self.BR_vector.reshape((-1,) + (1,)*BRinvisible.ndim)
+
+        # partial widths relative to the total SM width
+        width = BR_vector * C_decay**2
+        reduced_width = width.sum(axis=0)/self.BR_sum
+        inv_und = 1. - BRinvisible - BRundetected
+
+        # reduced branching ratios, the one into invisible particles being
+        # given directly
+        redBR = np.empty((channels.n_decay,) + BRinvisible.shape)
+        redBR[visible_index] = inv_und * width / reduced_width / BR_vector
+        redBR[channels.decay_index["invisible"]] = BRinvisible
+
+        mu = C_prod[:,np.newaxis]**2 * redBR[np.newaxis,:]
+        return np.moveaxis(mu, (0, 1), (-2, -1))
+
+    def getmu_vjp(self, couplings, dl_dmu, precision="BEST-QCD",
+                  BRinvisible=0., BRundetected=0.):
+        """Derivatives of a function l of the signal strengths computed by
+        getmu_batch with respect to the reduced couplings and to
+        BRinvisible and BRundetected, from the derivatives dl_dmu of l with
+        respect to the signal strengths, of shape S + (n_channels,).
+        Returns the dictionary of the derivatives with respect to the real
+        values of the couplings used by getmu_batch, and the derivatives
+        with respect to BRinvisible and BRundetected, all of shape S."""
 
-        width = {}
-        tot_width_SM = 0.
-        tot_width = 0.
-        for decay in self.BR:
-            if decay in considered_decay_modes:
-                if decay == "gg":
-                    coupling = "gg_decay"
-                else:
-                    coupling = decay
-                tot_width_SM += self.BR[decay]
-                try:
-                    width[decay] = self.BR[decay] * redCp[coupling]**2
-                except KeyError as s:
-                    raise ComputeMuFromReducedCouplingsError(
-                        'there are missing elements in couplings: key "' + str(s) +
-                        '" is not found')
-                tot_width += width[decay]
-        
-        reduced_width = tot_width/tot_width_SM
         try:
-            inv_und = (1. - redCp["extra"]["BRinvisible"] -
-                       redCp["extra"]["BRundetected"])
+            values = ([effective_coupling(key, couplings[key], precision)
+                       for key in visible_couplings] +
+                      [effective_coupling(key, couplings[key], precision)
+                       for key in prod_coupling_list])
         except KeyError as s:
             raise ComputeMuFromReducedCouplingsError(
                 'there are missing elements in couplings: key "' + str(s) +
                 '" is not found')
+        values = np.broadcast_arrays(*(values + [np.asarray(BRinvisible),
+                                                 np.asarray(BRundetected)]))
+        n_visible = len(visible_decays)
+        C_decay = np.array(values[:n_visible])
+        C_prod = np.array(values[n_visible:-2])
+        BRinvisible, BRundetected = values[-2:]
+        BR_vector = self.BR_vector.reshape((-1,) + (1,)*BRinvisible.ndim)
+        dl_dmu = np.moveaxis(np.reshape(
+            dl_dmu, BRinvisible.shape + (channels.n_prod, channels.n_decay)),
+                             (-2, -1), (0, 1))
+
+        reduced_width = (BR_vector * C_decay**2).sum(axis=0)/self.BR_sum
+        inv_und = 1. - BRinvisible - BRundetected
+        redBR = np.empty((channels.n_decay,) + BRinvisible.shape)
+        redBR[visible_index] = inv_und * C_decay**2 / reduced_width
+        redBR[channels.decay_index["invisible"]] = BRinvisible
+
+        # mu = C_prod**2 * redBR, the reduced BR into visible modes being
+        # inv_und * C_decay**2 / reduced_width
+        dl_dCprod = 2*C_prod*(dl_dmu*redBR[np.newaxis]).sum(axis=1)
+        dl_dredBR = (dl_dmu*C_prod[:,np.newaxis]**2).sum(axis=0)
+        dl_dvisible = dl_dredBR[visible_index]
+        s = (dl_dvisible*C_decay**2).sum(axis=0)/reduced_width
+        dl_dCdecay = (2*inv_und*C_decay/reduced_width *
+                      (dl_dvisible - s*BR_vector/self.BR_sum))
+        dl_dBRinvisible = dl_dredBR[channels.decay_index["invisible"]] - s
+        dl_dBRundetected = -s
+
+        dl_dC = {}
+        for key, dl in zip(visible_couplings + prod_coupling_list,
+                           list(dl_dCdecay) + list(dl_dCprod)):
+            dl_dC[key] = dl_dC.get(key, 0.) + dl
+        return dl_dC, dl_dBRinvisible, dl_dBRundetected
+
+
+def effective_coupling(key, val, precision):
+    """Real value of the reduced coupling key used in the signal strengths:
+    the modulus at LO (with the CP-odd part of the top coupling weighted by
+    1/3), and the real part otherwise."""
+
+    if precision == "LO":
+        if key == "tt":
+            # factor of 1/3 from 1104.5613
+            return np.sqrt(val.real**2 + 1./3.*val.imag**2)
+        return abs(val)
+    return val.real
 
-        redBR = {}
-        for decay in considered_decay_modes:
-            if decay == "invisible":
-                # one cannot define a "reduced" branching ratio
-                redBR[decay] = redCp["extra"]["BRinvisible"]
-            else:
-                redBR[decay] = (inv_und * width[decay] / reduced_width /
-                                self.BR[decay])
-
-        mu = {}
-        prod_modes = {"ggH": "gg_prod_lhc8", "VBF": "VBF", "WH": "WH",
-                      "qqZH": "qqZH", "ttH": "tt", "ggH13": "gg_prod_lhc13", "VBF13": "VBF13",
-                      "tHq": "tHq", "tHW": "tHW", "bbH": "bb", "tHq13": "tHq13", "tHW13": "tHW13",
-                      "ggZH": "ggZH", "ggZH13": "ggZH13"}
-        for prod,coupling in list(prod_modes.items()):
-            for decay in considered_decay_modes:
-                mu[(prod,decay)] = redCp[coupling]**2 * redBR[decay]
-        if "extra" not in mu:
-            if "name" in redCp["extra"]:
-                mu["extra"]={"mass": self.mass, "name": redCp["extra"]["name"]}
-            else:
-                mu["extra"]={"mass": self.mass}
-        return mu
+# reduced coupling giving the cross section of each production mode
+prod_couplings = {"ggH": "gg_prod_lhc8", "VBF": "VBF", "WH": "WH",
+                  "qqZH": "qqZH", "ttH": "tt", "ggH13": "gg_prod_lhc13",
+                  "VBF13": "VBF13", "tHq": "tHq", "tHW": "tHW", "bbH": "bb",
+                  "tHq13": "tHq13", "tHW13": "tHW13", "ggZH": "ggZH",
+                  "ggZH13": "ggZH13"}
+prod_coupling_list = [prod_couplings[prod] for prod in channels.prod_modes]
 
+# visible decay modes, their reduced couplings and their position in
+# channels.decay_modes
+visible_decays = [decay for decay in channels.decay_modes
+                  if decay != "invisible"]
+visible_couplings = [decay if decay != "gg" else "gg_decay"
+                     for decay in visible_decays]
+visible_index = [channels.decay_index[decay] for decay in visible_decays]
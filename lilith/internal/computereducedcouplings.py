@@ -25,8 +25,10 @@
 #
 ##########################################################################
 
+import numpy as np
 from . import reducedcouplingslo as RedCoupLO
 from . import reducedcouplingsnnlo as RedCoupNNLO
+from . import formfactortable as FFTable
 from ..errors import ReducedCouplingComputationError
 
 class ComputeReducedCouplings:
@@ -38,45 +40,21 @@ class ComputeReducedCouplings:
 
     def __init__(self, redCp):
         # form factors for the calculation of reduced couplings can either come
-        # from analytical formula at LO ("func_formfactors_LO") or from
-        # interpolated grids obtained from running HDECAY, HIGLU or VBFNLO
-        # ("func_formfactors_interp").
-        # in order to speed up things in case of repeted user input at the same
-        # Higgs mass, we store the evaluation of the (analyatical or
-        # interpolation) function at the Higgs mass given by the user in the
-        # dictionaries formfactors_LO and formfactors_interp.
-
-        self.func_formfactors_LO = {} # function of Higgs mass
-        self.formfactors_LO = {} # evaluated at the mass given by the user
+        # from analytical formula at LO or from interpolated grids obtained
+        # from running HDECAY, HIGLU or VBFNLO. Both are tabulated as a
+        # function of the Higgs mass in formfactortable, and the values at
+        # the Higgs mass given by the user are stored in the dictionaries
+        # formfactors_LO and formfactors_interp, in order to speed up things
+        # in case of repeted user input at the same Higgs mass.
 
-        self.func_formfactors_interp = {} # function of Higgs mass
+        self.formfactors_LO = {} # evaluated at the mass given by the user
         self.formfactors_interp = {} # evaluated at the mass given by the user
+        self.quadratic_forms = {} # built from formfactors_interp
 
         self.precision = redCp["extra"]["precision"]
         self.mass = redCp["extra"]["mass"]
 
-        if self.precision == "LO":
-            self.func_formfactors_LO = RedCoupLO.computeformfactors()
-            # then, read the LO form factors at the mass specified in
-            # the user input
-            for key, val in list(self.func_formfactors_LO.items()):
-                self.formfactors_LO[key] = val(self.mass)
-
-            # only form factor from an interpolated grid at LO: VBF
-            if "VBF" not in redCp:
-                self.func_formfactors_interp["VBF"] = RedCoupLO.VBF_ff()
-                self.func_formfactors_interp["VBF13"] = RedCoupLO.VBF13_ff() 
-        else:
-            for key in ComputeReducedCouplings.formfactors_NNLOgridfunctions:
-                # store every needed interpolation function of form factors
-                if key not in redCp:
-                    self.func_formfactors_interp[key] = getattr(
-                        RedCoupNNLO, key + "_ff")()
-
-        for key in self.func_formfactors_interp:
-            self.formfactors_interp[key] = {}
-            for ff,val in list(self.func_formfactors_interp[key].items()):
-                self.formfactors_interp[key][ff] = val(self.mass)
+        self.getformfactors(redCp)
 
     def reset(self, redCp):
         if redCp["extra"]["precision"] != self.precision:
@@ -85,34 +63,31 @@ class ComputeReducedCouplings:
             self.__init__(redCp)
             return
 
-        new_func_ff = []
+        if redCp["extra"]["mass"] != self.mass:
+            self.mass = redCp["extra"]["mass"]
+            self.formfactors_LO = {}
+            self.formfactors_interp = {}
+            self.quadratic_forms = {}
 
-        if self.precision == "LO":
-            if "VBF" not in redCp and "VBF" not in self.func_formfactors_interp:
-                self.func_formfactors_interp["VBF"] = RedCoupLO.VBF_ff()
-                new_func_ff.append("VBF")
-                self.func_formfactors_interp["VBF13"] = RedCoupLO.VBF13_ff() 
-                new_func_ff.append("VBF13") 
+        self.getformfactors(redCp)
 
-        else:
-            for key in ComputeReducedCouplings.formfactors_NNLOgridfunctions:
-                # store every needed interpolation function of form factors
-                # that has not already been stored
-                if key not in redCp and key not in self.func_formfactors_interp:
-                    self.func_formfactors_interp[key] = getattr(
-                        RedCoupNNLO, key + "_ff")()
-                    new_func_ff.append(key)
+    def getformfactors(self, redCp):
+        """Read the form factors needed for redCp at the Higgs mass, if not
+        already done."""
 
         if self.precision == "LO":
-            for key, val in list(self.func_formfactors_LO.items()):
-                if redCp["extra"]["mass"] != self.mass or key in new_func_ff: 
-                    self.formfactors_LO[key] = val(self.mass)
-        for key in self.func_formfactors_interp:
-            if redCp["extra"]["mass"] != self.mass or key in new_func_ff:
-                self.formfactors_interp[key] = {}
-                for ff,val in list(self.func_formfactors_interp[key].items()):
-                    self.formfactors_interp[key][ff] = val(self.mass)
-        self.mass = redCp["extra"]["mass"]
+            if not self.formfactors_LO:
+                self.formfactors_LO = FFTable.get_formfactors(
+                    "LO", "analytic", self.mass)
+            # only form factors from an interpolated grid at LO: VBF
+            keys = ["VBF", "VBF13"]
+        else:
+            keys = ComputeReducedCouplings.formfactors_NNLOgridfunctions
+
+        for key in keys:
+            if key not in redCp and key not in self.formfactors_interp:
+                self.formfactors_interp[key] = FFTable.get_formfactors(
+                    self.precision, key, self.mass)
 
     def getcouplings(self, redCp):
         redCp_new = {}
@@ -225,3 +200,47 @@ class ComputeReducedCouplings:
 
         return redCp_new
 
+    def getcouplings_batch(self, redCp):
+        """Computes the missing reduced couplings as getcouplings, for
+        couplings given as arrays. Beyond LO, all the squared reduced
+        couplings are quadratic forms of the vector c of the fermion and
+        vector-boson couplings, which are evaluated for all points and
+        processes at once."""
+
+        if self.precision == "LO":
+            return self.getcouplings(redCp)
+
+        try:
+            C = [np.real(redCp[key]) for key in RedCoupNNLO.coupling_keys]
+        except KeyError as s:
+            raise ReducedCouplingComputationError(
+                'the "' + str(s) + '" couplings is missing in couplings')
+        C = np.broadcast_arrays(*C)
+
+        keys = [key for key in (list(RedCoupNNLO.quadratic_terms) +
+                                list(RedCoupNNLO.fixed_coefficients))
+                if key not in redCp]
+        for key in keys:
+            if key in self.quadratic_forms:
+                continue
+            if key in RedCoupNNLO.fixed_coefficients:
+                self.quadratic_forms[key] = RedCoupNNLO.quadratic_form(
+                    RedCoupNNLO.fixed_coefficients[key], normalize=False)
+            else:
+                grid_interp = self.formfactors_interp[key]
+                self.quadratic_forms[key] = RedCoupNNLO.quadratic_form(
+                    dict((XY, grid_interp[name]) for name, XY in
+                         list(RedCoupNNLO.quadratic_terms[key].items())))
+
+        redCp_new = {}
+        if not keys:
+            return redCp_new
+        values = RedCoupNNLO.quadratic_values(
+            C, np.array([self.quadratic_forms[key] for key in keys]))
+        for key, value in zip(keys, values):
+            if key in RedCoupNNLO.clipped:
+                np.maximum(0., value, out=value)
+            redCp_new[key] = np.sqrt(value, out=value)
+
+        return redCp_new
+
@@ -0,0 +1,159 @@
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+#
+##########################################################################
+
+"""Persistent on-disk cache of the parsed experimental results."""
+
+import os, sys, hashlib, pickle, tempfile
+from warnings import warn
+import numpy, scipy
+from .. import version
+
+class ExpInputCache:
+    """Cache of the parsed XML files of an experimental list file, stored in
+    the directory cachedir. Each entry is keyed by the path of the XML file
+    and validated against its modification time and the hash of its
+    content, and those of the binary <grid> files it refers to, so that
+    modified files are read again."""
+
+    def __init__(self, cachedir, listpath):
+        """Load the cache of the list file listpath if it exists."""
+
+        # the entries are only valid for the same versions of Lilith, of the
+        # parser and of the libraries whose objects are stored (splines,
+        # arrays)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "readexpinput.py"), "rb") as f:
+            parser = hashlib.sha1(f.read()).hexdigest()
+        self.tag = (version.__version__, parser, sys.version_info[:2],
+                    numpy.__version__, scipy.__version__)
+        listpath = os.path.abspath(listpath)
+        self.cachefile = os.path.join(cachedir, "expinput-" +
+            hashlib.sha1(listpath.encode()).hexdigest() + ".pickle")
+        self.cachedir = cachedir
+        self.entries = {}
+        self.used = {}
+        self.modified = False
+
+        try:
+            with open(self.cachefile, "rb") as f:
+                content = pickle.load(f)
+            if content["tag"] == self.tag:
+                self.entries = content["entries"]
+        except Exception:
+            # no cache yet, or unreadable cache: it will be rebuilt
+            pass
+
+    def fresh(self, filepath, stamp):
+        """Check that filepath has not changed since its stamp was taken,
+        updating the stamp if the file has only been touched."""
+
+        mtime = stamp[0]
+        if not fresh(filepath, stamp):
+            return False
+        if stamp[0] != mtime:
+            self.modified = True
+        return True
+
+    def get(self, filepath):
+        """Return the cached experimental result read from filepath, or None
+        if it or one of the <grid> files it refers to is not in the cache or
+        has changed."""
+
+        key = os.path.abspath(filepath)
+        entry = self.entries.get(key)
+        if entry is None or entry["mu"].get("pending"):
+            return None
+        try:
+            if not self.fresh(key, entry["stamp"]):
+                return None
+            for depfile, stamp in list(entry["deps"].items()):
+                if not self.fresh(depfile, stamp):
+                    return None
+        except OSError:
+            return None
+        self.used[key] = entry
+        return entry["mu"]
+
+    def set(self, filepath, mu):
+        """Store the experimental result read from filepath, which must be
+        fully parsed (not pending)."""
+
+        key = os.path.abspath(filepath)
+        deps = {}
+        if mu.get("gridfile") is not None:
+            depfile = os.path.abspath(mu["gridfile"])
+            deps[depfile] = filestamp(depfile)
+        self.used[key] = {"stamp": filestamp(key), "deps": deps, "mu": mu}
+        self.modified = True
+
+    def save(self):
+        """Write the cache to disk, keeping only the files that have been
+        used since it was loaded."""
+
+        if not self.modified and len(self.used) == len(self.entries):
+            return
+        tmpfile = None
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            # write to a temporary file first, so that concurrent processes
+            # never read an incomplete cache
+            fd, tmpfile = tempfile.mkstemp(dir=self.cachedir)
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump({"tag": self.tag, "entries": self.used}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfile, self.cachefile)
+        except (OSError, pickle.PicklingError) as e:
+            if tmpfile is not None and os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            warn("cannot write the experimental input cache in " +
+                 self.cachedir + ": " + str(e), Warning)
+            return
+        self.entries = self.used
+        self.modified = False
+
+
+def filestamp(filepath):
+    """Modification time and content hash of a file, as a list."""
+
+    mtime = os.stat(filepath).st_mtime_ns
+    with open(filepath, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return [mtime, digest]
+
+def fresh(filepath, stamp):
+    """Check that filepath still has the modification time and content hash
+    stamp = [mtime, hash]; if only the modification time differs, stamp is
+    updated. Raises OSError if the file cannot be read."""
+
+    mtime = os.stat(filepath).st_mtime_ns
+    if mtime != stamp[0]:
+        # the file has been touched, compare its content
+        mtime, digest = filestamp(filepath)
+        if digest != stamp[1]:
+            return False
+        stamp[0] = mtime
+    return True
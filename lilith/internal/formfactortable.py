@@ -0,0 +1,213 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Form factors for the computation of the reduced couplings, tabulated on
+a fine Higgs-mass grid over the mass range allowed in the user input and
+stored in a binary file, so that they are obtained by a cubic
+interpolation instead of building and evaluating splines or computing the
+LO loop functions."""
+
+import os, hashlib, tempfile, threading, zipfile
+import numpy as np
+from . import reducedcouplingslo as RedCoupLO
+from . import reducedcouplingsnnlo as RedCoupNNLO
+from .readuserinput import ReadUserInput
+
+tablefile = RedCoupNNLO.wdir + "formfactors.npz"
+
+# Higgs-mass grid of the table
+min_mass = ReadUserInput.min_mass
+max_mass = ReadUserInput.max_mass
+n_mass = 1001
+mass_grid = np.array([min_mass, max_mass, n_mass])
+
+# form factors from interpolated grids, for each precision; "analytic" are
+# the LO form factors given by analytical formulae
+groups = {"BEST-QCD": ["gg_decay", "gg_prod_lhc8", "gammagamma", "Zgamma",
+                       "VBF", "gg_prod_lhc13", "VBF13"],
+          "LO": ["analytic", "VBF", "VBF13"]}
+
+# files from which the table is computed
+sourcefiles = ["GG_grid.dat", "GaGa_grid.dat", "ZGa_grid.dat",
+               "VBF_LO8_grid.dat", "VBF_LO13_grid.dat", "VBF_NLO8_grid.dat",
+               "VBF_NLO13_grid.dat", "ggF_NNLO_LHC8_grid.dat",
+               "ggF_NNLO_LHC13_grid.dat", "param.py",
+               "reducedcouplingslo.py", "reducedcouplingsnnlo.py"]
+
+def formfactor_functions(precision, group):
+    """Dictionary of the form factors of a group as functions of the Higgs
+    mass."""
+
+    if precision == "LO":
+        if group == "analytic":
+            return RedCoupLO.computeformfactors()
+        return getattr(RedCoupLO, group + "_ff")()
+    return getattr(RedCoupNNLO, group + "_ff")()
+
+def source_paths():
+    """Paths of the files from which the table is computed."""
+
+    return [os.path.join(os.path.dirname(RedCoupLO.__file__), name)
+            if name.endswith(".py") else RedCoupNNLO.wdir + name
+            for name in sourcefiles]
+
+def source_stamps():
+    """Sizes and modification times of the files from which the table is
+    computed, checked before hashing them."""
+
+    stamps = []
+    for path in source_paths():
+        st = os.stat(path)
+        stamps.append([st.st_size, st.st_mtime_ns])
+    return np.array(stamps, dtype=np.int64)
+
+def source_hash():
+    """Hash of the files from which the table is computed."""
+
+    sha = hashlib.sha1(str((min_mass, max_mass, n_mass)).encode())
+    for path in source_paths():
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+class FormFactorTable:
+    """Table of all form factors on the Higgs-mass grid."""
+
+    def __init__(self, filepath=tablefile):
+        """Load the table from filepath, or compute it and try to store it
+        there if the file is missing or out of date."""
+
+        self.mass = np.linspace(min_mass, max_mass, n_mass)
+        self.step = self.mass[1] - self.mass[0]
+        self.names = {} # names of the form factors of each group
+        self.values = {} # values of shape (n_mass, number of form factors)
+
+        stamps = source_stamps()
+        digest = None
+        try:
+            with np.load(filepath) as content:
+                # the files are only hashed if their sizes or modification
+                # times have changed since the table was stored
+                if not (np.array_equal(content["stamps"], stamps) and
+                        np.array_equal(content["grid"], mass_grid)):
+                    digest = source_hash()
+                    if str(content["source"]) != digest:
+                        raise ValueError("out-of-date table")
+                for precision in groups:
+                    for group in groups[precision]:
+                        key = precision + "_" + group
+                        self.names[precision, group] = \
+                            content[key + "_names"].tolist()
+                        self.values[precision, group] = content[key]
+            if digest is not None:
+                # same content: store the new stamps
+                self.save(filepath, digest, stamps)
+            return
+        except (OSError, KeyError, ValueError, EOFError,
+                zipfile.BadZipFile):
+            # missing, out-of-date, or incomplete table
+            self.names = {}
+            self.values = {}
+
+        self.compute()
+        self.save(filepath, source_hash(), stamps)
+
+    def save(self, filepath, digest, stamps):
+        """Store the table in filepath, if possible."""
+
+        content = {"source": np.array(digest), "stamps": stamps,
+                   "grid": mass_grid}
+        for (precision, group), names in list(self.names.items()):
+            key = precision + "_" + group
+            content[key + "_names"] = np.array(names)
+            content[key] = self.values[precision, group]
+        tmpfile = None
+        try:
+            # write to a temporary file first, so that concurrent processes
+            # never read an incomplete table
+            fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(filepath))
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **content)
+            os.chmod(tmpfile, 0o644)
+            os.replace(tmpfile, filepath)
+        except OSError:
+            # read-only installation: the table is only kept in memory
+            if tmpfile is not None and os.path.exists(tmpfile):
+                os.remove(tmpfile)
+
+    def compute(self):
+        """Evaluate all form factors on the Higgs-mass grid."""
+
+        for precision in groups:
+            for group in groups[precision]:
+                functions = formfactor_functions(precision, group)
+                names = sorted(functions)
+                dtype = complex if group == "analytic" else float
+                values = np.empty((n_mass, len(names)), dtype=dtype)
+                for j, name in enumerate(names):
+                    values[:, j] = functions[name](self.mass)
+                self.names[precision, group] = names
+                self.values[precision, group] = values
+
+    def get(self, precision, group, mass):
+        """Dictionary of the form factors of a group at the Higgs mass."""
+
+        names = self.names[precision, group]
+        pos = (mass - min_mass)/self.step
+        if pos < -1e-9 or pos > n_mass - 1 + 1e-9:
+            # outside of the table: direct evaluation
+            functions = formfactor_functions(precision, group)
+            return dict((name, functions[name](mass)) for name in names)
+
+        # cubic Lagrange interpolation on the four nearest grid points
+        i = min(max(int(pos), 1), n_mass - 3)
+        t = pos - i
+        weights = np.array([-t*(t - 1.)*(t - 2.)/6., (t + 1.)*(t - 1.)*(t - 2.)/2.,
+                            -(t + 1.)*t*(t - 2.)/2., (t + 1.)*t*(t - 1.)/6.])
+        values = weights.dot(self.values[precision, group][i-1:i+3])
+        return dict(zip(names, values.tolist()))
+
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_table():
+    """Process-wide table of the form factors, loaded on first use."""
+
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = FormFactorTable()
+    return _table
+
+def get_formfactors(precision, group, mass):
+    """Dictionary of the form factors of a group at the Higgs mass, for
+    precision "LO" or "BEST-QCD"."""
+
+    return get_table().get(precision, group, mass)
@@ -0,0 +1,256 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Evaluation of the likelihoods given on a grid (type "f")."""
+
+import numpy as np
+from scipy import interpolate
+
+interpolations = ["spline", "linear", "cubic"]
+
+class GridLikelihood:
+    """Likelihood of a type "f" result, interpolated from its grid.
+
+    With interpolation "spline", the interpolating spline read from the
+    XML file is evaluated from its knots and coefficients. With "linear"
+    or "cubic", the spline is tabulated on a regular grid refinement times
+    finer than the original one and evaluated by (bi)linear or
+    (bi)cubic Catmull-Rom interpolation of the table, in constant time per
+    point. Outside of the grid, the 2D spline is constant along the
+    boundary and the 1D spline is extrapolated, as for the spline itself.
+
+    Calls with arrays (one per axis) return arrays; value() is a faster
+    equivalent for a single point, and gradient() gives the derivatives of
+    the same interpolation. degree is the degree of the 1D spline,
+    which is not exposed by UnivariateSpline; the degrees of a 2D spline
+    are read from it."""
+
+    def __init__(self, spline, dim, interpolation="spline", refinement=8,
+                 degree=3):
+        self.dim = dim
+        self.interpolation = interpolation
+        self.spline = spline
+        if dim == 1:
+            knots = spline.get_knots()
+            k = degree
+            # full knot vector, the boundary knots being repeated
+            self.tck = (np.concatenate([[knots[0]]*k, knots, [knots[-1]]*k]),
+                        spline.get_coeffs(), k)
+            self.bounds = [(knots[0], knots[-1])]
+            nknots = [len(knots)]
+        else:
+            tx, ty, c = spline.tck
+            kx, ky = spline.degrees
+            self.bounds = [(tx[kx], tx[-kx-1]), (ty[ky], ty[-ky-1])]
+            nknots = [len(tx) - 2*kx, len(ty) - 2*ky]
+        if interpolation == "spline":
+            return
+
+        # table on a regular grid: (lower bound, 1/step, number of points)
+        # per axis
+        self.axes = []
+        nodes = []
+        for (lower, upper), n in zip(self.bounds, nknots):
+            n = refinement*(n - 1) + 1
+            self.axes.append((lower, (n - 1)/(upper - lower), n))
+            nodes.append(np.linspace(lower, upper, n))
+        if dim == 1:
+            self.table = interpolate.splev(nodes[0], self.tck)
+            # one more node on each side, linearly extrapolated, so that the
+            # cubic interpolation is exact for linear functions at the ends
+            padded = np.concatenate([[2*self.table[0] - self.table[1]],
+                                     self.table,
+                                     [2*self.table[-1] - self.table[-2]]])
+        else:
+            self.table = spline(nodes[0], nodes[1])
+            padded = np.pad(self.table, 1, mode="reflect", reflect_type="odd")
+        self.padded = padded.ravel()
+        self.padded_list = padded.tolist()
+        self.stride = padded.shape[-1]
+
+    def locate(self, u, axis):
+        """Index of the table cell containing u and position in the cell,
+        for an array u."""
+
+        lower, scale, n = axis
+        u = np.clip((u - lower)*scale, 0., n - 1.)
+        i = np.minimum(u.astype(int), n - 2)
+        return i, u - i
+
+    def __call__(self, x, y=None):
+        """Values at the points x (and y), as arrays."""
+
+        x = np.asarray(x, dtype=float)
+        if self.dim == 1:
+            if self.interpolation == "spline":
+                return interpolate.splev(x, self.tck)
+            i, f = self.locate(x, self.axes[0])
+            t = self.padded
+            if self.interpolation == "linear":
+                out = t[i+1]*(1 - f) + t[i+2]*f
+            else:
+                w0, w1, w2, w3 = catmull_rom(f)
+                out = w0*t[i] + w1*t[i+1] + w2*t[i+2] + w3*t[i+3]
+            lower, upper = self.bounds[0]
+            outside = (x < lower) | (x > upper)
+            if np.any(outside):
+                out[outside] = interpolate.splev(x[outside], self.tck)
+            return out
+
+        y = np.asarray(y, dtype=float)
+        if self.interpolation == "spline":
+            return self.spline.ev(x, y)
+        i, f = self.locate(x, self.axes[0])
+        j, g = self.locate(y, self.axes[1])
+        t = self.padded
+        s = self.stride
+        if self.interpolation == "linear":
+            k = (i + 1)*s + j + 1
+            return ((t[k]*(1 - g) + t[k+1]*g)*(1 - f) +
+                    (t[k+s]*(1 - g) + t[k+s+1]*g)*f)
+        wy = catmull_rom(g)
+        k = i*s + j
+        out = 0.
+        for wx in catmull_rom(f):
+            out = out + wx*(wy[0]*t[k] + wy[1]*t[k+1] + wy[2]*t[k+2] +
+                            wy[3]*t[k+3])
+            k = k + s
+        return out
+
+    def gradient(self, x, y=None):
+        """Derivatives along each axis at the points x (and y), as an array
+        of shape (number of points, dim)."""
+
+        x = np.asarray(x, dtype=float)
+        if self.dim == 1:
+            if self.interpolation == "spline":
+                return interpolate.splev(x, self.tck, der=1)[:,np.newaxis]
+            lower, scale, n = self.axes[0]
+            i, f = self.locate(x, self.axes[0])
+            t = self.padded
+            if self.interpolation == "linear":
+                out = (t[i+2] - t[i+1])*scale
+            else:
+                w0, w1, w2, w3 = catmull_rom_derivative(f)
+                out = (w0*t[i] + w1*t[i+1] + w2*t[i+2] + w3*t[i+3])*scale
+            lower, upper = self.bounds[0]
+            outside = (x < lower) | (x > upper)
+            if np.any(outside):
+                out[outside] = interpolate.splev(x[outside], self.tck, der=1)
+            return out[:,np.newaxis]
+
+        y = np.asarray(y, dtype=float)
+        if self.interpolation == "spline":
+            out = np.stack([self.spline.ev(x, y, dx=1),
+                            self.spline.ev(x, y, dy=1)], axis=1)
+        else:
+            i, f = self.locate(x, self.axes[0])
+            j, g = self.locate(y, self.axes[1])
+            t = self.padded
+            s = self.stride
+            scale_x = self.axes[0][1]
+            scale_y = self.axes[1][1]
+            if self.interpolation == "linear":
+                k = (i + 1)*s + j + 1
+                out = np.stack([
+                    ((t[k+s] - t[k])*(1 - g) + (t[k+s+1] - t[k+1])*g)*scale_x,
+                    ((t[k+1] - t[k])*(1 - f) + (t[k+s+1] - t[k+s])*f)*scale_y],
+                    axis=1)
+            else:
+                wy = catmull_rom(g)
+                dwy = catmull_rom_derivative(g)
+                k = i*s + j
+                out_x = 0.
+                out_y = 0.
+                for wx, dwx in zip(catmull_rom(f), catmull_rom_derivative(f)):
+                    rows = [t[k], t[k+1], t[k+2], t[k+3]]
+                    out_x = out_x + dwx*sum(w*r for w, r in zip(wy, rows))
+                    out_y = out_y + wx*sum(w*r for w, r in zip(dwy, rows))
+                    k = k + s
+                out = np.stack([out_x*scale_x, out_y*scale_y], axis=1)
+        # the interpolation is constant along an axis outside of the grid
+        for axis, (u, (lower, upper)) in enumerate(zip([x, y], self.bounds)):
+            out[(u < lower) | (u > upper), axis] = 0.
+        return out
+
+    def value(self, x, y=None):
+        """Value at a single point."""
+
+        if self.interpolation == "spline":
+            if self.dim == 1:
+                return float(interpolate.splev(x, self.tck))
+            return float(self.spline.ev(x, y))
+
+        if self.dim == 1:
+            lower, upper = self.bounds[0]
+            if x < lower or x > upper:
+                return float(interpolate.splev(x, self.tck))
+            i, f = stencil(x, self.axes[0])
+            t = self.padded_list
+            if self.interpolation == "linear":
+                return t[i+1]*(1 - f) + t[i+2]*f
+            w0, w1, w2, w3 = catmull_rom(f)
+            return w0*t[i] + w1*t[i+1] + w2*t[i+2] + w3*t[i+3]
+
+        i, f = stencil(x, self.axes[0])
+        j, g = stencil(y, self.axes[1])
+        t = self.padded_list
+        if self.interpolation == "linear":
+            r0 = t[i+1]
+            r1 = t[i+2]
+            return ((r0[j+1]*(1 - g) + r0[j+2]*g)*(1 - f) +
+                    (r1[j+1]*(1 - g) + r1[j+2]*g)*f)
+        wy = catmull_rom(g)
+        out = 0.
+        for wx, row in zip(catmull_rom(f), t[i:i+4]):
+            out += wx*(wy[0]*row[j] + wy[1]*row[j+1] + wy[2]*row[j+2] +
+                       wy[3]*row[j+3])
+        return out
+
+
+def stencil(u, axis):
+    """Index of the table cell containing u and position in the cell."""
+
+    lower, scale, n = axis
+    u = min(max((u - lower)*scale, 0.), n - 1.)
+    i = min(int(u), n - 2)
+    return i, u - i
+
+def catmull_rom(f):
+    """Weights of the 4 points of the Catmull-Rom cubic at position f."""
+
+    f2 = f*f
+    f3 = f2*f
+    return (-0.5*f3 + f2 - 0.5*f, 1.5*f3 - 2.5*f2 + 1,
+            -1.5*f3 + 2*f2 + 0.5*f, 0.5*f3 - 0.5*f2)
+
+def catmull_rom_derivative(f):
+    """Derivatives of the weights of catmull_rom with respect to f."""
+
+    f2 = f*f
+    return (-1.5*f2 + 2*f - 0.5, 4.5*f2 - 5*f, -4.5*f2 + 4*f + 0.5,
+            1.5*f2 - f)
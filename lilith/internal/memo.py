@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Bounded memoization cache of the likelihood results."""
+
+import collections
+import numbers
+import numpy as np
+
+class MemoCache:
+    """Least recently used cache of at most maxsize entries, keyed by the
+    user input with its numbers rounded to decimals (exact if decimals is
+    None). Counts the hits, misses and evictions."""
+
+    def __init__(self, maxsize, decimals=None):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, value):
+        """Hashable key of a user input made of dicts, lists and numbers."""
+
+        if isinstance(value, dict):
+            return tuple(sorted(((key, self.key(val))
+                                 for key, val in list(value.items())),
+                                key=lambda item: str(item[0])))
+        if isinstance(value, np.ndarray):
+            return self.key(value.tolist())
+        if isinstance(value, (list, tuple)):
+            return tuple(self.key(val) for val in value)
+        if self.decimals is not None:
+            if isinstance(value, numbers.Real):
+                return round(float(value), self.decimals)
+            if isinstance(value, numbers.Complex):
+                return (round(value.real, self.decimals),
+                        round(value.imag, self.decimals))
+        return value
+
+    def get(self, key):
+        """Cached value of key, or None."""
+
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops all entries, keeping the counters."""
+
+        self.entries.clear()
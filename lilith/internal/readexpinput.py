@@ -25,7 +25,8 @@
 #
 ##########################################################################
 
-import sys
+import sys, os
+import multiprocessing
 try:
     from lxml import etree
 except:
@@ -36,8 +37,13 @@ import numpy as np
 from scipy.optimize import fsolve
 import math
 from . import brsm as BR_SM
+from . import channels
+from .gridlikelihood import GridLikelihood
 from warnings import warn
 
+# degree of the spline interpolating the 1D likelihood grids of type "f"
+grid_spline_degree = 3
+
 class ReadExpInput:
     """Read the experimental input in XML and extracts all information."""
 
@@ -49,6 +55,11 @@ class ReadExpInput:
         self.mu = []
         self.filepath = ""
 
+        # efficiencies and best fits of all experimental results compiled
+        # by compile(), with one row per axis of each result
+        self.eff = np.zeros((0, channels.n_channels))
+        self.bestfit = np.zeros(0)
+
     def warning(self, message):
         """Customized warnings."""
 
@@ -83,10 +94,15 @@ class ReadExpInput:
         return expfiles
     
 
-    def read_file(self, filepath):
-        """read individual xml files"""
+    def read_file(self, filepath, lazy=False):
+        """read individual xml files
+
+        If lazy is True, only the header, the efficiencies and the best fit
+        are read; the <param> or <grid> block is read by load(), and the
+        experimental result is marked as pending until then."""
 
         self.filepath = filepath
+        self.gridfile = None
 
         root = self.produce_tree()
         if root.tag != "expmu":
@@ -98,7 +114,12 @@ class ReadExpInput:
         (experiment, source, sqrts) = self.get_metadata(root)
        
         eff = self.read_eff(root, dim, decay)
-        (bestfit, param, grid, Lxy, LChi2min) = self.read_mus(root, dim, type)
+        if lazy:
+            bestfit = self.read_bestfit(root, dim, type)
+            (param, grid, Lxy, LChi2min) = (None, None, None, None)
+        else:
+            (bestfit, param, grid, Lxy, LChi2min) = self.read_mus(root, dim,
+                                                                  type)
 
         self.mu.append({"filepath": self.filepath,
                         "dim": dim, "type": type,
@@ -106,7 +127,25 @@ class ReadExpInput:
                         "bestfit": bestfit, "param": param, "grid": grid,
                         "Lxy": Lxy, "LChi2min": LChi2min,
                         "experiment": experiment, "source": source,
-                        "sqrts": sqrts, "eff": eff})
+                        "sqrts": sqrts, "eff": eff,
+                        "gridfile": self.gridfile, "pending": lazy})
+
+    def load(self, mu, grid_interpolation="spline", grid_refinement=8):
+        """Read the <param> or <grid> block of the pending experimental
+        result mu, read with lazy=True, and complete mu in place."""
+
+        self.filepath = mu["filepath"]
+        self.gridfile = None
+
+        root = self.produce_tree()
+        (bestfit, param, grid, Lxy, LChi2min) = self.read_mus(
+            root, mu["dim"], mu["type"], mu["bestfit"])
+        mu.update({"param": param, "grid": grid, "Lxy": Lxy,
+                   "LChi2min": LChi2min, "gridfile": self.gridfile,
+                   "pending": False})
+        if mu["type"] == "f":
+            mu["Lgrid"] = GridLikelihood(Lxy, mu["dim"], grid_interpolation,
+                                         grid_refinement, grid_spline_degree)
 
     def produce_tree(self):
         """Produce the XML tree with ElementTree."""
@@ -377,11 +416,11 @@ class ReadExpInput:
 
 	
         if sqrts in ["1.96","7","8","7.","8.","7.0","8.0","7+8"]:
-            self.eff_VVH = BR_SM.geteffVVHfunctions(8)
-            self.eff_top = BR_SM.getefftopfunctions(8)
+            self.eff_VVH = BR_SM.sharedeffVVHfunctions(8)
+            self.eff_top = BR_SM.sharedefftopfunctions(8)
         else:
-            self.eff_VVH = BR_SM.geteffVVHfunctions(13)
-            self.eff_top = BR_SM.getefftopfunctions(13)
+            self.eff_VVH = BR_SM.sharedeffVVHfunctions(13)
+            self.eff_top = BR_SM.sharedefftopfunctions(13)
 		
         effWH_VH = self.eff_VVH["eff_WH"](self.mass) # relative to VH
 
@@ -472,10 +511,10 @@ class ReadExpInput:
         return eff
 
 
-    def read_mus(self, root, dim, type):
-        # first, read the bestfit
+    def read_bestfit(self, root, dim, type):
+        """Read the <bestfit> block."""
+
         bestfit = {}
-        LChi2min = 0
         
         for child in root:
             if child.tag == "bestfit":
@@ -559,6 +598,17 @@ class ReadExpInput:
                             raise ExpInputError(self.filepath,
                                         "best fit point should be specified for "+bestfit_allowedsubtags[i])
         
+        return bestfit
+
+    def read_mus(self, root, dim, type, bestfit=None):
+        """Read the best fit, unless it is given, and the <param> or <grid>
+        block."""
+
+        # first, read the bestfit
+        if bestfit is None:
+            bestfit = self.read_bestfit(root, dim, type)
+        LChi2min = 0
+
         # then, read the param...
         param = {}
         
@@ -795,6 +845,9 @@ class ReadExpInput:
                 param["SGau"] = 2*param["VGau"]/param["VGau_sum"]
                 param["SGau_prime"] = param["VGau_prime"]/param["VGau_sum"]
                 param["corr_m"] = corr_m
+                # cov = D corr_m D with D diagonal, so that only the
+                # correlation matrix needs to be inverted
+                param["inv_corr_m"] = np.linalg.inv(corr_m)
 
         # check that everything is there
         if (type == "n" or type == "vn" or type == "vn1" or type == "p") and dim == 1:
@@ -843,81 +896,87 @@ class ReadExpInput:
         Lxy = None
         
         for child in root:
-            if child == "grid":
+            if child.tag == "grid":
                 break
-        grid_raw = child.text
 
         if type == "f" and dim == 1:
-            x = []
-            L = []
-        
-            grid_raw = grid_raw.strip("\n").strip().split("\n")
-        
-            i = -1
-            for line in grid_raw:
-                tab = line.split()
-                if len(tab) != 2:
-                    raise ExpInputError(self.filepath,
-                                        'incorrect <grid> entry on line "' + line + '"')
-
-                cur_x = float(tab[0])
-                cur_L = float(tab[1])
-
-                if cur_x not in x:
-                    x.append(cur_x)
-                    L.append(cur_L)
-                    i += 1
-                else:
-                    i = x.index(cur_x)
-            
-            grid["x"] = x
-            grid["L"] = L
+            data = self.read_grid(child, 2)
+            # the first occurrence of each x value is kept
+            x, first = unique_first(data[:,0])
+            grid["x"] = x.tolist()
+            grid["L"] = data[first,1].tolist()
             LChi2min = min(grid["L"])
 
-            Lxy = interpolate.UnivariateSpline(grid["x"], grid["L"], k=3, s=0)
+            Lxy = interpolate.UnivariateSpline(grid["x"], grid["L"],
+                                               k=grid_spline_degree, s=0)
 
         elif type == "f" and dim == 2:
-            x = []
-            y = []
-            L = []
-            
-            grid_raw = grid_raw.strip("\n").strip().split("\n")
-            
-            i = -1
-            
-            for line in grid_raw:
-                tab = line.split()
-                if len(tab) != 3:
-                    raise ExpInputError(self.filepath,
-                                        'incorrect <grid> entry on line "' + line + '"')
-
-                cur_x = float(tab[0])
-                cur_y = float(tab[1])
-                cur_L = float(tab[2])
-
-                if cur_x not in x:
-                    x.append(cur_x)
-                    L.append([])
-                    i += 1
-                else:
-                    i = x.index(cur_x)
-
-                if cur_y not in y:
-                    y.append(cur_y)
-
-                L[i].append(cur_L)
+            data = self.read_grid(child, 3)
+            # rows of L are the x values in order of appearance, each row
+            # holding the L values of this x in order of appearance
+            x, first, row = unique_first(data[:,0], return_inverse=True)
+            y = unique_first(data[:,1])[0]
+            counts = np.bincount(row)
+            if np.any(counts != counts[0]):
+                raise ExpInputError(self.filepath,
+                                    "the <grid> is not rectangular")
 
-            grid["x"] = np.array(x)
-            grid["y"] = np.array(y)
-            grid["L"] = np.array(L)
+            grid["x"] = x
+            grid["y"] = y
+            grid["L"] = data[np.argsort(row, kind="stable"),2].reshape(
+                len(x), counts[0])
             
-            LChi2min = min(min(p[1:]) for p in grid["L"])
+            LChi2min = grid["L"][:,1:].min()
 
             Lxy = interpolate.RectBivariateSpline(grid["x"],
                     grid["y"], grid["L"])
             
         return (bestfit, param, grid, Lxy, LChi2min)
 
+    def read_grid(self, grid_tag, ncols):
+        """Read the <grid> block as an array of shape (npoints, ncols).
+
+        The grid is given either in the text of the block, one point per
+        line, or in a binary .npy file of the same shape whose path,
+        relative to the XML file, is given by the attribute file."""
+
+        if "file" in grid_tag.attrib:
+            gridfile = os.path.join(os.path.dirname(self.filepath),
+                                    grid_tag.attrib["file"])
+            try:
+                data = np.load(gridfile)
+            except (IOError, ValueError) as e:
+                raise ExpInputError(self.filepath,
+                                    'cannot read the <grid> file "' +
+                                    gridfile + '": ' + str(e))
+            if data.ndim != 2 or data.shape[1] != ncols:
+                raise ExpInputError(self.filepath,
+                                    'the <grid> file "' + gridfile +
+                                    '" should have ' + str(ncols) +
+                                    ' columns')
+            self.gridfile = gridfile
+            return np.asarray(data, dtype=float)
+
+        lines = (grid_tag.text or "").strip("\n").strip().split("\n")
+        try:
+            data = np.array(" ".join(lines).split(), dtype=float)
+        except ValueError:
+            data = None
+        if data is None or data.size != ncols*len(lines):
+            # locate the faulty line
+            for line in lines:
+                tab = line.split()
+                try:
+                    if len(tab) == ncols:
+                        [float(value) for value in tab]
+                        continue
+                except ValueError:
+                    pass
+                raise ExpInputError(self.filepath,
+                                    'incorrect <grid> entry on line "' +
+                                    line + '"')
+        return data.reshape(len(lines), ncols)
+
     def check_multiprod(self, eff_dict, multiprod):
         """..."""
 
@@ -960,6 +1019,100 @@ class ReadExpInput:
         for elem in new_eff:
             eff_dict[elem] = new_eff[elem]
 
+    def compile(self, grid_interpolation="spline", grid_refinement=8,
+                eff=None, bestfit=None):
+        """Compile the efficiencies and best fits of all experimental results
+        into a matrix of shape (n_axes, channels.n_channels) and a vector of
+        shape (n_axes,), where n_axes is the sum of the dimensions. The rows
+        of an experimental result are given by the slice mu["axes"], and the
+        13 TeV production modes are resolved in the columns. If eff and
+        bestfit are the matrix and vector of a previous compilation, the
+        rows of the results already compiled (those with mu["axes"]) are
+        copied from them.
+
+        The likelihoods of type "f" are evaluated by mu["Lgrid"], with the
+        interpolation grid_interpolation of GridLikelihood; for pending
+        results, it is built by load()."""
+
+        n_axes = sum(mu["dim"] for mu in self.mu)
+        self.eff = np.zeros((n_axes, channels.n_channels))
+        self.bestfit = np.zeros(n_axes)
+
+        start = 0
+        for mu in self.mu:
+            previous = mu.get("axes") if eff is not None else None
+            mu["axes"] = slice(start, start + mu["dim"])
+            start += mu["dim"]
+            if previous is not None:
+                self.eff[mu["axes"]] = eff[previous]
+                self.bestfit[mu["axes"]] = bestfit[previous]
+            else:
+                for i, axis in enumerate(get_axes(mu["dim"])):
+                    row = mu["axes"].start + i
+                    # no best fit is given for results of type "f"
+                    self.bestfit[row] = mu["bestfit"].get(axis, 0.)
+                    for (prod,decay),eff_prod in list(mu["eff"][axis].items()):
+                        j = channels.index(channels.remap(prod, mu["sqrts"]),
+                                           decay)
+                        self.eff[row, j] += eff_prod
+            if (mu["type"] == "f" and not mu["pending"] and
+                "Lgrid" not in mu):
+                mu["Lgrid"] = GridLikelihood(mu["Lxy"], mu["dim"],
+                                             grid_interpolation,
+                                             grid_refinement,
+                                             grid_spline_degree)
+
+
+def _read_file(args):
+    """Read the XML file of args = (filepath, lazy) and return its
+    experimental result."""
+
+    exp_input = ReadExpInput()
+    exp_input.read_file(*args)
+    return exp_input.mu[0]
+
+def read_files(filepaths, lazy=False, workers=1):
+    """Read the XML files filepaths and return their experimental results
+    in the same order. With workers > 1, the files are read in parallel by
+    a pool of worker processes."""
+
+    tasks = [(filepath, lazy) for filepath in filepaths]
+    if workers <= 1 or len(tasks) < 2:
+        return [_read_file(task) for task in tasks]
+
+    # with the fork start method, the interpolating functions loaded here
+    # are inherited by the workers
+    BR_SM.preload()
+    pool = multiprocessing.Pool(min(workers, len(tasks)))
+    try:
+        return pool.map(_read_file, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def unique_first(values, return_inverse=False):
+    """Unique values in order of first appearance and the index of their
+    first appearance, and optionally the position in the unique values of
+    every element of values."""
+
+    sorted_unique, first, inverse = np.unique(values, return_index=True,
+                                              return_inverse=True)
+    order = np.argsort(first)
+    if not return_inverse:
+        return sorted_unique[order], first[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return sorted_unique[order], first[order], rank[inverse.ravel()]
+
+def get_axes(dim):
+    """Names of the axes of an experimental result of dimension dim."""
+
+    if dim == 1:
+        return ["x"]
+    elif dim == 2:
+        return ["x", "y"]
+    return ["d" + str(i) for i in range(1, dim+1)]
+
 
 #-- functions for variable Gaussian and Poission likelihoods --
 
@@ -31,7 +31,9 @@ try:
     from lxml import etree
 except:
     import xml.etree.ElementTree as etree
+import numpy as np
 from ..errors import UserInputError, HiggsMassError
+from . import channels
 from warnings import warn
 
 class ReadUserInput:
@@ -39,16 +41,21 @@ class ReadUserInput:
 
     modes = ["signalstrengths", "reducedcouplings"]
 
-    def __init__(self, inputstring):
-        """Initialize the reading of the user input from the XML input contained
-        in the string inputstring."""
+    accepted_C = ["ff", "uu", "ll", "tt", "cc", "dd", "bb", "tautau", "VV", "WH",
+                  "ZH", "WW", "ZZ", "gg", "gammagamma", "Zgamma", "mumu", "VBF"]
+    accepted_precision = ["LO", "BEST-QCD"]
 
-        self.root = etree.fromstring(inputstring)
-    
-        if self.root.tag != "lilithinput":
-            raise UserInputError('root tag is not <lilithinput>')
+    accepted_prod = ["ggH", "VVH", "ttH", "VBF", "VH", "WH", "qqZH", "ggZH", "ZH", "tHq", "tHW", "tH", "top", "bbH"]
+    accepted_decay = ["gammagamma", "VV", "WW", "ZZ", "bb", "tautau",
+                      "dd", "uu", "ll", "cc", "ff", "Zgamma", "mumu", "invisible", "gg"]
 
-        self.mode, n_higgses = self.getmode()
+    min_mass = 123.
+    max_mass = 128.
+
+    def __init__(self, inputstring=None):
+        """Initialize the reading of the user input from the XML input contained
+        in the string inputstring. If inputstring is None, nothing is read and
+        only the consistency checks of the input can be used."""
 
         # self.redC is for reduced coupling mode only
         # it is a list of Higgs particles containing the reduced
@@ -58,6 +65,17 @@ class ReadUserInput:
         # it is a list of Higgs particles containing the signal strengths
         # for the various (prod,decay) combinations 
         self.mu = []
+        self.mode = ""
+
+        if inputstring is None:
+            return
+
+        self.root = etree.fromstring(inputstring)
+    
+        if self.root.tag != "lilithinput":
+            raise UserInputError('root tag is not <lilithinput>')
+
+        self.mode, n_higgses = self.getmode()
 
         for i in range(n_higgses):
             if self.mode == "reducedcouplings":
@@ -126,8 +144,6 @@ class ReadUserInput:
         
         mass = -1.
         default_mass = 125.09
-        min_mass = 123.
-        max_mass = 128.
 
         for child in higgs_block: # <reducedcouplings> or <signalstrengths> tag
             if child.tag == "mass":
@@ -136,7 +152,6 @@ class ReadUserInput:
                                  'particle ' + higgs_block.tag)
                 try:
                     mass = float(child.text)
-                    assert mass >= min_mass and mass <= max_mass
                 except TypeError: # empty tag is of type NULL
                     mass = default_mass
                     self.warning('<mass> tag is empty; setting to ' +
@@ -144,9 +159,7 @@ class ReadUserInput:
                 except ValueError:
                     raise UserInputError(
                         'value of the <mass> tag is not a number.')
-                except AssertionError:
-                    raise HiggsMassError('<mass> is not between ' + str(min_mass) +
-                                         ' and ' + str(max_mass) + ' GeV.')
+                self.check_mass(mass)
 
         # if no <mass> block, set to default value
         if mass < 0:
@@ -154,14 +167,21 @@ class ReadUserInput:
 
         return mass
 
+    def check_mass(self, mass):
+        """Check that the Higgs mass is in the allowed mass range."""
+
+        if mass < ReadUserInput.min_mass or mass > ReadUserInput.max_mass:
+            raise HiggsMassError('<mass> is not between ' +
+                                 str(ReadUserInput.min_mass) + ' and ' +
+                                 str(ReadUserInput.max_mass) + ' GeV.')
+
     def get_nextreducedcouplings(self):
         """..."""
 
         redCp = {"extra": {"precision": ""}}
         
-        accepted_C = ["ff", "uu", "ll", "tt", "cc", "dd", "bb", "tautau", "VV", "WH", "ZH",
-                      "WW", "ZZ", "gg", "gammagamma", "Zgamma", "mumu", "VBF"]
-        accepted_precision = ["LO", "BEST-QCD"]
+        accepted_C = ReadUserInput.accepted_C
+        accepted_precision = ReadUserInput.accepted_precision
         accepted_extraBR = ["invisible", "undetected"]
 
         red_coupl = None
@@ -280,6 +300,12 @@ class ReadUserInput:
                                 subchild.attrib["to"] + '" is not a ' +
                                 'number.')
 
+        return self.check_reducedcouplings(redCp)
+
+    def check_reducedcouplings(self, redCp):
+        """Check the consistency of the reduced couplings of a Higgs particle
+           and complete them; the values can also be arrays of points."""
+
         # --- putting together real and imaginary part when present
         new_redC = {}
         original_redC = {}
@@ -296,7 +322,8 @@ class ReadUserInput:
                     num = redCp[p]*1j
                 
                 if p[:-3] in new_redC:
-                    new_redC[p[:-3]] += num
+                    # not in place: the parts may be arrays of the user
+                    new_redC[p[:-3]] = new_redC[p[:-3]] + num
                 else:
                     new_redC[p[:-3]] = num
             else:
@@ -315,6 +342,19 @@ class ReadUserInput:
         if "BRundetected" not in redCp["extra"]:
             redCp["extra"]["BRundetected"] = 0.
 
+        # --- checking the range of the extraBR, for every point
+        BRinvisible = redCp["extra"]["BRinvisible"]
+        BRundetected = redCp["extra"]["BRundetected"]
+        for BRtype, BR in [("invisible", BRinvisible),
+                           ("undetected", BRundetected)]:
+            if np.any(BR < 0) or np.any(BR >= 1):
+                raise UserInputError('the branching ratio to "' + BRtype +
+                                     '" particles should be in [0, 1)')
+        if np.any(BRinvisible + BRundetected > 1):
+            raise UserInputError('the branching ratios to "invisible" and ' +
+                                 '"undetected" particles add up to more ' +
+                                 'than 1')
+
         # --- checking the multiparticles
         multiparticles = {"VV": ["WW", "ZZ"], "uu": ["tt", "cc"],
                           "dd": ["bb", "tautau","mumu"], "ll": ["tautau","mumu"]}
@@ -359,19 +399,64 @@ class ReadUserInput:
 
         # --- setting C_VBF = C_W in case C_W = C_Z
         if "VBF" not in redCp:
-            if abs(redCp["WW"] - redCp["ZZ"]) < 1e-6:
+            if np.all(np.abs(redCp["WW"] - redCp["ZZ"]) < 1e-6):
                 redCp["VBF"] = redCp["WW"]
 
         return redCp
 
+    def set_reducedcouplings(self, couplings, mass, precision="BEST-QCD",
+                             BRinvisible=0., BRundetected=0., name=None):
+        """Set the reduced couplings of a single Higgs particle directly from
+           the dictionary couplings instead of the XML input. The keys are
+           named as in the <C to="..."> tags ("tt", "VV", "gammagamma", ...
+           with "_re" and "_im" suffixes for complex fermion couplings, and
+           "gg_decay", "gg_prod_lhc8", "gg_prod_lhc13" for the gluon
+           couplings); "gg" sets the gluon couplings for both production and
+           decay. Returns the checked and completed reduced couplings."""
+
+        self.check_mass(mass)
+        if precision not in ReadUserInput.accepted_precision:
+            raise UserInputError('"' + str(precision) +
+                                 '" precision is not allowed')
+
+        redCp = {"extra": {"mass": mass, "precision": precision,
+                           "BRinvisible": self.check_value("BRinvisible",
+                                                           BRinvisible),
+                           "BRundetected": self.check_value("BRundetected",
+                                                            BRundetected)}}
+        if name is not None:
+            redCp["extra"]["name"] = name
+
+        for key, val in list(couplings.items()):
+            if key[-3:] in ["_re", "_im"]:
+                C_to = key[:-3]
+            else:
+                C_to = key
+            if (C_to not in ReadUserInput.accepted_C and
+                C_to not in ["gg_decay", "gg_prod_lhc8", "gg_prod_lhc13"]):
+                raise UserInputError('reduced coupling to "' + key +
+                                     '" is unknown')
+            val = self.check_value(key, val, allow_complex=True)
+            if key == "gg":
+                redCp["gg_decay"] = val
+                redCp["gg_prod_lhc8"] = val
+                redCp["gg_prod_lhc13"] = val
+            else:
+                redCp[key] = val
+
+        redCp = self.check_reducedcouplings(redCp)
+        self.mode = "reducedcouplings"
+        self.redC = [redCp]
+        self.mu = []
+        return redCp
+
     def get_nextsignalstrengths(self):
         """..."""
 
         mup = {"extra": {}}
 
-        accepted_prod = ["ggH", "VVH", "ttH", "VBF", "VH", "WH", "qqZH", "ggZH", "ZH", "tHq", "tHW", "tH", "top", "bbH"]
-        accepted_decay = ["gammagamma", "VV", "WW", "ZZ", "bb", "tautau",
-                          "dd", "uu", "ll", "cc", "ff", "Zgamma", "mumu", "invisible", "gg"]
+        accepted_prod = ReadUserInput.accepted_prod
+        accepted_decay = ReadUserInput.accepted_decay
 
         mu_block = None
 
@@ -453,7 +538,13 @@ class ReadUserInput:
                         raise UserInputError(
                             'value of the <mu> tag with prod="' + prod +
                             '" and decay="' + decay + '" is not a number.')
-        
+
+        return self.check_signalstrengths(mup)
+
+    def check_signalstrengths(self, mup):
+        """Check the consistency of the signal strengths of a Higgs particle
+           and complete them; the values can also be arrays of points."""
+
         # ----------------------------------
         # checking consistency of the input
         # ----------------------------------
@@ -535,6 +626,56 @@ class ReadUserInput:
 
         return mup
 
+    def set_signalstrengths(self, mu, mass, name=None):
+        """Set the signal strengths of a single Higgs particle directly
+           instead of the XML input. mu is either a dictionary indexed by
+           (prod, decay), with the same labels as in the <mu> tags, or an
+           array in the canonical channel layout of channels.py. Returns the
+           checked and completed signal strengths."""
+
+        self.check_mass(mass)
+        if isinstance(mu, dict):
+            mup = dict(mu)
+            for key in mup:
+                if (not isinstance(key, tuple) or len(key) != 2 or
+                    key[0] not in ReadUserInput.accepted_prod or
+                    key[1] not in ReadUserInput.accepted_decay):
+                    raise UserInputError('signal strength for "' + str(key) +
+                                         '" is unknown')
+                mup[key] = self.check_value("/".join(key), mup[key])
+        else:
+            mu = np.asarray(mu, dtype=float)
+            if mu.shape != (channels.n_channels,):
+                raise UserInputError('array of signal strengths should be ' +
+                                     'of shape (' + str(channels.n_channels) +
+                                     ',)')
+            mup = dict(zip(channels.keys, mu.tolist()))
+
+        mup["extra"] = {"mass": mass}
+        if name is not None:
+            mup["extra"]["name"] = name
+
+        mup = self.check_signalstrengths(mup)
+        self.mode = "signalstrengths"
+        self.mu = [mup]
+        self.redC = []
+        return mup
+
+    def check_value(self, name, val, allow_complex=False):
+        """Check a value given directly for name, a number or an array (or
+           a sequence) of numbers, and return it as a float or an array of
+           floats, or complex if allow_complex and the value is complex."""
+
+        try:
+            val = np.asarray(val)
+        except ValueError:
+            val = None
+        if (val is None or val.dtype.kind not in "biufc" or
+            (val.dtype.kind == "c" and not allow_complex)):
+            raise UserInputError('the value of "' + name + '" should be ' +
+                                 'a number or an array of numbers')
+        return val.astype(complex if val.dtype.kind == "c" else float)[()]
+
     def check_multiparticle(self, redCp, multip, p_list):
         """for reduced couplings"""
         
@@ -543,7 +684,7 @@ class ReadUserInput:
                 # if multiparticle and individual particles are all
                 # defined, check consistency
                 for p in p_list:
-                    if redCp[multip] != redCp[p]:
+                    if np.any(redCp[multip] != redCp[p]):
                         self.warning('inconsistent definition of the ' +
                                      'couplings to "' + multip + '" and "' +
                                      p + '"; skipping <C to="' +
@@ -555,7 +696,7 @@ class ReadUserInput:
                 
                 # check if a particle tag is given inconsistently
                 for p in given_p:
-                    if redCp[multip] != redCp[p]:
+                    if np.any(redCp[multip] != redCp[p]):
                         raise UserInputError(
                             'inconsistent definition of the ' +
                             'couplings to "' + multip + '" and to "' +
@@ -589,7 +730,7 @@ class ReadUserInput:
                     # if multiprod and individual prod are all
                     # defined, check consistency
                     for subprod in p_list:
-                        if mu_value != mup[subprod,decay]:
+                        if np.any(mu_value != mup[subprod,decay]):
                             self.warning('inconsistent definition of the ' +
                                          'mu prod="' + multip + '" and "' +
                                          prod + '" when decay="' + decay + '"; ' +
@@ -602,7 +743,7 @@ class ReadUserInput:
                     
                     # check if a particle tag is given inconsistently
                     for (subprod,decay) in given_mu:
-                        if mu_value != mup[subprod,decay]:
+                        if np.any(mu_value != mup[subprod,decay]):
                             raise UserInputError(
                                 'inconsistent definition of the mu for prod "' +
                                 subprod + '" and "' + multip +
@@ -638,7 +779,7 @@ class ReadUserInput:
                     # if multidecay and individual decay are all
                     # defined, check consistency
                     for subdecay in p_list:
-                        if mu_value != mup[prod,subdecay]:
+                        if np.any(mu_value != mup[prod,subdecay]):
                             self.warning('inconsistent definition of the ' +
                             'mu decay="' + multip + '" and "' +
                             decay + '" when prod="' + prod + '"; ' +
@@ -651,7 +792,7 @@ class ReadUserInput:
                     
                     # check if a particle tag is given inconsistently
                     for (prod,subdecay) in given_mu:
-                        if mu_value != mup[prod,subdecay]:
+                        if np.any(mu_value != mup[prod,subdecay]):
                             raise UserInputError(
                                 'inconsistent definition of mu for decay "' +
                                 subdecay + '" and "' + multip +
@@ -27,10 +27,6 @@
 
 import os
 import numpy as np
-from math import sqrt, log
-from cmath import sqrt as csqrt
-from cmath import asin as casin
-from cmath import log as clog
 from scipy.interpolate import UnivariateSpline
 from .param import *
 
@@ -83,16 +79,32 @@ def VBF13_ff(spline_deg=3):
 
 
 def fhiggs(t):
-    if t<=1.:
-        return casin(sqrt(t))**2.
-    else:
-        return -(log((sqrt(t) + sqrt(t-1.))/(sqrt(t) - sqrt(t-1.))) - pi*1j )**2./4.
+    """Loop function f(t) for t = mh^2/(4 m^2), given as a number or an
+    array."""
+
+    t = np.asarray(t, dtype=float)
+    below = t <= 1.
+    # each branch is evaluated everywhere, on arguments kept in its domain
+    sb = np.sqrt(np.where(below, t, 0.))
+    sa = np.sqrt(np.where(below, 2., t))
+    sa1 = np.sqrt(np.where(below, 1., t-1.))
+    f = np.where(below, np.arcsin(sb)**2. + 0j,
+                 -(np.log((sa + sa1)/(sa - sa1)) - pi*1j )**2./4.)
+    return f[()]
 
 def ghiggs(t):
-    if t<=1:
-        return csqrt(1-1/t)/2. * ( clog((1 + csqrt(1-1/t))/(1 - csqrt(1-1/t)))-pi*1j)
-    else:
-        return csqrt(1/t-1)*casin(csqrt(t))
+    """Loop function g(t) for t = mh^2/(4 m^2), given as a number or an
+    array."""
+
+    t = np.asarray(t, dtype=float)
+    below = t <= 1
+    # each branch is evaluated everywhere, on arguments kept in its domain
+    tb = np.where(below, t, 0.5)
+    ta = np.where(below, 2., t)
+    s = np.sqrt(1 - 1/tb + 0j)
+    g = np.where(below, s/2. * ( np.log((1 + s)/(1 - s)) - pi*1j),
+                 np.sqrt(1/ta - 1 + 0j)*np.arcsin(np.sqrt(ta + 0j)))
+    return g[()]
 
 
 def I1(tau,l):
@@ -118,8 +130,15 @@ def A1Zgamma(tau,l):
 def A12A(tau):
     return 2/tau*fhiggs(tau)
 
+def A0(tau):
+    return -1./tau *(1.-1./tau * fhiggs(tau))
+
 
 def computeformfactors():
+    """LO form factors as functions of the Higgs mass, which may be given
+    as an array; the loop functions above likewise take arrays of tau for
+    scans over the masses of new particles."""
+
     FF = {}
     
     FF["A12t"] = lambda mh: A12((mh/(2.*mt))**2)
@@ -166,7 +185,7 @@ def redCgammagamma(CT, CB, CC, CL, CW, CTIM, CBIM, CCIM, CLIM, FF, Cgammagammaad
     A12Ab = FF["A12Ab"]
     A12Atau = FF["A12Atau"]
 
-    return (sqrt( ( (abs(3.*(2./3.)**2 *(CT*A12t + CC*A12c) +
+    return (np.sqrt( ( (abs(3.*(2./3.)**2 *(CT*A12t + CC*A12c) +
                        CB*3.*(1./3.)**2 * A12b + CL*A12tau+CW*A1W)**2.) +
                    (abs(3.*(2./3.)**2 *(CTIM*A12At + CCIM*A12Ac) +
                         3.*(-1./3.)**2*CBIM*A12Ab + CLIM*A12Atau)**2)) /
@@ -205,7 +224,7 @@ def redCZgamma(CT, CB, CC, CL, CW, CTIM, CBIM, CCIM, CLIM, FF, CZgammaadd=0.):
     vb = (2*(-1/2.) - 4*(-1/3.)*sW2)
     vl = (2*(-1/2.) - 4*(-1)*sW2)
     
-    return (sqrt( (abs( 1/(cW)*(3.*2/3.*(CT*vt*A12Zt + CC*vc*A12Zc) +
+    return (np.sqrt( (abs( 1/(cW)*(3.*2/3.*(CT*vt*A12Zt + CC*vc*A12Zc) +
                        (3*(-1/3.)*CB*vb*A12Zb +
                         (-1)*CL*vl*A12Ztau)) + CW*A1ZW )**2 +
                   4*abs(1/(cW)*(3.*2/3.*(CTIM*vt*A12AZt + CCIM*vc*A12AZc) +
@@ -231,7 +250,7 @@ def redCgg(CT, CB, CC, CTIM, CBIM, CCIM, FF, Cggadd=0.):
     A12Ac = FF["A12Ac"]
     A12Ab = FF["A12Ab"]
     
-    return (sqrt( (abs(0.75*(CT*A12t + CB*A12b + CC*A12c))**2 +
+    return (np.sqrt( (abs(0.75*(CT*A12t + CB*A12b + CC*A12c))**2 +
                   abs(0.75*(CTIM*A12At + CBIM*A12Ab + CCIM*A12Ac))**2)/
                  (abs(0.75*(A12t + A12b + A12c))**2) )
            + Cggadd)
@@ -251,7 +270,7 @@ def redCVBF(CW, CZ, grid_interp):
     VBFZ_LO = grid_interp["CVBFZ_LO"]
     VBFWZ_LO = grid_interp["CVBFWZ_LO"]
     
-    return sqrt( (CW**2*VBFW_LO + CZ**2*VBFZ_LO + CW*CZ*VBFWZ_LO)/
+    return np.sqrt( (CW**2*VBFW_LO + CZ**2*VBFZ_LO + CW*CZ*VBFWZ_LO)/
                  (VBFW_LO + VBFZ_LO + VBFWZ_LO) )
 
 #### 13 TeV production: VBF -> h cross section @ LO & reduced coupling ####
@@ -260,5 +279,5 @@ def redCVBF13(CW, CZ, grid_interp):
     VBFZ_LO = grid_interp["CVBF13Z_LO"]
     VBFWZ_LO = grid_interp["CVBF13WZ_LO"]
 
-    return sqrt( (CW**2*VBFW_LO + CZ**2*VBFZ_LO + CW*CZ*VBFWZ_LO)/
+    return np.sqrt( (CW**2*VBFW_LO + CZ**2*VBFZ_LO + CW*CZ*VBFWZ_LO)/
                  (VBFW_LO + VBFZ_LO + VBFWZ_LO) )
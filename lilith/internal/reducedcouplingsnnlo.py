@@ -26,7 +26,8 @@
 ##########################################################################
 
 import os
-from math import sqrt
+import numpy as np
+from numpy import sqrt, maximum
 from scipy.interpolate import UnivariateSpline
 
 wdir = '/'.join(os.path.realpath(__file__).split("/")[:-1])+'/Grids/'
@@ -304,7 +305,7 @@ def redCgammagamma(CT, CB, CC, CL, CW, grid_interp, Cgammagammaadd=0.):
     gagaBL = grid_interp["CgagaBL"]
     gagaTC = grid_interp["CgagaTC"]
     
-    amp_gaga_new = max(0.,(CT**2*gagaTT + CC**2*gagaCC + CB**2*gagaBB +
+    amp_gaga_new = maximum(0.,(CT**2*gagaTT + CC**2*gagaCC + CB**2*gagaBB +
                     CL**2*gagaLL + CW**2*gagaWW +
                     CT*CB*gagaTB + CC*CB*gagaCB +
                     CT*CL*gagaTL + CC*CL*gagaCL +
@@ -339,7 +340,7 @@ def redCZgamma(CT, CB, CC, CL, CW, grid_interp, CZgammaadd=0.):
     ZgaBL = grid_interp["CZgaBL"]
     ZgaTC = grid_interp["CZgaTC"]
     
-    amp_Zga_new = max(0.,(CT**2*ZgaTT + CC**2*ZgaCC + CB**2*ZgaBB +
+    amp_Zga_new = maximum(0.,(CT**2*ZgaTT + CC**2*ZgaCC + CB**2*ZgaBB +
                     CL**2*ZgaLL + CW**2*ZgaWW +
                     CT*CB*ZgaTB + CC*CB*ZgaCB +
                     CT*CL*ZgaTL + CC*CL*ZgaCL +
@@ -428,26 +429,101 @@ def redCggF_Tev(CT, CB, grid_interp):
 # begin LDN added
 # ref: https://twiki.cern.ch/twiki/bin/view/LHCPhysics/LHCHXSWG2KAPPA
 #### 8 TeV production, mH = 125 GeV: pp -> tHq (t-channel) cross section & reduced coupling ####
+tHq_coefficients = {"TT": 2.984, "WW": 3.886, "TW": -5.870}
 def redCtHq(CW, CT):
-    return sqrt( 2.984*CT**2 + 3.886*CW**2 - 5.870*CT*CW )
+    c = tHq_coefficients
+    return sqrt( c["TT"]*CT**2 + c["WW"]*CW**2 + c["TW"]*CT*CW )
 
 #### 13 TeV production, mH = 125 GeV: pp -> tHq (t-channel) cross section & reduced coupling ####
+tHq13_coefficients = {"TT": 2.633, "WW": 3.578, "TW": -5.211}
 def redCtHq13(CW, CT):
-    return sqrt( 2.633*CT**2 + 3.578*CW**2 - 5.211*CT*CW )
+    c = tHq13_coefficients
+    return sqrt( c["TT"]*CT**2 + c["WW"]*CW**2 + c["TW"]*CT*CW )
 
 #### 8 TeV production, mH = 125 GeV: pp -> tHW cross section & reduced coupling ####
+tHW_coefficients = {"TT": 2.426, "WW": 1.818, "TW": -3.244}
 def redCtHW(CW, CT):
-    return sqrt( 2.426*CT**2 + 1.818*CW**2 - 3.244*CT*CW )
+    c = tHW_coefficients
+    return sqrt( c["TT"]*CT**2 + c["WW"]*CW**2 + c["TW"]*CT*CW )
 
 #### 13 TeV production, mH = 125 GeV: pp -> tHW cross section & reduced coupling ####
+tHW13_coefficients = {"TT": 2.909, "WW": 2.310, "TW": -4.220}
 def redCtHW13(CW, CT):
-    return sqrt( 2.909*CT**2 + 2.310*CW**2 - 4.220*CT*CW )
+    c = tHW13_coefficients
+    return sqrt( c["TT"]*CT**2 + c["WW"]*CW**2 + c["TW"]*CT*CW )
 
 #### 8 TeV production, mH = 125 GeV: gg -> ZH cross section & reduced coupling ####
+ggZH_coefficients = {"TT": 0.372, "BB": 0.0004, "ZZ": 2.302, "TB": 0.003,
+                     "TZ": -1.663, "BZ": -0.013}
 def redCggZH(CZ, CT, CB):
-    return sqrt( 0.372*CT**2 + 0.0004*CB**2 + 2.302*CZ**2 + 0.003*CT*CB - 1.663*CT*CZ - 0.013*CB*CZ )
+    c = ggZH_coefficients
+    return sqrt( c["TT"]*CT**2 + c["BB"]*CB**2 + c["ZZ"]*CZ**2 + c["TB"]*CT*CB + c["TZ"]*CT*CZ + c["BZ"]*CB*CZ )
 
 #### 13 TeV production, mH = 125 GeV: gg -> ZH cross section & reduced coupling ####
+ggZH13_coefficients = {"TT": 0.456, "BB": 0.0004, "ZZ": 2.455, "TB": 0.003,
+                       "TZ": -1.902, "BZ": -0.011}
 def redCggZH13(CZ, CT, CB):
-    return sqrt( 0.456*CT**2 + 0.0004*CB**2 + 2.455*CZ**2 + 0.003*CT*CB - 1.902*CT*CZ - 0.011*CB*CZ )
+    c = ggZH13_coefficients
+    return sqrt( c["TT"]*CT**2 + c["BB"]*CB**2 + c["ZZ"]*CZ**2 + c["TB"]*CT*CB + c["TZ"]*CT*CZ + c["BZ"]*CB*CZ )
 # end LDN added
+
+#### quadratic forms of the reduced couplings, for arrays of couplings ####
+
+# the squared reduced couplings of the processes above are quadratic forms
+# c^T Q c of the coupling vector c of the top, bottom, charm, tau, W and Z
+# reduced couplings
+coupling_labels = ["T", "B", "C", "L", "W", "Z"]
+coupling_keys = ["tt", "bb", "cc", "tautau", "WW", "ZZ"]
+
+# pair of couplings of each interpolated coefficient, for each process
+# computed from the form factors
+gaga_pairs = ["TT", "CC", "BB", "LL", "WW", "TB", "CB", "TL", "CL", "TW",
+              "CW", "BW", "LW", "BL", "TC"]
+quadratic_terms = {
+    "gammagamma": dict(("Cgaga" + XY, XY) for XY in gaga_pairs),
+    "Zgamma": dict(("CZga" + XY, XY) for XY in gaga_pairs),
+    "gg_decay": dict(("Cgg" + XY, XY)
+                     for XY in ["TT", "CC", "BB", "TB", "CB", "TC"]),
+    "VBF": {"CVBFW_NLO": "WW", "CVBFZ_NLO": "ZZ", "CVBFWZ_NLO": "WZ"},
+    "VBF13": {"CVBF13W_NLO": "WW", "CVBF13Z_NLO": "ZZ",
+              "CVBF13WZ_NLO": "WZ"},
+    "gg_prod_lhc8": {"CggFT_NNLO_LHC8": "TT", "CggFB_NNLO_LHC8": "BB",
+                     "CggFTB_NNLO_LHC8": "TB"},
+    "gg_prod_lhc13": {"CggFT_NNLO_LHC13": "TT", "CggFB_NNLO_LHC13": "BB",
+                      "CggFTB_NNLO_LHC13": "TB"}}
+# coefficients of the processes computed at mH = 125 GeV, not normalized
+fixed_coefficients = {"tHq": tHq_coefficients, "tHq13": tHq13_coefficients,
+                      "tHW": tHW_coefficients, "tHW13": tHW13_coefficients,
+                      "ggZH": ggZH_coefficients, "ggZH13": ggZH13_coefficients}
+# processes whose squared amplitude is set to 0 if negative
+clipped = ["gammagamma", "Zgamma"]
+
+def quadratic_form(coefficients, normalize=True):
+    """Matrix Q such that c^T Q c is the squared reduced coupling given by
+    the coefficients {pair of couplings: value}, normalized to 1 for SM
+    couplings if normalize is True."""
+
+    Q = np.zeros((len(coupling_labels), len(coupling_labels)))
+    for XY, value in list(coefficients.items()):
+        i = coupling_labels.index(XY[0])
+        j = coupling_labels.index(XY[1])
+        Q[i, j] += value/2.
+        Q[j, i] += value/2.
+    if normalize:
+        Q /= sum(coefficients.values())
+    return Q
+
+def quadratic_values(C, Q):
+    """Values c^T Q c of the quadratic forms Q of shape (P, 6, 6) for the
+    couplings C, a list of the 6 coupling arrays of shape S, as an array of
+    shape (P,) + S."""
+
+    # products c_i c_j, for the pairs of couplings entering some form only
+    i, j = np.triu_indices(len(coupling_labels))
+    weights = Q[:, i, j]*np.where(i == j, 1., 2.)
+    used = np.flatnonzero(np.any(weights != 0., axis=0))
+    shape = np.shape(C[0])
+    products = np.empty((len(used), np.size(C[0])))
+    for k, n in enumerate(used):
+        np.multiply(np.ravel(C[i[n]]), np.ravel(C[j[n]]), out=products[k])
+    return weights[:, used].dot(products).reshape((len(Q),) + shape)
@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Counters and latencies of the stages of the likelihood computation."""
+
+import collections
+import numpy as np
+
+class Stats:
+    """Accumulates the number of calls and the latencies of the stages of the
+    computation (readuserinput, computecouplings, ...), the hits and misses
+    of caches and, if per_measurement is True, the cost of the likelihood
+    of each experimental result, indexed by its file path. This detailed
+    timing adds a clock read per measurement and is off by default.
+
+    Percentiles are computed over the last window latencies of each stage.
+    The functions in hooks are called as hook(stage, dt, npoints) for every
+    recorded stage."""
+
+    def __init__(self, per_measurement=False, window=1000):
+        self.per_measurement = per_measurement
+        self.window = window
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        """Clears all counters."""
+
+        # stage -> [calls, points, cumulative time, recent latencies]
+        self.stages = {}
+        # cache -> [hits, misses]
+        self.caches = {}
+        # experimental file path -> [calls, points, cumulative time]
+        self.measurements = {}
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, stage, dt, npoints=1):
+        """Records a call of stage taking dt seconds for npoints points."""
+
+        try:
+            entry = self.stages[stage]
+        except KeyError:
+            entry = self.stages[stage] = [0, 0, 0.,
+                collections.deque(maxlen=self.window)]
+        entry[0] += 1
+        entry[1] += npoints
+        entry[2] += dt
+        entry[3].append(dt)
+        for hook in self.hooks:
+            hook(stage, dt, npoints)
+
+    def record_measurement(self, filepath, dt, npoints=1):
+        """Records the computation of the likelihood of an experimental
+        result for npoints points."""
+
+        try:
+            entry = self.measurements[filepath]
+        except KeyError:
+            entry = self.measurements[filepath] = [0, 0, 0.]
+        entry[0] += 1
+        entry[1] += npoints
+        entry[2] += dt
+
+    def record_cache(self, cache, hits=0, misses=0):
+        """Records hits and misses of a cache."""
+
+        try:
+            entry = self.caches[cache]
+        except KeyError:
+            entry = self.caches[cache] = [0, 0]
+        entry[0] += hits
+        entry[1] += misses
+
+    def summary(self, top=None):
+        """Dictionary of the statistics accumulated so far. The experimental
+        results are sorted by decreasing cumulative cost and, if top is
+        given, only the top most costly ones are kept."""
+
+        stages = {}
+        for stage, (calls, npoints, total, latencies) in list(
+                self.stages.items()):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            stages[stage] = {"calls": calls, "points": npoints,
+                             "total": total, "mean": total/calls,
+                             "p50": p50, "p90": p90, "p99": p99,
+                             "max": max(latencies)}
+
+        caches = {}
+        for cache, (hits, misses) in list(self.caches.items()):
+            caches[cache] = {"hits": hits, "misses": misses,
+                             "hit_rate": hits/float(max(1, hits + misses))}
+
+        ordered = sorted(list(self.measurements.items()),
+                         key=lambda item: -item[1][2])
+        measurements = collections.OrderedDict()
+        for filepath, (calls, npoints, total) in ordered[:top]:
+            measurements[filepath] = {"calls": calls, "points": npoints,
+                                      "total": total,
+                                      "per_point": total/max(1, npoints)}
+
+        return {"stages": stages, "caches": caches,
+                "measurements": measurements}
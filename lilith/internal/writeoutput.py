@@ -25,9 +25,15 @@
 #
 ##########################################################################
 
+import os
+import struct
+import time
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
 import scipy.stats
 from ..errors import OutputError, OuputIOError
 from ..version import __version__
+from .computelikelihood import LikelihoodResults
 """Write the XML and SLHA-like output in files."""
 
 """Initialize the reading of the user input from the XML input contained
@@ -317,3 +323,177 @@ def results_slha_pvalue(results, l, l_ref, ndf, filepath, db):
 
 
 
+
+
+class ResultsStream:
+    """Stream of results for large scans, written chunk by chunk to a .npy
+    file holding a structured array with one field per input, the field "l"
+    for -2log(likelihood) and optionally the field "l_exp" for the
+    contributions of each experimental result. The file can be read at any
+    time with numpy.load (possibly with mmap_mode="r") and contains the
+    points flushed so far; the experimental results corresponding to l_exp
+    are listed in the XML header written in filepath + ".xml"."""
+
+    def __init__(self, filepath, inputs, measurements=None,
+                 lilithversion=__version__, dbversion="??.??",
+                 chunksize=65536, flushinterval=None):
+        """Open filepath for the inputs given as a list of names, with
+        per-measurement contributions if measurements, a list of the
+        elements of exp_mu, is given. At most chunksize points are kept in
+        memory before being flushed, and if flushinterval is given, the
+        points appended are flushed once flushinterval seconds have passed
+        since the last flush."""
+
+        fields = [(name, "<f8") for name in inputs] + [("l", "<f8")]
+        if measurements is not None:
+            fields.append(("l_exp", "<f8", (len(measurements),)))
+        try:
+            self.dtype = np.dtype(fields)
+        except ValueError as e:
+            raise OutputError("invalid input names for the results: " +
+                              str(e))
+        self.inputs = list(inputs)
+        self.per_measurement = measurements is not None
+        self.filepath = filepath
+        self.buffer = np.empty(chunksize, dtype=self.dtype)
+        self.nbuffer = 0 # points in the buffer
+        self.npoints = 0 # points written in the file
+        self.flushinterval = flushinterval
+        self.lastflush = time.monotonic()
+
+        # the .npy header is rewritten at each flush with the number of
+        # points, so it is given enough room for any number of points
+        self.headersize = 0
+        self.headersize = len(self.header(10**18))
+
+        try:
+            self.file = open(filepath, "wb")
+            self.file.write(self.header(0))
+            self.file.flush()
+        except IOError as e:
+            raise OuputIOError(
+            'I/O error({0}): {1}'.format(e.errno, e.strerror) + '; cannot' +
+            ' write in the output file "' + filepath + '".')
+        self.writeinfo(measurements, lilithversion, dbversion)
+
+    def header(self, npoints):
+        """.npy header for npoints points, padded to self.headersize bytes
+        once it is known."""
+
+        text = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+            np.lib.format.dtype_to_descr(self.dtype), npoints)
+        # magic string, version 1.0 and header length take 10 bytes
+        length = max(self.headersize - 10, len(text) + 1)
+        length += -(10 + length) % 64
+        return (b"\x93NUMPY\x01\x00" + struct.pack("<H", length) +
+                (text + " "*(length - len(text) - 1) + "\n").encode("latin1"))
+
+    def writeinfo(self, measurements, lilithversion, dbversion):
+        """Write the XML header describing the columns."""
+
+        try:
+            with open(self.filepath + ".xml", "w") as f:
+                f.write("<lilithresults>\n\n")
+                f.write("  <lilithversion>{}</lilithversion>\n".format(
+                    escape(str(lilithversion))))
+                f.write("  <dbversion>{}</dbversion>\n\n".format(
+                    escape(str(dbversion))))
+                f.write('  <data file={} chunksize="{}">\n'.format(
+                    quoteattr(os.path.basename(self.filepath)),
+                    len(self.buffer)))
+                for name in self.inputs:
+                    f.write('    <input>{}</input>\n'.format(escape(name)))
+                f.write("    <l>-2log(likelihood)</l>\n")
+                if self.per_measurement:
+                    f.write("    <l_exp>\n")
+                    for mu in measurements:
+                        f.write('      <analysis experiment={} source={}'
+                                ' sqrts={} file={}/>\n'.format(
+                                    quoteattr(str(mu["experiment"])),
+                                    quoteattr(str(mu["source"])),
+                                    quoteattr(str(mu["sqrts"])),
+                                    quoteattr(str(mu["filepath"]))))
+                    f.write("    </l_exp>\n")
+                f.write("  </data>\n\n</lilithresults>\n")
+        except IOError as e:
+            raise OuputIOError(
+            'I/O error({0}): {1}'.format(e.errno, e.strerror) + '; cannot' +
+            ' write in the output file "' + self.filepath + '.xml".')
+
+    def append(self, inputs, l, l_exp=None):
+        """Append points given by the dictionary inputs of input values,
+        the values l of -2log(likelihood) and, for a stream with
+        per-measurement contributions, l_exp of shape (npoints, number of
+        experimental results) or the results of Lilith for a single
+        point. Values may be numbers or arrays of npoints values."""
+
+        if self.file is None:
+            raise OutputError("the results stream is closed")
+        l = np.ravel(l)
+        npoints = len(l)
+        if self.per_measurement:
+            if l_exp is None:
+                raise OutputError("per-measurement contributions missing")
+            if isinstance(l_exp, LikelihoodResults):
+                l_exp = l_exp.l
+            l_exp = np.reshape(l_exp, (npoints, -1))
+        try:
+            columns = [np.broadcast_to(np.ravel(inputs[name]), (npoints,))
+                       for name in self.inputs]
+        except KeyError as e:
+            raise OutputError("input " + str(e) + " missing in the results")
+        except ValueError:
+            raise OutputError("inputs and likelihoods have different sizes")
+
+        start = 0
+        while start < npoints:
+            stop = min(npoints, start + len(self.buffer) - self.nbuffer)
+            rows = self.buffer[self.nbuffer:self.nbuffer + stop - start]
+            for name, column in zip(self.inputs, columns):
+                rows[name] = column[start:stop]
+            rows["l"] = l[start:stop]
+            if self.per_measurement:
+                rows["l_exp"] = l_exp[start:stop]
+            self.nbuffer += stop - start
+            start = stop
+            if self.nbuffer == len(self.buffer):
+                self.flush()
+        if (self.flushinterval is not None and
+            time.monotonic() - self.lastflush >= self.flushinterval):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered points and update the number of points in the
+        file."""
+
+        self.lastflush = time.monotonic()
+        if self.file is None or self.nbuffer == 0:
+            return
+        try:
+            self.file.write(self.buffer[:self.nbuffer].tobytes())
+            self.npoints += self.nbuffer
+            self.nbuffer = 0
+            self.file.seek(0)
+            self.file.write(self.header(self.npoints))
+            self.file.seek(0, os.SEEK_END)
+            self.file.flush()
+        except IOError as e:
+            raise OuputIOError(
+            'I/O error({0}): {1}'.format(e.errno, e.strerror) + '; cannot' +
+            ' write in the output file "' + self.filepath + '".')
+
+    def close(self):
+        """Flush the remaining points and close the file."""
+
+        if self.file is not None:
+            try:
+                self.flush()
+            finally:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -31,15 +31,24 @@
 import os.path, time, sys
 import importlib
 from warnings import warn
+import numpy as np
 # Lilith library
 from .errors import ExpNdfComputationError, UserMuTotComputationError, \
-                   UserInputIOError
-from .internal.readexpinput import ReadExpInput
+                   UserInputIOError, UserInputError
+from .internal.readexpinput import ReadExpInput, read_files
+from .internal.expcache import ExpInputCache, filestamp, fresh
+from .internal.stats import Stats
+from .internal.memo import MemoCache
+from .internal.gridlikelihood import interpolations
 from .internal.readuserinput import ReadUserInput
 from .internal.computereducedcouplings import ComputeReducedCouplings
 from .internal.computemufromreducedcouplings import \
-    ComputeMuFromReducedCouplings
-from .internal.computelikelihood import compute_likelihood
+    ComputeMuFromReducedCouplings, effective_coupling, visible_couplings, \
+    prod_coupling_list
+from .internal.computelikelihood import compute_likelihood, \
+    compute_likelihood_batch, compute_likelihood_gradient_batch, \
+    results_table
+from .internal import channels
 import lilith.internal.writeoutput as writeoutput
 import lilith.version as version
 
@@ -52,13 +61,58 @@ class Lilith:
         os.path.dirname(os.path.abspath(__file__)).split("/")[:-1]) +
         "/data/latest.list")
 
-    def __init__(self, verbose=False, timer=False):
-        """Initialize the relevant attributes."""
+    def __init__(self, verbose=False, timer=False, cachedir=None,
+                 stats=False, grid_interpolation="spline", lazy=False,
+                 memosize=0, memodecimals=None):
+        """Initialize the relevant attributes.
+
+        If cachedir is given, the parsed experimental input is cached in
+        this directory and reused as long as the XML files do not change.
+        If stats is True (or a Stats object, possibly shared between
+        several Lilith objects), call counts, latencies and cache hit
+        rates are accumulated in self.stats; pass
+        Stats(per_measurement=True) to also time each experimental
+        result. grid_interpolation selects
+        the evaluation of the likelihoods of type "f": "spline" (exact),
+        or the faster "linear" and "cubic" interpolations of a refined
+        table of the spline. If lazy is True, readexpinput only reads the
+        header, efficiencies and best fit of each experimental result, and
+        the rest (likelihood parameters, grids and their splines) is read
+        at the first computation of the likelihood or by loadexpinput;
+        the results read that way are not stored in the cache of cachedir.
+        If memosize is positive, the results of computelikelihood for the
+        last memosize user inputs are kept in self.memo, the user inputs
+        being compared with their numbers rounded to memodecimals (exactly
+        if None), and returned without recomputation."""
 
         # controls the information displayed on the screen
         self.verbose = verbose
         self.timer = timer
 
+        # statistics of the computation, None if disabled
+        if stats is True:
+            self.stats = Stats()
+        elif stats is False:
+            self.stats = None
+        else:
+            self.stats = stats
+
+        # directory of the persistent cache of the experimental input
+        self.cachedir = cachedir
+
+        if grid_interpolation not in interpolations:
+            raise UserInputError(
+                'grid interpolation "' + str(grid_interpolation) + '" is ' +
+                'unknown, should be one of ' + ", ".join(interpolations))
+        self.grid_interpolation = grid_interpolation
+        self.lazy = lazy
+
+        # memoization of computelikelihood, None if disabled
+        if memosize > 0:
+            self.memo = MemoCache(memosize, memodecimals)
+        else:
+            self.memo = None
+
         # objects needed for the computation of reduced couplings and of
         # signal strengths from reduced couplings
         self.coupling_computation = None
@@ -68,18 +122,40 @@ class Lilith:
         # each element of self.exp_mu corresponds to an XML file
         self.exp_mu = []
         self.exp_ndf = 0
+        # list file of the experimental input, and modification times and
+        # content hashes of the files of each element of self.exp_mu
+        self.exp_filepath = None
+        self.exp_stamps = {}
+        # number of elements of self.exp_mu not fully read yet (lazy mode)
+        self.exp_pending = 0
+        # efficiencies and best fits of self.exp_mu compiled into a matrix
+        # (one row per axis, one column per channel) and a vector
+        self.exp_eff = None
+        self.exp_bestfit = None
+        # metadata of self.exp_mu given in self.results, and preallocated
+        # contributions of self.exp_mu for computelikelihood(totalonly=True)
+        self.exp_table = []
+        self.exp_l = np.empty(0)
         self.dbversion = "??.??"
 
         # information read from the user input
         # - in signal strengths mode, self.couplings remains empty
         # - each element of self.couplings and self.user_mu
         #   corresponds to a Higgs particle defined in the input
+        # - the signal strengths are arrays in the canonical channel layout
+        #   of lilith.internal.channels, the mass and name of each particle
+        #   being in self.user_mu_extra; self.user_mu_tot is None until
+        #   they are computed
         self.mode = ""
         self.couplings = []
         self.user_mu = []
-        self.user_mu_tot = {}
+        self.user_mu_extra = []
+        self.user_mu_tot = None
+        # key of the user input in self.memo, taken when it is read or set
+        self.inputkey = None
 
-        # detailed likelihood results as well as the final result
+        # detailed likelihood results (a LikelihoodResults, or None after
+        # computelikelihood(totalonly=True)) as well as the final result
         # self.l is defined as -2 log(total likelihood)
         self.results = []
         self.l = 0.
@@ -91,30 +167,35 @@ class Lilith:
         if self.verbose:
             print(message)
 
-    def tinfo(self, action, dt):
-        """Print time taken for a given action"""
+    def tinfo(self, action, dt, stage=None, npoints=1):
+        """Print time taken for a given action, and record it in the
+        statistics under the name stage"""
 
         if self.timer:
             print("- " + action + ": " + str(dt) + "s")
+        if self.stats is not None and stage is not None:
+            self.stats.record(stage, dt, npoints)
 
     def readuserinput(self, userinput):
         """Read the XML input given by the user."""
 
         self.info("Reading the user input...")
-        t0 = time.time()
+        t0 = time.perf_counter()
         userinput = ReadUserInput(userinput)
-        self.tinfo("reading of the user input", time.time() - t0)
+        self.tinfo("reading of the user input", time.perf_counter() - t0,
+                   "readuserinput")
         self.mode = userinput.mode
 
         if userinput.mode == "reducedcouplings":
             self.user_mu = []
-            self.user_mu_tot = {}
+            self.user_mu_extra = []
+            self.user_mu_tot = None
             self.couplings = userinput.redC
+            self.setinputkey()
             self.info("User input: reduced couplings\n")
         else:
             self.couplings = []
-            self.user_mu = userinput.mu
-            self.compute_user_mu_tot()
+            self.setusermu(userinput.mu)
             self.info("User input: signal strengths\n")
 
     def readuserinputfile(self, filepath):
@@ -128,13 +209,75 @@ class Lilith:
                 'I/O error({0}): {1}'.format(e.errno, e.strerror) + '; cannot' +
                 ' open the user input file "' + filepath + '".')
 
+    def set_reducedcouplings(self, mass=125.09, precision="BEST-QCD",
+                             BRinvisible=0., BRundetected=0., **couplings):
+        """Set the reduced couplings of a single Higgs particle directly,
+           without going through the XML input, and compute the signal
+           strengths. The couplings are given as keyword arguments named as
+           in the <C to="..."> tags (tt=..., bb=..., VV=..., tt_im=...,
+           gg_decay=...)."""
+
+        self.info("Setting the user input...")
+        t0 = time.perf_counter()
+        userinput = ReadUserInput()
+        userinput.set_reducedcouplings(couplings, mass, precision,
+                                       BRinvisible, BRundetected)
+        self.tinfo("setting the user input", time.perf_counter() - t0,
+                   "readuserinput")
+        self.mode = userinput.mode
+        self.user_mu = []
+        self.user_mu_extra = []
+        self.user_mu_tot = None
+        self.couplings = userinput.redC
+        self.setinputkey()
+        self.info("User input: reduced couplings\n")
+        self.computecouplings()
+        self.computemufromreducedcouplings()
+
+    def set_signalstrengths(self, mu, mass=125.09):
+        """Set the signal strengths of a single Higgs particle directly,
+           without going through the XML input. mu is either a dictionary
+           indexed by (prod, decay) or an array in the canonical channel
+           layout of lilith.internal.channels."""
+
+        self.info("Setting the user input...")
+        t0 = time.perf_counter()
+        userinput = ReadUserInput()
+        userinput.set_signalstrengths(mu, mass)
+        self.tinfo("setting the user input", time.perf_counter() - t0,
+                   "readuserinput")
+        self.mode = userinput.mode
+        self.couplings = []
+        self.setusermu(userinput.mu)
+        self.info("User input: signal strengths\n")
+
+    def setusermu(self, mu):
+        """Set the signal strengths from the list of dictionaries read from
+        the user input, indexed by (prod, decay) with the entry "extra"."""
+
+        self.user_mu = [channels.tovector(mup) for mup in mu]
+        self.user_mu_extra = [mup["extra"] for mup in mu]
+        self.compute_user_mu_tot()
+        self.setinputkey()
+
+    def setinputkey(self):
+        """Take the key of the user input in self.memo, before the reduced
+        couplings are completed by computecouplings, so that the same input
+        always gives the same key."""
+
+        if self.memo is None:
+            self.inputkey = None
+        else:
+            self.inputkey = self.memo.key((self.mode, self.couplings or
+                                           (self.user_mu, self.user_mu_extra)))
+
     def computecouplings(self):
         """Computes missing reduced couplings."""
 
         computablecouplings = ["gg_prod_lhc8", "gg_decay", "gammagamma",
                                "Zgamma", "VBF","gg_prod_lhc13", "VBF13"]
 
-        t0 = time.time()
+        t0 = time.perf_counter()
         for n,redCp in enumerate(self.couplings, start=1):
             missing_couplings = False
             for coupling in computablecouplings:
@@ -162,23 +305,26 @@ class Lilith:
                 for cname,cvalue in list(new_redC.items()):
                     self.info(". " + cname + " = " + str(cvalue))
                 redCp.update(new_redC)
-        self.tinfo("computing missing reduced couplings", time.time() - t0)
+        self.tinfo("computing missing reduced couplings",
+                   time.perf_counter() - t0, "computecouplings")
 
     def computemufromreducedcouplings(self):
         """Computes signal strengths from reduced couplings."""
 
-        t0 = time.time()
+        t0 = time.perf_counter()
         self.user_mu = []
+        self.user_mu_extra = []
         for redCp in self.couplings:
             if self.mu_computation is None:
                 self.mu_computation = ComputeMuFromReducedCouplings(
                     redCp["extra"]["mass"])
             else:
                 self.mu_computation.reset(redCp["extra"]["mass"])
-            self.user_mu.append(self.mu_computation.getmu(redCp))
+            self.user_mu.append(self.mu_computation.getmuvector(redCp))
+            self.user_mu_extra.append(self.mu_computation.getextra(redCp))
         self.compute_user_mu_tot()
         self.tinfo("computing mu from reduced couplings",
-                   time.time() - t0)
+                   time.perf_counter() - t0, "computemufromreducedcouplings")
 
     def compute_user_mu_tot(self):
         """Adds up the signal strengths obtained from the user input."""
@@ -188,30 +334,168 @@ class Lilith:
                 "user_mu is empty, read signal strengths user input " +
                 "or compute signal strengths from couplings first")
 
-        self.user_mu_tot = {}
-        for mup in self.user_mu:
-            for key in mup:
-                if key == "extra": # only consider signal strengths
-                    continue
-                if key in self.user_mu_tot:
-                    self.user_mu_tot[key] += mup[key]
-                else:
-                    self.user_mu_tot[key] = mup[key]
+        self.user_mu_tot = self.user_mu[0].copy()
+        for mup in self.user_mu[1:]:
+            self.user_mu_tot += mup
 
-    def readexpinput(self, filepath=default_exp_list):
-        """Read the experimental input specified in a list file."""
+    def readexpinput(self, filepath=default_exp_list, workers=1):
+        """Read the experimental input specified in a list file. With
+        workers > 1, the XML files that are not cached are read in parallel
+        by a pool of worker processes; the experimental results are kept
+        in the order of the list file."""
     
         self.info("Processing the experimental input...")
         self.readdbversion()
+        t0 = time.perf_counter()
+        self.readexpfiles(filepath, {}, workers)
+        self.tinfo("reading the experimental input", time.perf_counter() - t0,
+                   "readexpinput")
+
+    def reloadexpinput(self, workers=1):
+        """Read again the list file of the experimental input, only reading
+        the XML files that have been added to it or whose content (or that
+        of their <grid> file) has changed since they were read. Results
+        removed from the list are dropped. Returns a dictionary of the
+        lists of "added", "modified" and "removed" files."""
+
+        if self.exp_filepath is None:
+            self.readexpinput(workers=workers)
+            return {"added": list(self.exp_stamps), "modified": [],
+                    "removed": []}
+
+        self.info("Reloading the experimental input...")
+        self.readdbversion()
+        t0 = time.perf_counter()
+        previous = dict((os.path.abspath(mu["filepath"]), mu)
+                        for mu in self.exp_mu)
+        stamps = self.exp_stamps
+        read = self.readexpfiles(self.exp_filepath, previous, workers)
+        self.tinfo("reloading the experimental input",
+                   time.perf_counter() - t0, "readexpinput")
+        return {"added": [key for key in read if key not in stamps],
+                "modified": [key for key in read if key in stamps],
+                "removed": [key for key in stamps
+                            if key not in self.exp_stamps]}
+
+    def readexpfiles(self, filepath, previous, workers=1):
+        """Set the experimental input to the results of the XML files of
+        the list file filepath. The results of previous, indexed by the
+        absolute path of their file, are kept if their files have not
+        changed since they were read, the others are taken from the cache
+        or read. Returns the absolute paths of the files read, each once,
+        leaving out the files listed twice that were kept for one of their
+        occurrences."""
+
         # initialize the reading of the experimental input
         exp_input = ReadExpInput()
         # read the list of XML files
         filelist = exp_input.get_filelist(filepath)
-        # read and check each individual XML file
-        for expfile in filelist:
-            exp_input.read_file(expfile)
+        if self.cachedir is None:
+            cache = None
+        else:
+            cache = ExpInputCache(self.cachedir, filepath)
+        keys = [os.path.abspath(expfile) for expfile in filelist]
+
+        # results that are still valid, the files listed twice being read
+        # again for their second occurrence
+        kept = [previous.pop(key, None) for key in keys]
+        for i, key in enumerate(keys):
+            try:
+                if kept[i] is not None and not all(
+                        fresh(path, stamp)
+                        for path, stamp in list(self.exp_stamps[key].items())):
+                    kept[i] = None
+            except OSError:
+                kept[i] = None
+        if cache is not None:
+            for key, mu in zip(keys, kept):
+                if mu is not None:
+                    # keep the entry of the file in the cache
+                    cache.get(key)
+
+        # read and check each other XML file, unless it is cached
+        if cache is None:
+            cached = [None]*len(filelist)
+        else:
+            cached = [None if mu is not None else cache.get(expfile)
+                      for expfile, mu in zip(filelist, kept)]
+            if self.stats is not None:
+                hits = len(filelist) - cached.count(None)
+                self.stats.record_cache("expinput", hits=hits,
+                                        misses=kept.count(None) - hits)
+        read = iter(read_files([expfile for expfile, mu, cached_mu
+                                in zip(filelist, kept, cached)
+                                if mu is None and cached_mu is None],
+                               self.lazy, workers))
+        stamps = {}
+        for expfile, key, mu, cached_mu in zip(filelist, keys, kept, cached):
+            if mu is not None:
+                stamps[key] = self.exp_stamps[key]
+            else:
+                mu = cached_mu
+                if mu is None:
+                    mu = next(read)
+                    # the results left pending in lazy mode are not
+                    # cached, the cache being shared with the readers
+                    # that parse everything
+                    if cache is not None and not mu["pending"]:
+                        cache.set(expfile, mu)
+                stamps[key] = self.stampexpfile(mu)
+            exp_input.mu.append(mu)
+        if cache is not None:
+            cache.save()
+
+        # the rows of the results kept are copied from the previous
+        # matrices
+        exp_input.compile(self.grid_interpolation, eff=self.exp_eff,
+                          bestfit=self.exp_bestfit)
+        if self.memo is not None:
+            # the memoized likelihoods are those of the previous input
+            self.memo.clear()
+        self.exp_filepath = filepath
+        self.exp_stamps = stamps
         self.exp_mu = exp_input.mu
+        self.exp_eff = exp_input.eff
+        self.exp_bestfit = exp_input.bestfit
+        self.exp_table = results_table(self.exp_mu)
+        self.exp_l = np.empty(len(self.exp_mu))
+        self.exp_pending = sum(mu["pending"] for mu in self.exp_mu)
         self.compute_exp_ndf()
+        unchanged = set(key for key, mu in zip(keys, kept) if mu is not None)
+        return list(dict.fromkeys(key for key, mu in zip(keys, kept)
+                                  if mu is None and key not in unchanged))
+
+    def stampexpfile(self, mu):
+        """Modification times and content hashes of the XML file of the
+        experimental result mu and of its <grid> file."""
+
+        stamps = {}
+        for path in [mu["filepath"], mu["gridfile"]]:
+            if path is not None:
+                try:
+                    stamps[os.path.abspath(path)] = filestamp(path)
+                except OSError:
+                    # removed since it was read: it will be read again
+                    stamps[os.path.abspath(path)] = [None, None]
+        return stamps
+
+    def loadexpinput(self):
+        """Read the likelihood parameters and grids of the experimental
+        results left pending by readexpinput in lazy mode."""
+
+        if not self.exp_pending:
+            return
+        t0 = time.perf_counter()
+        exp_input = ReadExpInput()
+        for mu in self.exp_mu:
+            if mu["pending"]:
+                exp_input.load(mu, self.grid_interpolation)
+                if mu["gridfile"] is not None:
+                    self.exp_stamps[os.path.abspath(mu["filepath"])].update(
+                        self.stampexpfile(mu))
+        self.exp_pending = 0
+        self.tinfo("loading the pending experimental input",
+                   time.perf_counter() - t0, "loadexpinput")
 
     def readdbversion(self):
         dbversionfile = "/".join(os.path.dirname(os.path.abspath(__file__))
@@ -233,54 +517,307 @@ class Lilith:
                     '" is not found')
 
     def computelikelihood(self, userinput=None, exp_filepath=None,
-                          userfilepath=None):
+                          userfilepath=None, totalonly=False):
         """Computes the likelihood from the signal strengths (computed from)
-           the user input and the experimental results."""
+           the user input and the experimental results. With totalonly,
+           only self.l is computed and self.results is set to None."""
 
-        if userinput is not None or userfilepath is not None:
+        newinput = userinput is not None or userfilepath is not None
+        if newinput:
             # read the user input and get user_mu_tot
             if userinput is not None:
                 self.readuserinput(userinput)
             else:
                 self.readuserinputfile(userfilepath)
-            if self.couplings: # reduced coupling mode
-                self.computecouplings()
-                self.computemufromreducedcouplings()
-        elif self.couplings and not self.user_mu_tot:
-                self.computecouplings()
-                self.computemufromreducedcouplings()
 
         if exp_filepath is not None:
             # read the experimental input and get exp_mu
             self.readexpinput(exp_filepath)
         elif not self.exp_mu:
             self.readexpinput()
-
-        t0 = time.time()
-        self.results, self.l = compute_likelihood(self.exp_mu,
-                                                  self.user_mu_tot,self.mode)
-        self.tinfo("computing the likelihood", time.time() - t0)
+        self.loadexpinput()
+
+        if self.memo is not None:
+            if self.inputkey is None:
+                # user input set without readuserinput or set_*
+                self.setinputkey()
+            key = self.inputkey
+            entry = self.memo.get(key)
+            if entry is not None and not totalonly and entry[4] is None:
+                # computed with totalonly, without the detailed results
+                entry = None
+            if self.stats is not None:
+                self.stats.record_cache("likelihood",
+                                        hits=int(entry is not None),
+                                        misses=int(entry is None))
+            if entry is not None:
+                (self.couplings, self.user_mu, self.user_mu_extra,
+                 self.user_mu_tot, self.results, self.l) = entry
+                if totalonly:
+                    self.results = None
+                return
+
+        if self.couplings and (newinput or self.user_mu_tot is None):
+            # reduced coupling mode
+            self.computecouplings()
+            self.computemufromreducedcouplings()
+
+        t0 = time.perf_counter()
+        self.results, self.l = compute_likelihood(
+            self.exp_mu, self.user_mu_tot, self.exp_eff, self.exp_bestfit,
+            self.stats, self.exp_table, self.exp_l if totalonly else None,
+            totalonly)
+        self.tinfo("computing the likelihood", time.perf_counter() - t0,
+                   "compute_likelihood")
+        if self.memo is not None:
+            self.memo.set(key, (self.couplings, self.user_mu,
+                                self.user_mu_extra, self.user_mu_tot,
+                                self.results, self.l))
         
+    def computelikelihood_batch(self, couplings=None, signalstrengths=None,
+                                mass=125.09, precision="BEST-QCD",
+                                BRinvisible=0., BRundetected=0.,
+                                exp_filepath=None, per_measurement=False):
+        """Computes the likelihood for many points at once, for a single
+           Higgs particle.
+
+           couplings maps the reduced couplings, named as in the <C to="...">
+           tags of the XML input ("tt", "VV", "gammagamma", "gg_decay", ...
+           with "_re" and "_im" suffixes for complex fermion couplings), to
+           arrays of values; signalstrengths maps (prod, decay) tuples to
+           arrays of values. All arrays, as well as BRinvisible and
+           BRundetected, are broadcast against each other. Returns the array
+           of -2log(likelihood) with the broadcast shape and, if
+           per_measurement is True, also the contributions of each
+           element of exp_mu along an additional last axis."""
+
+        if exp_filepath is not None:
+            self.readexpinput(exp_filepath)
+        elif not self.exp_mu:
+            self.readexpinput()
+        self.loadexpinput()
+
+        if couplings is not None:
+            shape, user_mu = self.computemu_batch(couplings, mass, precision,
+                                                  BRinvisible, BRundetected)
+        elif signalstrengths is not None:
+            mup = ReadUserInput().set_signalstrengths(signalstrengths, mass)
+            del mup["extra"]
+            shape = np.broadcast_shapes(*[np.shape(val) for val in mup.values()])
+            for key in mup:
+                mup[key] = np.broadcast_to(mup[key], shape).ravel()
+            user_mu = channels.tovector(mup, int(np.prod(shape)))
+        else:
+            raise UserInputError(
+                "either couplings or signal strengths should be given")
+
+        t0 = time.perf_counter()
+        l, l_exp = compute_likelihood_batch(self.exp_mu, user_mu,
+                                            self.exp_eff, self.exp_bestfit,
+                                            self.stats)
+        self.tinfo("computing the likelihood", time.perf_counter() - t0,
+                   "compute_likelihood_batch", len(user_mu))
+
+        if per_measurement:
+            return l.reshape(shape), l_exp.reshape(shape + (len(self.exp_mu),))
+        return l.reshape(shape)
+
+    def computemu_batch(self, couplings, mass, precision, BRinvisible,
+                        BRundetected):
+        """Computes the signal strengths in the canonical channel layout from
+           arrays of reduced couplings. Returns the broadcast shape of the
+           input and the array of shape (npoints, channels.n_channels)."""
+
+        t0 = time.perf_counter()
+        shape, redCp = self.computecouplings_batch(couplings, mass, precision,
+                                                   BRinvisible, BRundetected)
+        user_mu = self.mu_computation.getmu_batch(
+            redCp, redCp["extra"]["precision"], redCp["extra"]["BRinvisible"],
+            redCp["extra"]["BRundetected"]).reshape(-1, channels.n_channels)
+        self.tinfo("computing mu from reduced couplings",
+                   time.perf_counter() - t0, "computemu_batch",
+                   int(np.prod(shape)))
+
+        return shape, user_mu
+
+    def computecouplings_batch(self, couplings, mass, precision, BRinvisible,
+                               BRundetected):
+        """Completes arrays of reduced couplings with the missing ones, and
+           prepares the computation of the signal strengths at mass.
+           Returns the broadcast shape of the input and the reduced
+           couplings, flattened to arrays of npoints values."""
+
+        redCp = ReadUserInput().set_reducedcouplings(couplings, mass,
+                                                     precision, BRinvisible,
+                                                     BRundetected)
+
+        # every coupling and extra BR becomes a flat array of npoints values
+        keys = [key for key in redCp if key != "extra"]
+        extras = ["BRinvisible", "BRundetected"]
+        shape = np.broadcast_shapes(
+            *([np.shape(redCp[key]) for key in keys] +
+              [np.shape(redCp["extra"][key]) for key in extras]))
+        for key in keys:
+            redCp[key] = np.broadcast_to(redCp[key], shape).ravel()
+        for key in extras:
+            redCp["extra"][key] = np.broadcast_to(redCp["extra"][key],
+                                                  shape).ravel()
+
+        computablecouplings = ["gg_prod_lhc8", "gg_decay", "gammagamma",
+                               "Zgamma", "VBF","gg_prod_lhc13", "VBF13"]
+        if any(coupling not in redCp for coupling in computablecouplings):
+            if self.coupling_computation is None:
+                self.coupling_computation = ComputeReducedCouplings(redCp)
+            else:
+                self.coupling_computation.reset(redCp)
+            redCp.update(self.coupling_computation.getcouplings_batch(redCp))
+
+        if self.mu_computation is None:
+            self.mu_computation = ComputeMuFromReducedCouplings(mass)
+        else:
+            self.mu_computation.reset(mass)
+
+        return shape, redCp
+
+    def computegradient(self, couplings, mass=125.09, precision="BEST-QCD",
+                        BRinvisible=0., BRundetected=0., variables=None,
+                        hessian=False, step=1e-6, exp_filepath=None):
+        """Computes -2log(likelihood) and its gradient, and optionally its
+           Hessian, with respect to the reduced couplings at a single point.
+
+           couplings maps the reduced couplings to real values, as in
+           computelikelihood_batch (complex fermion couplings are given by
+           their "_re" and "_im" parts). variables lists the couplings to
+           differentiate with respect to (all of couplings by default) and
+           may include "BRinvisible" and "BRundetected". The derivatives
+           of the likelihood with respect to the signal strengths, and of
+           the signal strengths with respect to the complete set of reduced
+           couplings, are analytic; only the missing couplings computed
+           from interpolated grids or loop functions are differentiated by
+           central differences with relative step, all points being
+           computed in a single batch. Returns (l, gradient) or
+           (l, gradient, hessian) with the arrays ordered as variables."""
+
+        if exp_filepath is not None:
+            self.readexpinput(exp_filepath)
+        elif not self.exp_mu:
+            self.readexpinput()
+        self.loadexpinput()
+
+        values = dict(couplings)
+        values["BRinvisible"] = BRinvisible
+        values["BRundetected"] = BRundetected
+        if variables is None:
+            variables = list(couplings)
+        for variable in variables:
+            if variable not in values:
+                raise UserInputError(
+                    'cannot differentiate with respect to "' + variable +
+                    '": no value is given')
+            if np.iscomplexobj(values[variable]):
+                raise UserInputError(
+                    'cannot differentiate with respect to the complex ' +
+                    'coupling "' + variable + '": give its "' + variable +
+                    '_re" and "' + variable + '_im" parts instead')
+        nvar = len(variables)
+        x0 = np.array([float(values[variable]) for variable in variables])
+
+        # only the couplings are shifted, the derivatives with respect to
+        # the extra BR being analytic
+        extras = ["BRinvisible", "BRundetected"]
+        shifted = [i for i, variable in enumerate(variables)
+                   if variable not in extras]
+        nshift = len(shifted)
+
+        # gradients are computed at x0 and, for the Hessian, at x0 + hh e_j
+        # and x0 - hl e_j, the extra BR not being shifted below 0
+        h = step*np.maximum(1., np.abs(x0))
+        centers = x0[np.newaxis]
+        if hessian:
+            hh = 1e-4*np.maximum(1., np.abs(x0))
+            hl = np.array([0. if variable in extras and x0[i] < hh[i]
+                           else hh[i] for i, variable in enumerate(variables)])
+            centers = x0 + np.vstack([np.zeros(nvar), np.diag(hh),
+                                      -np.diag(hl)])
+        shifts = np.zeros((2*nshift + 1, nvar))
+        shifts[1 + np.arange(nshift), shifted] = h[shifted]
+        shifts[1 + nshift + np.arange(nshift), shifted] = -h[shifted]
+        points = (centers[:,np.newaxis,:] + shifts).reshape(-1, nvar)
+
+        for i, variable in enumerate(variables):
+            values[variable] = points[:,i]
+        BRinv = values.pop("BRinvisible")
+        BRundet = values.pop("BRundetected")
+        t0 = time.perf_counter()
+        shape, redCp = self.computecouplings_batch(values, mass, precision,
+                                                   BRinv, BRundet)
+
+        # values of the couplings entering the signal strengths, at the
+        # centers and at the shifted points
+        C = {}
+        for key in set(visible_couplings + prod_coupling_list):
+            C[key] = np.broadcast_to(
+                effective_coupling(key, redCp[key], precision),
+                (len(points),)).reshape(len(centers), 2*nshift + 1)
+        extra = dict((key, np.broadcast_to(
+            redCp["extra"][key], (len(points),)).reshape(
+                len(centers), 2*nshift + 1)[:,0]) for key in extras)
+        center_couplings = dict((key, val[:,0]) for key, val in C.items())
+        user_mu = self.mu_computation.getmu_batch(
+            center_couplings, precision, extra["BRinvisible"],
+            extra["BRundetected"]).reshape(-1, channels.n_channels)
+
+        l, dl_dmu = compute_likelihood_gradient_batch(
+            self.exp_mu, user_mu, self.exp_eff, self.exp_bestfit)
+        dl_dC, dl_dBRinv, dl_dBRundet = self.mu_computation.getmu_vjp(
+            center_couplings, dl_dmu, precision, extra["BRinvisible"],
+            extra["BRundetected"])
+
+        grad = np.zeros((len(centers), nvar))
+        for k, i in enumerate(shifted):
+            for key, dl in list(dl_dC.items()):
+                grad[:,i] += dl*(C[key][:,1+k] - C[key][:,1+nshift+k])/(2*h[i])
+        for i, variable in enumerate(variables):
+            if variable == "BRinvisible":
+                grad[:,i] = dl_dBRinv
+            elif variable == "BRundetected":
+                grad[:,i] = dl_dBRundet
+        self.tinfo("computing the likelihood gradient",
+                   time.perf_counter() - t0, "computegradient", len(points))
+
+        if not hessian:
+            return l[0], grad[0]
+        hess = (grad[1:nvar+1] - grad[nvar+1:])/(hh + hl)[:,np.newaxis]
+        return l[0], grad[0], (hess + hess.T)/2
+
     def computeSMlikelihood(self, userinput=None, exp_filepath=None,
                           userfilepath=None):
         """Computes the SM likelihood from the signal strengths (computed from)
            the SM input and the experimental results."""
         
         self.readexpinput()
+        self.loadexpinput()
         decay_modes = ["gammagamma", "ZZ", "WW", "bb", "cc", "tautau", "Zgamma", "mumu", "gg","invisible"]
         prod_modes = ["ggH", "VBF", "WH", "qqZH", "ggZH", "ttH", "tHq", "tHW", "bbH"]
-        SM_mu = dict(((l1,l2), float(l2!="invisible")) for l1 in prod_modes for l2 in decay_modes)
-        self.results, self.l_SM = compute_likelihood(self.exp_mu, SM_mu, "signalstrengths")
+        SM_mu = channels.tovector(dict(((l1,l2), float(l2!="invisible")) for l1 in prod_modes for l2 in decay_modes))
+        self.results, self.l_SM = compute_likelihood(self.exp_mu, SM_mu,
+                                                     self.exp_eff,
+                                                     self.exp_bestfit,
+                                                     table=self.exp_table)
 
 
     def writecouplings(self, filepath):
         writeoutput.couplings(self.couplings, filepath)
 
     def writesignalstrengths(self, filepath, tot=False):
+        # dictionary views of the signal strengths
         if tot:
-            writeoutput.signalstrengths(self.user_mu_tot, filepath)
+            writeoutput.signalstrengths(channels.todict(self.user_mu_tot),
+                                        filepath)
         else:
-            writeoutput.signalstrengths(self.user_mu, filepath)
+            writeoutput.signalstrengths(
+                [channels.todict(mup, extra) for mup, extra
+                 in zip(self.user_mu, self.user_mu_extra)], filepath)
 
     def writeresults(self, filepath, slha=False):
         if slha:
@@ -303,3 +840,21 @@ class Lilith:
         else:
             writeoutput.results_xml(self.results, self.l, version.__version__, self.dbversion,
                                     filepath)
+
+    def openresults(self, filepath, inputs, per_measurement=False,
+                    chunksize=65536, flushinterval=None):
+        """Opens a stream writing the results of a scan in the .npy file
+           filepath, with a column for each of the inputs, given as a list
+           of names, and for -2log(likelihood), and if per_measurement is
+           True the contributions of each experimental result. Points are
+           added with the append method of the returned ResultsStream and
+           written by chunks of chunksize points, or at least every
+           flushinterval seconds if given. The stream is flushed when
+           closed."""
+
+        if not self.exp_mu:
+            self.readexpinput()
+        measurements = self.exp_mu if per_measurement else None
+        return writeoutput.ResultsStream(filepath, inputs, measurements,
+                                         version.__version__, self.dbversion,
+                                         chunksize, flushinterval)
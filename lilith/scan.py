@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Parallel scans of the likelihood over grids of model parameters."""
+
+import sys, time
+import multiprocessing
+import numpy as np
+from .main import Lilith
+from .errors import LilithError
+from .internal import brsm as BR_SM
+from .internal import formfactortable as FFTable
+
+# Lilith object and model function of a worker process
+_worker = {}
+
+def _init_worker(model_fn, exp_filepath, cachedir, vectorized):
+    """Build the Lilith object and read the experimental input, once per
+    worker process."""
+
+    lilithcalc = Lilith(cachedir=cachedir)
+    if exp_filepath is None:
+        lilithcalc.readexpinput()
+    else:
+        lilithcalc.readexpinput(exp_filepath)
+    _worker["lilith"] = lilithcalc
+    _worker["model_fn"] = model_fn
+    _worker["vectorized"] = vectorized
+
+def _run_chunk(args):
+    """Compute -2log(likelihood) for the grid points start to stop-1."""
+
+    axes, start, stop = args
+    shape = tuple(len(axis) for axis in axes)
+    indices = np.unravel_index(np.arange(start, stop), shape)
+    params = [axis[index] for axis, index in zip(axes, indices)]
+
+    lilithcalc = _worker["lilith"]
+    model_fn = _worker["model_fn"]
+    if _worker["vectorized"]:
+        l = lilithcalc.computelikelihood_batch(**model_fn(*params))
+        return start, np.broadcast_to(l, (stop - start,))
+
+    l = np.empty(stop - start)
+    for i, point in enumerate(zip(*params)):
+        l[i] = lilithcalc.computelikelihood_batch(**model_fn(*point))
+    return start, l
+
+def _print_progress(done, total):
+    """Default progress report on the standard error."""
+
+    sys.stderr.write("\rscan: %d/%d points (%.0f%%)" %
+                     (done, total, 100.*done/total))
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def grid(model_fn, axes, workers=1, exp_filepath=None, chunksize=None,
+         output=None, progress=False, cachedir=None, vectorized=True):
+    """Computes -2log(likelihood) on the grid spanned by axes, a sequence of
+    1D arrays of parameter values, and returns it as an array of shape
+    (len(axes[0]), len(axes[1]), ...).
+
+    model_fn is called with one array of parameter values per axis, for a
+    chunk of grid points, and returns the keyword arguments of
+    Lilith.computelikelihood_batch, for instance
+        lambda CV, CF: {"couplings": {"VV": CV, "ff": CF}}
+    If vectorized is False, model_fn is called point by point with scalar
+    parameter values instead. With workers > 1, model_fn is sent to the
+    worker processes and must therefore be picklable, i.e. a function
+    defined at module level rather than a lambda or a nested function, and
+    the calling script must run the scan under an
+    if __name__ == "__main__": guard, as the workers import it with the
+    spawn start method (default on macOS and Windows).
+
+    The grid is split into chunks of chunksize points which are distributed
+    over a pool of workers processes, each with its own Lilith object; the
+    experimental input (exp_filepath or the default list) is read once per
+    worker. The results are collected in order, in memory or, if output is
+    a file path, in a .npy file that is filled as the chunks come back.
+    progress is either a boolean or a function called as
+    progress(points_done, points_total)."""
+
+    axes = [np.asarray(axis, dtype=float) for axis in axes]
+    if not axes or any(axis.ndim != 1 for axis in axes):
+        raise LilithError("the axes of the grid should be 1D arrays")
+    shape = tuple(len(axis) for axis in axes)
+    npoints = int(np.prod(shape))
+    workers = max(1, int(workers))
+    if chunksize is None:
+        chunksize = max(1, min(4096, -(-npoints // (4*workers))))
+
+    if output is None:
+        l = np.empty(npoints)
+    else:
+        l = np.lib.format.open_memmap(output, mode="w+", dtype=float,
+                                      shape=(npoints,))
+    if progress is True:
+        progress = _print_progress
+
+    tasks = [(axes, start, min(start + chunksize, npoints))
+             for start in range(0, npoints, chunksize)]
+    initargs = (model_fn, exp_filepath, cachedir, vectorized)
+
+    done = 0
+    if workers == 1:
+        _init_worker(*initargs)
+        results = map(_run_chunk, tasks)
+        pool = None
+    else:
+        # with the fork start method, model_fn and the interpolating
+        # functions loaded here are inherited by the workers
+        BR_SM.preload()
+        FFTable.get_table()
+        pool = multiprocessing.Pool(workers, _init_worker, initargs)
+        results = pool.imap(_run_chunk, tasks)
+    try:
+        for start, l_chunk in results:
+            l[start:start+len(l_chunk)] = l_chunk
+            done += len(l_chunk)
+            if progress:
+                progress(done, npoints)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        _worker.clear()
+
+    if output is not None:
+        l.flush()
+    return l.reshape(shape)
@@ -0,0 +1,376 @@
+#! /usr/bin/env python
+
+##########################################################################
+#
+#  This file is part of Lilith
+#  v1 (2015) by Jeremy Bernon and Beranger Dumont 
+#  v2 (2019) by Sabine Kraml, Tran Quang Loc, Dao Thi Nhung, Le Duc Ninh 
+#            converted to Python 3 by Marius Bertrand (Jul/Aug 2020)
+#
+#  Web page: http://lpsc.in2p3.fr/projects-th/lilith/
+#
+#  In case of questions email sabine.kraml@lpsc.in2p3.fr 
+#
+#
+#    Lilith is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Lilith is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Lilith.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Long-lived Lilith evaluation server and its client.
+
+The experimental input is read once when the server starts; clients then
+send batched likelihood requests over a local socket (a Unix socket path,
+or a (host, port) pair for TCP). Every message is a JSON object preceded
+by its length, as a 4-byte big-endian unsigned integer. A request is
+    {"couplings": {"tt": [...], "VV": [...], ...}, "mass": 125.09,
+     "precision": "BEST-QCD", "BRinvisible": 0., "BRundetected": 0.}
+or
+    {"signalstrengths": {"ggH/gammagamma": [...], ...}, "mass": 125.09}
+with the arguments of Lilith.computelikelihood_batch, and is answered by
+    {"l": [...], "l_exp": [[...], ...]}
+where l_exp holds the contributions of each experimental result, in the
+order given by the "info" command. {"command": "info"} returns the Lilith
+and database versions, the number of degrees of freedom and the list of
+experimental results, {"command": "shutdown"} stops the server. Errors are
+answered by {"error": "..."}. An "id" entry of the request is copied to
+the answer.
+
+The server is started with
+    python -m lilith.server [experimental_input_list] [options]"""
+
+import sys, os, stat, json, struct, socket, socketserver, threading, getopt
+import multiprocessing
+import numpy as np
+from .main import Lilith
+from .errors import LilithError
+from .internal import brsm as BR_SM
+from .internal import formfactortable as FFTable
+import lilith.version as version
+
+default_socket = "lilith.sock"
+max_message_size = 1 << 30
+
+# Lilith object of a worker process
+_worker = {}
+
+def _init_worker(exp_filepath, cachedir):
+    """Build the Lilith object and read the experimental input, once per
+    worker process."""
+
+    lilithcalc = Lilith(cachedir=cachedir)
+    if exp_filepath is None:
+        lilithcalc.readexpinput()
+    else:
+        lilithcalc.readexpinput(exp_filepath)
+    _worker["lilith"] = lilithcalc
+
+def _evaluate(request):
+    """-2log(likelihood) and the contributions of each experimental result
+    for a likelihood request."""
+
+    kwargs = {}
+    for key in ["couplings", "signalstrengths"]:
+        if key in request and not isinstance(request[key], dict):
+            raise LilithError('"' + key + '" should be a JSON object')
+    if "couplings" in request:
+        kwargs["couplings"] = dict(
+            (key, np.asarray(val, dtype=float))
+            for key, val in list(request["couplings"].items()))
+    elif "signalstrengths" in request:
+        kwargs["signalstrengths"] = {}
+        for key, val in list(request["signalstrengths"].items()):
+            channel = tuple(key.split("/"))
+            if len(channel) != 2:
+                raise LilithError('signal strength "' + key + '" should ' +
+                                  'be named as "prod/decay"')
+            kwargs["signalstrengths"][channel] = np.asarray(val, dtype=float)
+    else:
+        raise LilithError("either couplings or signal strengths should be " +
+                          "given")
+    for key in ["mass", "precision", "BRinvisible", "BRundetected"]:
+        if key in request:
+            kwargs[key] = request[key]
+
+    l, l_exp = _worker["lilith"].computelikelihood_batch(per_measurement=True,
+                                                         **kwargs)
+    return {"l": l.tolist(), "l_exp": l_exp.tolist()}
+
+def _safe_evaluate(request):
+    """Wraps _evaluate, turning errors into error answers: a malformed
+    request must never close the connection."""
+
+    try:
+        return _evaluate(request)
+    except Exception as error:
+        return {"error": type(error).__name__ + ": " + str(error)}
+
+def _is_socket(address):
+    """Whether a Unix socket exists at the path address."""
+
+    try:
+        return stat.S_ISSOCK(os.stat(address).st_mode)
+    except FileNotFoundError:
+        return False
+
+def send_message(sock, message):
+    """Sends a length-prefixed JSON message."""
+
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+def _recv_exactly(sock, n):
+    """Receives n bytes, or None if the connection is closed first."""
+
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+def recv_message(sock):
+    """Receives a length-prefixed JSON message, or None if the connection
+    is closed."""
+
+    header = _recv_exactly(sock, 4)
+    if header is None:
+        return None
+    size, = struct.unpack(">I", header)
+    if size > max_message_size:
+        raise LilithError("message of " + str(size) + " bytes is too large")
+    data = _recv_exactly(sock, size)
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Answers the requests of a connection until it is closed."""
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (LilithError, ValueError) as error:
+                send_message(self.request, {"error": str(error)})
+                return
+            if request is None:
+                return
+            answer = self.server.lilithserver.answer(request)
+            send_message(self.request, answer)
+            if isinstance(request, dict) and \
+               request.get("command") == "shutdown":
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+class _UnixServer(socketserver.ThreadingMixIn,
+                  socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Server:
+    """Evaluation server keeping the experimental input in memory.
+
+    The requests are evaluated in a pool of workers processes, each with
+    its own Lilith object, or in the server process if workers is 1;
+    several connections are served concurrently."""
+
+    def __init__(self, exp_filepath=None, address=default_socket, workers=1,
+                 cachedir=None, verbose=False):
+        self.exp_filepath = exp_filepath
+        self.address = address
+        self.workers = max(1, int(workers))
+        self.verbose = verbose
+
+        _init_worker(exp_filepath, cachedir)
+        self.lilithcalc = _worker["lilith"]
+        self.lock = threading.Lock()
+        self.pool = None
+        if self.workers > 1:
+            # with the fork start method, the interpolating functions loaded
+            # here are inherited by the workers
+            BR_SM.preload()
+            FFTable.get_table()
+            self.pool = multiprocessing.Pool(self.workers, _init_worker,
+                                             (exp_filepath, cachedir))
+
+        if isinstance(address, str):
+            if _is_socket(address):
+                os.remove(address)
+            elif os.path.exists(address):
+                if self.pool is not None:
+                    self.pool.terminate()
+                raise LilithError('"' + address + '" exists and is not ' +
+                                  'a socket, it is not replaced')
+            self.server = _UnixServer(address, _RequestHandler)
+        else:
+            self.server = _TCPServer(tuple(address), _RequestHandler)
+        self.server.lilithserver = self
+
+    def info(self, message):
+        if self.verbose:
+            print(message)
+
+    def answer(self, request):
+        """Answer to a request."""
+
+        if not isinstance(request, dict):
+            return {"error": "the request should be a JSON object"}
+        command = request.get("command", "compute")
+        if command == "compute":
+            if self.pool is not None:
+                answer = self.pool.apply(_safe_evaluate, (request,))
+            else:
+                with self.lock:
+                    answer = _safe_evaluate(request)
+        elif command == "info":
+            answer = {"version": version.__version__,
+                      "dbversion": self.lilithcalc.dbversion,
+                      "exp_ndf": self.lilithcalc.exp_ndf,
+                      "exp_filepaths": [mu["filepath"]
+                                        for mu in self.lilithcalc.exp_mu]}
+        elif command == "shutdown":
+            answer = {}
+        else:
+            answer = {"error": 'unknown command "' + str(command) + '"'}
+        if "id" in request:
+            answer["id"] = request["id"]
+        return answer
+
+    def serve_forever(self):
+        """Serves until a shutdown request is received."""
+
+        self.info("Lilith server listening on " + str(self.address))
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        self.server.server_close()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if isinstance(self.address, str) and _is_socket(self.address):
+            os.remove(self.address)
+
+
+class Client:
+    """Client of a Lilith server."""
+
+    def __init__(self, address=default_socket, timeout=None):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = tuple(address)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, message):
+        """Sends a request and returns the answer, raising LilithError on
+        error answers."""
+
+        send_message(self.sock, message)
+        answer = recv_message(self.sock)
+        if answer is None:
+            raise LilithError("the connection to the server was closed")
+        if "error" in answer:
+            raise LilithError("server error: " + answer["error"])
+        return answer
+
+    def computelikelihood(self, couplings=None, signalstrengths=None,
+                          **kwargs):
+        """-2log(likelihood) and the contributions of each experimental
+        result, as arrays, for arrays of couplings or signal strengths
+        (indexed by (prod, decay) tuples)."""
+
+        message = dict(kwargs)
+        if couplings is not None:
+            message["couplings"] = dict(
+                (key, np.asarray(val, dtype=float).tolist())
+                for key, val in list(couplings.items()))
+        if signalstrengths is not None:
+            message["signalstrengths"] = dict(
+                (prod + "/" + decay, np.asarray(val, dtype=float).tolist())
+                for (prod, decay), val in list(signalstrengths.items()))
+        answer = self.request(message)
+        return np.array(answer["l"]), np.array(answer["l_exp"])
+
+    def info(self):
+        return self.request({"command": "info"})
+
+    def shutdown(self):
+        self.request({"command": "shutdown"})
+
+    def close(self):
+        self.sock.close()
+
+
+def print_usage():
+    print("\nUsage of the Lilith server:")
+    print("---------------------------")
+    print("python -m lilith.server [experimental_input_list] [options]")
+    print("[options]")
+    print(" -h or --help : dump this help")
+    print(" -v or --verbose : print useful information on the screen")
+    print(" -s path or --socket=path : Unix socket to listen on " +
+          "[" + default_socket + "]")
+    print(" -p port or --port=port : listen on localhost:port instead")
+    print(" -w n or --workers=n : number of worker processes [1]")
+    print(" -c dir or --cachedir=dir : cache of the experimental input\n")
+
+def main(argv):
+    try:
+        opts, args = getopt.gnu_getopt(argv, "hvs:p:w:c:",
+                                   ["help", "verbose", "socket=", "port=",
+                                    "workers=", "cachedir="])
+    except getopt.GetoptError as err:
+        print(err)
+        print_usage()
+        sys.exit(1)
+
+    kwargs = {}
+    verbose = False
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            print_usage()
+            sys.exit()
+        elif o in ("-v", "--verbose"):
+            verbose = True
+        elif o in ("-s", "--socket"):
+            kwargs["address"] = a
+        elif o in ("-p", "--port"):
+            kwargs["address"] = ("127.0.0.1", int(a))
+        elif o in ("-w", "--workers"):
+            kwargs["workers"] = int(a)
+        elif o in ("-c", "--cachedir"):
+            kwargs["cachedir"] = a
+    exp_filepath = args[0] if args else None
+
+    Server(exp_filepath, verbose=verbose, **kwargs).serve_forever()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,25 @@
+import os, sys, glob, shutil
+import pytest
+
+lilith_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, lilith_dir)
+
+
+def write_list(listpath, filepaths):
+    """Write a list file of experimental results."""
+
+    with open(listpath, "w") as f:
+        f.write("".join(path + "\n" for path in filepaths))
+
+
+@pytest.fixture
+def expfiles(tmp_path):
+    """Copies of three XML files of experimental results, in tmp_path."""
+
+    source = sorted(glob.glob(os.path.join(lilith_dir, "data", "ATLAS",
+                                           "Run2", "*", "*.xml")))[:3]
+    copies = []
+    for path in source:
+        shutil.copy(path, str(tmp_path))
+        copies.append(str(tmp_path / os.path.basename(path)))
+    return copies
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import lilith
+from lilith.errors import UserInputError
+
+rng = np.random.default_rng(21)
+N = 8
+
+
+@pytest.fixture(scope="module")
+def lilithcalc():
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput()
+    return lilithcalc
+
+def scalar(lilithcalc):
+    """-2log(likelihood) and contributions of the current user input."""
+
+    lilithcalc.computelikelihood()
+    return lilithcalc.l, lilithcalc.results.l
+
+
+@pytest.mark.parametrize("precision", ["BEST-QCD", "LO"])
+def test_couplings(lilithcalc, precision):
+    CF = rng.uniform(0.7, 1.3, N)
+    CZ = rng.uniform(0.8, 1.2, N)
+    CW = CZ*rng.uniform(0.95, 1.05, N)
+    BRinvisible = rng.uniform(0., 0.1, N)
+    couplings = {"tt": CF, "bb": CF, "cc": CF, "tautau": CF, "ZZ": CZ,
+                 "WW": CW}
+    l, l_exp = lilithcalc.computelikelihood_batch(
+        couplings, precision=precision, BRinvisible=BRinvisible,
+        per_measurement=True)
+    assert l.shape == (N,)
+    assert l_exp.shape == (N, len(lilithcalc.exp_mu))
+    for i in range(N):
+        lilithcalc.set_reducedcouplings(
+            precision=precision, BRinvisible=BRinvisible[i],
+            **dict((key, val[i]) for key, val in couplings.items()))
+        l_i, l_exp_i = scalar(lilithcalc)
+        assert l[i] == pytest.approx(l_i, rel=1e-10)
+        np.testing.assert_allclose(l_exp[i], l_exp_i, rtol=1e-10,
+                                   atol=1e-10)
+
+def test_complex_couplings(lilithcalc):
+    tt_re = rng.uniform(0.8, 1.2, N)
+    tt_im = rng.uniform(-0.3, 0.3, N)
+    l = lilithcalc.computelikelihood_batch(
+        {"tt_re": tt_re, "tt_im": tt_im, "VV": 1., "bb": 0.9},
+        precision="LO")
+    for i in range(N):
+        lilithcalc.set_reducedcouplings(precision="LO", tt_re=tt_re[i],
+                                        tt_im=tt_im[i], VV=1., bb=0.9)
+        assert l[i] == pytest.approx(scalar(lilithcalc)[0], rel=1e-10)
+
+@pytest.mark.filterwarnings("ignore:signal strength")
+def test_signal_strengths(lilithcalc):
+    mu_gammagamma = rng.uniform(0.5, 1.5, N)
+    mu_ZZ = rng.uniform(0.5, 1.5, N)
+    l, l_exp = lilithcalc.computelikelihood_batch(
+        signalstrengths={("ggH", "gammagamma"): mu_gammagamma,
+                         ("VVH", "ZZ"): mu_ZZ}, mass=125.,
+        per_measurement=True)
+    for i in range(N):
+        lilithcalc.set_signalstrengths({("ggH", "gammagamma"):
+                                        mu_gammagamma[i],
+                                        ("VVH", "ZZ"): mu_ZZ[i]}, mass=125.)
+        l_i, l_exp_i = scalar(lilithcalc)
+        assert l[i] == pytest.approx(l_i, rel=1e-10)
+        np.testing.assert_allclose(l_exp[i], l_exp_i, rtol=1e-10,
+                                   atol=1e-10)
+
+def test_broadcasting(lilithcalc):
+    CV = np.linspace(0.8, 1.2, 5)[:, np.newaxis]
+    CF = np.linspace(0.7, 1.3, 4)
+    l = lilithcalc.computelikelihood_batch({"VV": CV, "ff": CF})
+    assert l.shape == (5, 4)
+    CV, CF = np.broadcast_arrays(CV, CF)
+    np.testing.assert_array_equal(
+        l.ravel(), lilithcalc.computelikelihood_batch(
+            {"VV": CV.ravel(), "ff": CF.ravel()}))
+
+def test_sequences(lilithcalc):
+    l = lilithcalc.computelikelihood_batch({"VV": np.array([1., 1.1]),
+                                            "ff": np.array([1., 1.])})
+    np.testing.assert_array_equal(
+        lilithcalc.computelikelihood_batch({"VV": [1, 1.1], "ff": [1, 1]}), l)
+    np.testing.assert_array_equal(
+        lilithcalc.computelikelihood_batch({"VV": (1, 1.1), "ff": 1},
+                                           BRinvisible=[0., 0.]), l)
+
+@pytest.mark.filterwarnings("ignore:signal strength")
+def test_signal_strength_sequences(lilithcalc):
+    mu = np.array([0.8, 1.2])
+    np.testing.assert_array_equal(
+        lilithcalc.computelikelihood_batch(
+            signalstrengths={("ggH", "gammagamma"): mu.tolist()}, mass=125.),
+        lilithcalc.computelikelihood_batch(
+            signalstrengths={("ggH", "gammagamma"): mu}, mass=125.))
+
+@pytest.mark.parametrize("BRs", [
+    {"BRinvisible": np.array([0.1, 1.2])},
+    {"BRundetected": [0., -0.1]},
+    {"BRinvisible": 1.},
+    {"BRinvisible": 0.6, "BRundetected": np.array([0.3, 0.6])},
+    {"BRinvisible": "x"}])
+def test_extra_BR_out_of_range(lilithcalc, BRs):
+    with pytest.raises(UserInputError):
+        lilithcalc.computelikelihood_batch({"VV": 1., "ff": 1.}, **BRs)
+
+@pytest.mark.parametrize("couplings", [{"VV": [[1.], [1., 2.]]},
+                                       {"VV": "a"}, {"VV": None}])
+def test_invalid_values(lilithcalc, couplings):
+    with pytest.raises(UserInputError):
+        lilithcalc.computelikelihood_batch(couplings)
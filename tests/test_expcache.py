@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import lilith
+from conftest import write_list
+
+
+def read(cachedir, listpath):
+    lilithcalc = lilith.Lilith(cachedir=cachedir, stats=True)
+    lilithcalc.readexpinput(listpath)
+    return lilithcalc
+
+def likelihood(lilithcalc):
+    return lilithcalc.computelikelihood_batch(
+        {"VV": np.array([0.9, 1., 1.1]), "ff": np.array([1.1, 1., 0.9])})
+
+
+def test_hit(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    cachedir = str(tmp_path / "cache")
+
+    first = read(cachedir, listpath)
+    assert first.stats.caches["expinput"] == [0, 3]
+    second = read(cachedir, listpath)
+    assert second.stats.caches["expinput"] == [3, 0]
+    np.testing.assert_array_equal(likelihood(first), likelihood(second))
+
+def test_touched_file_is_hit(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    cachedir = str(tmp_path / "cache")
+
+    read(cachedir, listpath)
+    os.utime(expfiles[0], ns=(1, 1))
+    assert read(cachedir, listpath).stats.caches["expinput"] == [3, 0]
+
+def test_modified_file_is_read_again(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    cachedir = str(tmp_path / "cache")
+
+    first = read(cachedir, listpath)
+    with open(expfiles[1], "a") as f:
+        f.write("\n<!-- modified -->\n")
+    second = read(cachedir, listpath)
+    assert second.stats.caches["expinput"] == [2, 1]
+    np.testing.assert_array_equal(likelihood(first), likelihood(second))
+
+def test_corrupt_cache_is_rebuilt(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    cachedir = tmp_path / "cache"
+
+    read(str(cachedir), listpath)
+    for path in cachedir.iterdir():
+        path.write_bytes(b"garbage")
+    assert read(str(cachedir), listpath).stats.caches["expinput"] == [0, 3]
+    assert read(str(cachedir), listpath).stats.caches["expinput"] == [3, 0]
+
+def test_lazy_reader_does_not_cache_pending(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    cachedir = str(tmp_path / "cache")
+
+    lazy = lilith.Lilith(cachedir=cachedir, stats=True, lazy=True)
+    lazy.readexpinput(listpath)
+    assert lazy.exp_pending == 3
+    second = read(cachedir, listpath)
+    assert second.stats.caches["expinput"] == [0, 3]
+    assert not any(mu["pending"] for mu in second.exp_mu)
+    np.testing.assert_array_equal(likelihood(lazy), likelihood(second))
+    # a lazy reader gets the parsed entries cached by the other one
+    lazy = lilith.Lilith(cachedir=cachedir, stats=True, lazy=True)
+    lazy.readexpinput(listpath)
+    assert lazy.stats.caches["expinput"] == [3, 0]
+    assert lazy.exp_pending == 0
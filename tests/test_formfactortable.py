@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from lilith.internal import formfactortable as FFTable
+
+masses = np.random.default_rng(6).uniform(FFTable.min_mass, FFTable.max_mass,
+                                          20).tolist()
+
+
+@pytest.fixture(scope="module")
+def tablepath(tmp_path_factory):
+    filepath = str(tmp_path_factory.mktemp("ff") / "formfactors.npz")
+    FFTable.FormFactorTable(filepath)
+    return filepath
+
+
+@pytest.mark.parametrize("precision, group",
+    [(precision, group) for precision in FFTable.groups
+     for group in FFTable.groups[precision]])
+def test_table_matches_direct_evaluation(tablepath, precision, group):
+    table = FFTable.FormFactorTable(tablepath)
+    functions = FFTable.formfactor_functions(precision, group)
+    for mass in masses + [FFTable.min_mass, FFTable.max_mass]:
+        tabulated = table.get(precision, group, mass)
+        assert sorted(tabulated) == sorted(functions)
+        for name, value in tabulated.items():
+            exact = functions[name](mass)
+            assert abs(value - exact) <= 1e-7*abs(exact) + 1e-12, name
+
+def test_outside_of_table_is_direct(tablepath):
+    table = FFTable.FormFactorTable(tablepath)
+    functions = FFTable.formfactor_functions("BEST-QCD", "gammagamma")
+    for name, value in table.get("BEST-QCD", "gammagamma", 130.).items():
+        assert value == functions[name](130.)
+
+def test_corrupt_table_is_rebuilt(tablepath, tmp_path):
+    reference = FFTable.FormFactorTable(tablepath)
+    for content in [b"", open(tablepath, "rb").read()[:1000]]:
+        filepath = tmp_path / "formfactors.npz"
+        filepath.write_bytes(content)
+        table = FFTable.FormFactorTable(str(filepath))
+        for key, values in reference.values.items():
+            np.testing.assert_array_equal(table.values[key], values)
+        # the rebuilt table has been stored
+        with np.load(str(filepath)) as content:
+            assert str(content["source"]) == FFTable.source_hash()
+
+def test_stale_table_is_rebuilt(tablepath, tmp_path):
+    filepath = str(tmp_path / "formfactors.npz")
+    table = FFTable.FormFactorTable(tablepath)
+    table.save(filepath, "stale", np.zeros_like(FFTable.source_stamps()))
+    FFTable.FormFactorTable(filepath)
+    with np.load(filepath) as content:
+        assert str(content["source"]) == FFTable.source_hash()
+        np.testing.assert_array_equal(content["stamps"],
+                                      FFTable.source_stamps())
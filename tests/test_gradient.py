@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import lilith
+from lilith.errors import UserInputError
+
+points = [
+    ("BEST-QCD", {"tt": 1.05, "bb": 0.9, "cc": 1.1, "tautau": 0.95,
+                  "WW": 1.02, "ZZ": 0.97, "mumu": 1.}),
+    ("BEST-QCD", {"VV": 1.05, "ff": 0.93, "gammagamma": 1.1}),
+    ("LO", {"tt_re": 1.05, "tt_im": 0.2, "bb": 0.9, "cc": 1.1,
+            "tautau": 0.95, "WW": 1.02, "ZZ": 0.97, "mumu": 1.})]
+BRs = {"BRinvisible": 0.05, "BRundetected": 0.02}
+
+
+@pytest.fixture(scope="module")
+def lilithcalc():
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput()
+    return lilithcalc
+
+def split(values, variable=None, h=0.):
+    """Couplings and BRs of values, with variable shifted by h."""
+
+    values = dict(values)
+    if variable is not None:
+        values[variable] += h
+    BRinvisible = values.pop("BRinvisible")
+    BRundetected = values.pop("BRundetected")
+    return values, {"BRinvisible": BRinvisible, "BRundetected": BRundetected}
+
+def likelihood(lilithcalc, precision, values, variable=None, h=0.):
+    couplings, BRs = split(values, variable, h)
+    return float(lilithcalc.computelikelihood_batch(
+        couplings, precision=precision, **BRs))
+
+def gradient(lilithcalc, precision, values, variables, variable=None, h=0.):
+    couplings, BRs = split(values, variable, h)
+    return lilithcalc.computegradient(couplings, precision=precision,
+                                      variables=variables, **BRs)[1]
+
+
+@pytest.mark.parametrize("precision, couplings", points)
+def test_gradient_matches_finite_differences(lilithcalc, precision,
+                                             couplings):
+    values = dict(couplings, **BRs)
+    variables = list(values)
+    l, grad = lilithcalc.computegradient(couplings, precision=precision,
+                                         variables=variables, **BRs)
+    assert l == pytest.approx(likelihood(lilithcalc, precision, values),
+                              rel=1e-12)
+
+    h = 1e-6
+    for variable, g in zip(variables, grad):
+        fd = (likelihood(lilithcalc, precision, values, variable, h) -
+              likelihood(lilithcalc, precision, values, variable, -h))/(2*h)
+        assert g == pytest.approx(fd, rel=1e-6, abs=1e-6), variable
+
+@pytest.mark.parametrize("precision, couplings", points[:2])
+def test_hessian_matches_finite_differences(lilithcalc, precision,
+                                            couplings):
+    values = dict(couplings, **BRs)
+    variables = list(couplings) + ["BRinvisible"]
+    l, grad, hess = lilithcalc.computegradient(
+        couplings, precision=precision, variables=variables, hessian=True,
+        **BRs)
+    np.testing.assert_allclose(hess, hess.T, rtol=1e-6, atol=1e-6)
+
+    h = 1e-5
+    for i, variable in enumerate(variables):
+        fd = (gradient(lilithcalc, precision, values, variables, variable, h) -
+              gradient(lilithcalc, precision, values, variables, variable, -h)
+              )/(2*h)
+        np.testing.assert_allclose(hess[i], fd, rtol=1e-4, atol=1e-3)
+
+def test_variables_order(lilithcalc):
+    precision, couplings = points[0]
+    values = dict(couplings, **BRs)
+    grad = dict(zip(couplings, gradient(lilithcalc, precision, values,
+                                        list(couplings))))
+    subset = ["ZZ", "tt"]
+    np.testing.assert_allclose(
+        gradient(lilithcalc, precision, values, subset),
+        [grad[name] for name in subset], rtol=1e-10)
+
+def test_complex_coupling_is_rejected(lilithcalc):
+    with pytest.raises(UserInputError, match="_re"):
+        lilithcalc.computegradient({"tt": 1 + 0.2j, "VV": 1.},
+                                   precision="LO")
+
+def test_hessian_at_zero_extra_BR(lilithcalc):
+    # the extra BR are not shifted below 0
+    l, grad, hess = lilithcalc.computegradient(
+        {"VV": 1., "ff": 1.}, variables=["VV", "BRinvisible"], hessian=True)
+    assert np.all(np.isfinite(hess))
+    plus = lilithcalc.computegradient(
+        {"VV": 1., "ff": 1.}, variables=["VV", "BRinvisible"],
+        BRinvisible=1e-4)[1]
+    fd = (plus - grad)/1e-4
+    assert hess[1, 1] == pytest.approx(fd[1], rel=1e-6)
+    # the Hessian is symmetrized with the central difference along VV
+    assert hess[1, 0] == pytest.approx(fd[0], rel=1e-3)
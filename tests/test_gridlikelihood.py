@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy import interpolate
+from lilith.internal.gridlikelihood import GridLikelihood, interpolations
+
+rng = np.random.default_rng(14)
+
+
+def spline(dim):
+    x = np.linspace(0., 2., 11)
+    if dim == 1:
+        return interpolate.UnivariateSpline(x, (x - 0.8)**2 + np.sin(3*x),
+                                            k=3, s=0)
+    y = np.linspace(-1., 1., 9)
+    L = (x[:,np.newaxis] - 0.8)**2 + np.sin(2*x[:,np.newaxis]*y) + y**2
+    return interpolate.RectBivariateSpline(x, y, L)
+
+def points(dim, n=500):
+    # inside and outside of the grid, away from the cell edges where the
+    # linear interpolation has kinks
+    pts = [rng.uniform(-0.5, 2.5, n)]
+    if dim == 2:
+        pts.append(rng.uniform(-1.5, 1.5, n))
+    return pts
+
+
+@pytest.mark.parametrize("dim", [1, 2])
+@pytest.mark.parametrize("interpolation", interpolations)
+def test_gradient_of_interpolation(dim, interpolation):
+    grid = GridLikelihood(spline(dim), dim, interpolation)
+    pts = points(dim)
+    gradient = grid.gradient(*pts)
+    assert gradient.shape == (len(pts[0]), dim)
+    h = 1e-7
+    for axis in range(dim):
+        plus = [p + h*(a == axis) for a, p in enumerate(pts)]
+        minus = [p - h*(a == axis) for a, p in enumerate(pts)]
+        fd = (grid(*plus) - grid(*minus))/(2*h)
+        # the derivative of the linear interpolation jumps at the edges of
+        # the cells, hit by a few of the points
+        close = np.abs(gradient[:,axis] - fd) <= 1e-5*(1 + np.abs(fd))
+        assert np.mean(close) > 0.98
+
+@pytest.mark.parametrize("dim", [1, 2])
+@pytest.mark.parametrize("interpolation", interpolations)
+def test_value_matches_call(dim, interpolation):
+    grid = GridLikelihood(spline(dim), dim, interpolation)
+    pts = points(dim, 50)
+    values = grid(*pts)
+    for i in range(50):
+        assert grid.value(*[p[i] for p in pts]) == \
+            pytest.approx(values[i], rel=1e-12, abs=1e-12)
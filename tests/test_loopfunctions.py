@@ -0,0 +1,44 @@
+import warnings
+import numpy as np
+import pytest
+from lilith.internal import reducedcouplingslo as RedCoupLO
+
+# both sides of the threshold t = 1, and the threshold itself
+ts = np.concatenate([np.geomspace(1e-4, 1e4, 201), [0.5, 1., 2.]])
+
+
+@pytest.mark.parametrize("name", ["fhiggs", "ghiggs", "A12", "A1", "A12A",
+                                  "A0"])
+def test_array_matches_scalar(name):
+    function = getattr(RedCoupLO, name)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        values = function(ts)
+        scalars = [function(t) for t in ts.tolist()]
+    assert values.shape == ts.shape
+    assert all(np.ndim(value) == 0 for value in scalars)
+    np.testing.assert_allclose(values, scalars, rtol=1e-14)
+
+def test_fhiggs_closed_form():
+    for t in [0.3, 1., 3.]:
+        if t <= 1:
+            expected = np.arcsin(np.sqrt(t))**2
+        else:
+            s = np.sqrt(1 - 1/t)
+            expected = -(np.log((1 + s)/(1 - s)) - np.pi*1j)**2/4
+        assert RedCoupLO.fhiggs(t) == pytest.approx(expected, rel=1e-14)
+
+@pytest.mark.parametrize("name", ["I1", "I2"])
+def test_two_argument_functions(name):
+    function = getattr(RedCoupLO, name)
+    tau = np.linspace(0.5, 20., 50)
+    values = function(tau, 3.)
+    np.testing.assert_allclose(values, [function(t, 3.) for t in tau],
+                               rtol=1e-14)
+
+def test_formfactors_over_masses():
+    masses = np.linspace(10., 1000., 101)
+    for name, function in RedCoupLO.computeformfactors().items():
+        np.testing.assert_allclose(function(masses),
+                                   [function(m) for m in masses.tolist()],
+                                   rtol=1e-14, err_msg=name)
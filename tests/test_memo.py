@@ -0,0 +1,55 @@
+import os
+import pytest
+import lilith
+from conftest import lilith_dir
+
+
+def read_input(name):
+    with open(os.path.join(lilith_dir, "userinput", name)) as f:
+        return f.read()
+
+@pytest.fixture
+def lilithcalc():
+    lilithcalc = lilith.Lilith(memosize=10, stats=True)
+    lilithcalc.readexpinput()
+    return lilithcalc
+
+def hits(lilithcalc):
+    return lilithcalc.stats.caches["likelihood"]
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("name", ["example_couplings.xml",
+                                  "example_couplings_multiH.xml",
+                                  "example_mu.xml"])
+def test_same_input_is_hit(lilithcalc, name):
+    userinput = read_input(name)
+    lilithcalc.computelikelihood(userinput=userinput)
+    l = lilithcalc.l
+    lilithcalc.computelikelihood(userinput=userinput)
+    assert hits(lilithcalc) == [1, 1]
+    # again without new input, the couplings having been completed
+    lilithcalc.computelikelihood()
+    assert hits(lilithcalc) == [2, 1]
+    assert lilithcalc.l == l
+
+def test_set_reducedcouplings(lilithcalc):
+    lilithcalc.set_reducedcouplings(tt=1.1, VV=0.9)
+    lilithcalc.computelikelihood()
+    l = lilithcalc.l
+    lilithcalc.set_reducedcouplings(tt=1.1, VV=0.9)
+    lilithcalc.computelikelihood()
+    assert hits(lilithcalc) == [1, 1]
+    lilithcalc.set_reducedcouplings(tt=1., VV=0.9)
+    lilithcalc.computelikelihood()
+    assert hits(lilithcalc) == [1, 2]
+    assert lilithcalc.l != l
+
+def test_totalonly_hit_has_no_results(lilithcalc):
+    userinput = read_input("example_couplings.xml")
+    lilithcalc.computelikelihood(userinput=userinput)
+    lilithcalc.computelikelihood(userinput=userinput, totalonly=True)
+    assert hits(lilithcalc) == [1, 1]
+    assert lilithcalc.results is None
+    lilithcalc.computelikelihood(userinput=userinput)
+    assert len(lilithcalc.results) == len(lilithcalc.exp_mu)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from lilith.internal.computereducedcouplings import ComputeReducedCouplings
+
+rng = np.random.default_rng(22)
+N = 50
+fermions = ["tt", "bb", "cc", "tautau"]
+
+
+@pytest.mark.parametrize("mass", [125.09, 123.3])
+@pytest.mark.parametrize("given", [[], ["gammagamma", "VBF"]])
+def test_batch_matches_scalar(mass, given):
+    couplings = dict((key, rng.uniform(-1.5, 1.5, N))
+                     for key in fermions + ["WW", "ZZ"] + given)
+    extra = {"extra": {"mass": mass, "precision": "BEST-QCD"}}
+    computation = ComputeReducedCouplings(dict(extra, **couplings))
+    batch = computation.getcouplings_batch(dict(extra, **couplings))
+    assert not set(batch) & set(given)
+    for i in range(N):
+        point = dict(extra, **dict((key, val[i] + 0j)
+                                   for key, val in couplings.items()))
+        single = computation.getcouplings(point)
+        assert sorted(single) == sorted(batch)
+        for key, value in single.items():
+            assert batch[key][i] == pytest.approx(value, rel=1e-12), key
+
+def test_batch_broadcasting():
+    extra = {"extra": {"mass": 125.09, "precision": "BEST-QCD"}}
+    couplings = dict((key, 1.) for key in fermions)
+    couplings["WW"] = couplings["ZZ"] = np.linspace(0.8, 1.2, 3)
+    computation = ComputeReducedCouplings(dict(extra, **couplings))
+    batch = computation.getcouplings_batch(dict(extra, **couplings))
+    for key, value in batch.items():
+        assert np.shape(value) == (3,), key
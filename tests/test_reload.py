@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import lilith
+from conftest import write_list
+
+
+def likelihood(lilithcalc):
+    return lilithcalc.computelikelihood_batch(
+        {"VV": np.array([0.9, 1., 1.1]), "ff": np.array([1.1, 1., 0.9])},
+        per_measurement=True)
+
+def assert_same_as_fresh(lilithcalc, listpath):
+    fresh = lilith.Lilith()
+    fresh.readexpinput(listpath)
+    for reloaded, read in zip(likelihood(lilithcalc), likelihood(fresh)):
+        np.testing.assert_array_equal(reloaded, read)
+
+
+def test_reload(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles[:2])
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput(listpath)
+
+    changes = lilithcalc.reloadexpinput()
+    assert changes == {"added": [], "modified": [], "removed": []}
+
+    write_list(listpath, expfiles[1:])
+    with open(expfiles[1], "a") as f:
+        f.write("\n<!-- modified -->\n")
+    changes = lilithcalc.reloadexpinput()
+    assert changes == {"added": [expfiles[2]], "modified": [expfiles[1]],
+                       "removed": [expfiles[0]]}
+    assert_same_as_fresh(lilithcalc, listpath)
+
+def test_touched_file_is_not_modified(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, expfiles)
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput(listpath)
+
+    os.utime(expfiles[0], ns=(1, 1))
+    changes = lilithcalc.reloadexpinput()
+    assert changes == {"added": [], "modified": [], "removed": []}
+
+def test_files_listed_twice(tmp_path, expfiles):
+    listpath = str(tmp_path / "results.list")
+    write_list(listpath, [expfiles[0], expfiles[0], expfiles[1]])
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput(listpath)
+
+    write_list(listpath, [expfiles[0], expfiles[0], expfiles[1],
+                          expfiles[2], expfiles[2]])
+    changes = lilithcalc.reloadexpinput()
+    assert changes == {"added": [expfiles[2]], "modified": [],
+                       "removed": []}
+    assert len(lilithcalc.exp_mu) == 5
+
+    with open(expfiles[0], "a") as f:
+        f.write("\n<!-- modified -->\n")
+    changes = lilithcalc.reloadexpinput()
+    assert changes == {"added": [], "modified": [expfiles[0]],
+                       "removed": []}
+    assert_same_as_fresh(lilithcalc, listpath)
@@ -0,0 +1,85 @@
+import os, socket, struct, threading
+import numpy as np
+import pytest
+import lilith
+from lilith import server
+from lilith.errors import LilithError
+from conftest import lilith_dir
+
+exp_filepath = os.path.join(lilith_dir, "data", "ATLAS-CMS_combination.list")
+
+
+@pytest.fixture(scope="module")
+def address(tmp_path_factory):
+    address = str(tmp_path_factory.mktemp("server") / "lilith.sock")
+    lilithserver = server.Server(exp_filepath, address)
+    thread = threading.Thread(target=lilithserver.serve_forever)
+    thread.start()
+    yield address
+    with server.Client(address) as client:
+        client.shutdown()
+    thread.join()
+    assert not os.path.exists(address)
+
+
+def test_likelihood(address):
+    lilithcalc = lilith.Lilith()
+    lilithcalc.readexpinput(exp_filepath)
+    couplings = {"VV": np.array([0.9, 1., 1.1]), "ff": np.array([1., 1.2, 0.8])}
+    l, l_exp = lilithcalc.computelikelihood_batch(couplings,
+                                                  per_measurement=True)
+    with server.Client(address) as client:
+        answer = client.computelikelihood(couplings)
+    np.testing.assert_allclose(answer[0], l, rtol=1e-12)
+    np.testing.assert_allclose(answer[1], l_exp, rtol=1e-12)
+
+@pytest.mark.parametrize("request_", [
+    [1, 2],
+    {},
+    {"couplings": [1, 2]},
+    {"signalstrengths": "x"},
+    {"signalstrengths": {"ggH_gammagamma": [1.]}},
+    {"couplings": {"tt": "a"}},
+    {"couplings": {"tt": [[1.], [1., 2.]]}},
+    {"couplings": {"VV": [1.]}, "mass": "x"},
+    {"couplings": {"VV": [1.]}, "precision": "NLO"},
+    {"command": "unknown"}])
+def test_malformed_request_keeps_connection(address, request_):
+    with server.Client(address) as client:
+        with pytest.raises(LilithError, match="server error"):
+            client.request(request_)
+        # the connection is still usable
+        answer = client.request({"couplings": {"VV": [1.], "ff": [1.]},
+                                 "id": 7})
+        assert answer["id"] == 7
+        assert len(answer["l"]) == 1
+
+def test_invalid_json(address):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    data = b"{not json"
+    sock.sendall(struct.pack(">I", len(data)) + data)
+    assert "error" in server.recv_message(sock)
+    sock.close()
+
+def test_info(address):
+    with server.Client(address) as client:
+        info = client.info()
+    assert info["version"] == lilith.version.__version__
+    assert info["exp_ndf"] > 0
+
+def test_existing_file_is_not_replaced(tmp_path):
+    filepath = tmp_path / "lilith.sock"
+    filepath.write_text("precious")
+    with pytest.raises(LilithError, match="not a socket"):
+        server.Server(exp_filepath, str(filepath))
+    assert filepath.read_text() == "precious"
+
+def test_stale_socket_is_replaced(tmp_path):
+    address = str(tmp_path / "lilith.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(address)
+    stale.close()
+    lilithserver = server.Server(exp_filepath, address)
+    lilithserver.close()
+    assert not os.path.exists(address)
@@ -0,0 +1,38 @@
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+from lilith.internal.writeoutput import ResultsStream
+
+
+def test_results_stream(tmp_path):
+    filepath = str(tmp_path / "scan.npy")
+    measurements = [{"experiment": "ATLAS", "source": 'a "b" & <c>',
+                     "sqrts": "13", "filepath": "x.xml"}]
+    x = np.linspace(0., 1., 7)
+    with ResultsStream(filepath, ["CV", "CF"], measurements,
+                       chunksize=3) as stream:
+        # the header is readable before any point is written
+        assert len(np.load(filepath)) == 0
+        stream.append({"CV": x, "CF": 1.}, 2*x, x[:,np.newaxis])
+        assert len(np.load(filepath)) == 6
+    results = np.load(filepath)
+    np.testing.assert_array_equal(results["CV"], x)
+    np.testing.assert_array_equal(results["CF"], 1.)
+    np.testing.assert_array_equal(results["l"], 2*x)
+    np.testing.assert_array_equal(results["l_exp"][:,0], x)
+
+    # the header length of the .npy format is little-endian
+    with open(filepath, "rb") as f:
+        start = f.read(10)
+    length, = struct.unpack("<H", start[8:10])
+    assert (10 + length) % 64 == 0
+
+    analysis = ET.parse(filepath + ".xml").find("data/l_exp/analysis")
+    assert analysis.get("source") == 'a "b" & <c>'
+
+def test_flush_interval(tmp_path):
+    filepath = str(tmp_path / "scan.npy")
+    with ResultsStream(filepath, ["CV"], chunksize=100,
+                       flushinterval=0.) as stream:
+        stream.append({"CV": [1., 2.]}, [3., 4.])
+        assert len(np.load(filepath)) == 2